@@ -0,0 +1,168 @@
+"""
+One-click suggested actions
+Chat answers offer follow-up buttons (SuggestedAction) that run a tool
+directly through POST /actions/execute, without another LLM round trip.
+
+Each suggestion carries a signed, short-lived token binding the seller, the
+tool and its exact arguments, so the client cannot change what runs. Tokens
+are not single-use: suggestions use absolute arguments (a new price, not
+"10% lower") so repeating one is harmless.
+"""
+import base64
+import hashlib
+import hmac
+import inspect
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+from config import ACTION_SECRET, ACTION_TOKEN_TTL_SECONDS, MAX_SUGGESTED_ACTIONS
+from tools import TOOLS
+
+
+class ActionTokenError(Exception):
+    """Action token rejected; `status_code` is the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(payload: str, secret: str) -> str:
+    return _b64encode(hmac.new(secret.encode("utf-8"), payload.encode("ascii", "replace"), hashlib.sha256).digest())
+
+
+def sign_action(
+    seller_id: int,
+    tool: str,
+    params: Dict[str, Any],
+    ttl: int = ACTION_TOKEN_TTL_SECONDS,
+    secret: str = ACTION_SECRET
+) -> str:
+    """
+    Token authorizing one tool call for a seller
+
+    Returns:
+        "<base64 payload>.<base64 HMAC-SHA256>"
+    """
+    payload = _b64encode(json.dumps(
+        {"s": seller_id, "t": tool, "p": params, "e": int(time.time()) + ttl},
+        separators=(",", ":"), sort_keys=True, ensure_ascii=False
+    ).encode("utf-8"))
+    return f"{payload}.{_signature(payload, secret)}"
+
+
+def verify_action(token: str, seller_id: int, secret: str = ACTION_SECRET) -> Tuple[str, Dict[str, Any]]:
+    """
+    Check a token and return the call it authorizes
+
+    Returns:
+        (tool name, arguments)
+
+    Raises:
+        ActionTokenError: 403 for malformed, forged or another seller's tokens, 410 once expired
+    """
+    payload, _, signature = token.partition(".")
+    if not payload or not hmac.compare_digest(signature.encode("ascii", "replace"), _signature(payload, secret).encode("ascii")):
+        raise ActionTokenError(403, "invalid_token")
+    try:
+        claims = json.loads(_b64decode(payload))
+        owner, tool, params, expires = claims["s"], claims["t"], claims["p"], claims["e"]
+    except (ValueError, KeyError, TypeError):
+        raise ActionTokenError(403, "invalid_token")
+    if owner != seller_id:
+        raise ActionTokenError(403, "wrong_seller")
+    if time.time() > expires:
+        raise ActionTokenError(410, "expired")
+    return tool, params
+
+
+async def execute_action(tool: str, params: Dict[str, Any], seller_id: int) -> Dict[str, Any]:
+    """
+    Run a tool from the tools.TOOLS registry for the seller
+
+    Raises:
+        ActionTokenError: 400 if the tool is unknown or the arguments do not fit its signature
+    """
+    func = TOOLS.get(tool)
+    if func is None:
+        raise ActionTokenError(400, "unknown_tool")
+    signature = inspect.signature(func)
+    arguments = dict(params)
+    # Seller comes from the request, never from the token's arguments
+    arguments.pop("seller_id", None)
+    if "seller_id" in signature.parameters:
+        arguments["seller_id"] = seller_id
+    try:
+        signature.bind(**arguments)
+    except TypeError:
+        raise ActionTokenError(400, "bad_params")
+    return await func(**arguments)
+
+
+def _listing_label(title: str, text: str) -> str:
+    short = title if len(title) <= 20 else title[:19] + "…"
+    return f"'{short}' {text}"
+
+
+def suggest_actions(actions_taken: List[Dict[str, Any]], seller_id: int) -> List[Dict[str, Any]]:
+    """
+    Follow-up buttons for a finished chat turn
+
+    Built from the last successful tool result (no LLM involved):
+    found listings -> lower the price 10% / boost the first one,
+    a price change -> boost that listing, a boost -> boost it daily.
+
+    Returns:
+        SuggestedAction dicts (label, action, params, token)
+    """
+    suggestions: List[Tuple[str, str, Dict[str, Any]]] = []
+    last = next((a for a in reversed(actions_taken) if a["result"].get("success")), None)
+    if last is not None:
+        tool, result = last["tool"], last["result"]
+        if tool == "query_listings" and result.get("listings"):
+            listing = result["listings"][0]
+            new_price = max(int(listing["price"] * 0.9), 1)
+            suggestions.append((
+                _listing_label(listing["title"], f"{new_price:,}원으로 인하"),
+                "adjust_price", {"listing_id": listing["id"], "new_price": new_price}
+            ))
+            if listing.get("status", "active") == "active":
+                suggestions.append((
+                    _listing_label(listing["title"], "끌어올리기"),
+                    "boost_listing", {"listing_id": listing["id"]}
+                ))
+        elif tool in ("adjust_price", "update_content") and result.get("listing_id"):
+            suggestions.append((
+                _listing_label(result.get("listing_title", ""), "끌어올리기"),
+                "boost_listing", {"listing_id": result["listing_id"]}
+            ))
+        elif tool == "boost_listing" and result.get("listing_id"):
+            suggestions.append((
+                _listing_label(result.get("listing_title", ""), "매일 자동 끌어올리기"),
+                "schedule_listing_rule", {"listing_id": result["listing_id"], "rule_type": "auto_boost"}
+            ))
+
+    return [
+        {"label": label, "action": tool, "params": params, "token": sign_action(seller_id, tool, params)}
+        for label, tool, params in suggestions[:MAX_SUGGESTED_ACTIONS]
+    ]
+
+
+def updated_listing_ids(result: Dict[str, Any]) -> List[int]:
+    """Listings a successful tool result changed (same rule as the agent's updated_listings)"""
+    if not result.get("success"):
+        return []
+    ids = list(result.get("listing_ids") or [])
+    if result.get("listing_id"):
+        ids.append(result["listing_id"])
+    return ids
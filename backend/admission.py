@@ -0,0 +1,166 @@
+"""
+Admission control for /chat
+Each chat turn can make several LLM round trips, so under a burst we bound
+how many run at once, how many wait, and how often one seller may ask.
+Requests that cannot be served soon are rejected immediately (429/503)
+instead of piling up until they time out.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Hashable, Optional
+
+from config import (
+    CHAT_MAX_CONCURRENCY,
+    CHAT_MAX_QUEUE,
+    CHAT_QUEUE_TIMEOUT_SECONDS,
+    CHAT_RATE_PER_MINUTE,
+    CHAT_RATE_BURST,
+    CHAT_RATE_MAX_SELLERS,
+)
+from metrics import CHAT_INFLIGHT, CHAT_QUEUE_DEPTH, CHAT_QUEUE_WAIT_SECONDS, CHAT_REJECTED
+
+
+class AdmissionRejected(Exception):
+    """Request shed by admission control"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `burst` stored"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume one token; returns 0 on success, else seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Give back a token taken by a request that was not served"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded wait queue, plus per-key rate limiting"""
+
+    def __init__(
+        self,
+        max_concurrency: int = CHAT_MAX_CONCURRENCY,
+        max_queue: int = CHAT_MAX_QUEUE,
+        queue_timeout: float = CHAT_QUEUE_TIMEOUT_SECONDS,
+        rate_per_minute: float = CHAT_RATE_PER_MINUTE,
+        burst: int = CHAT_RATE_BURST,
+        max_keys: int = CHAT_RATE_MAX_SELLERS
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self.inflight = 0
+        self.waiting = 0
+
+    def check_rate(self, key: Hashable) -> None:
+        """Raise 429 if key has used up its bucket"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = bucket.take(now)
+        if wait > 0:
+            CHAT_REJECTED.inc(reason="rate_limited")
+            raise AdmissionRejected(429, "rate_limited", wait)
+
+    def _refund(self, key: Hashable) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.refund()
+
+    async def _acquire(self) -> None:
+        # Fast path: a free slot and nobody ahead of us
+        if self.waiting == 0 and not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+
+        if self.waiting >= self.max_queue:
+            CHAT_REJECTED.inc(reason="queue_full")
+            raise AdmissionRejected(503, "queue_full", self.queue_timeout)
+
+        self.waiting += 1
+        CHAT_QUEUE_DEPTH.set(self.waiting)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            CHAT_REJECTED.inc(reason="queue_timeout")
+            raise AdmissionRejected(503, "queue_timeout", self.queue_timeout)
+        finally:
+            self.waiting -= 1
+            CHAT_QUEUE_DEPTH.set(self.waiting)
+        CHAT_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+    @asynccontextmanager
+    async def admit(self, key: Optional[Hashable] = None):
+        """
+        Hold an agent slot for the duration of the block
+
+        Args:
+            key: Rate limit key (seller ID); None skips the per-key limit
+
+        Raises:
+            AdmissionRejected: 429 when rate limited, 503 when the queue is full or the wait times out
+        """
+        if key is not None:
+            self.check_rate(key)
+        try:
+            await self._acquire()
+        except AdmissionRejected:
+            # Shed for overload, not for the seller's own rate: don't charge them
+            if key is not None:
+                self._refund(key)
+            raise
+        self.inflight += 1
+        CHAT_INFLIGHT.set(self.inflight)
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            CHAT_INFLIGHT.set(self.inflight)
+            self._semaphore.release()
+
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After value in whole seconds (at least 1)"""
+    return str(max(1, math.ceil(seconds)))
+
+
+# Global admission controller for /chat
+chat_admission = AdmissionController()
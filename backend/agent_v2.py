@@ -1,39 +1,178 @@
 """
 LLM Agent using Gemini API Function Calling
 Completely rewritten to use native function calling
+
+The Gemini SDK (google.generativeai + protobuf, about half of the server's
+import time) is only imported when the agent is first used or warmed up,
+so workers start serving non-chat endpoints sooner.
 """
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import asyncio
+import inspect
 import json
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
-from google.protobuf.json_format import MessageToDict
+import threading
+import time
 
-from config import GEMINI_API_KEY, GEMINI_MODEL
+from config import (
+    GEMINI_API_KEY, GEMINI_MODEL, LLM_BACKEND, DEFAULT_SELLER_ID, SUMMARY_CACHE_SIZE,
+    LLM_TURN_DEADLINE_SECONDS, AGENT_MODE, TOOL_SELECTION
+)
 from database import db
+from cache import versions, VersionedCache
+from logger import get_logger
+from tracing import tracer
+from metrics import (
+    LLM_CALL_SECONDS,
+    AGENT_ITERATIONS,
+    AGENT_ITERATION_BUDGET,
+    AGENT_ITERATION_LIMIT_HITS,
+    LLM_FALLBACKS,
+    TOOL_SELECTIONS,
+    PROMPT_CHARS_SAVED,
+    record_llm_usage
+)
+from resilience import ResilientCaller, LLMUnavailable, CircuitOpenError
+from fake_llm import plan_for_message
+from planner import ExecutionPlan, PlanError, validate_plan, resolve_step_args, execute_plan, plan_instruction
+from tool_selector import ToolSelector, load_selector, log_turn
+from actions import suggest_actions
+from unit_of_work import UnitOfWork, unit_of_work, current_unit_of_work
+from listing_record import to_plain
 from tools import (
     query_listings,
     adjust_price,
     boost_listing,
     update_content,
-    get_market_insights
+    get_market_insights,
+    schedule_listing_rule,
+    boost_eligible_listings
 )
 
 
+logger = get_logger("agent")
+
+# Tools the rule-based fallback may run without the model's judgement
+FALLBACK_SAFE_TOOLS = {"query_listings", "get_market_insights"}
+
+# === System prompt sections ===
+# Only the sections for the tools sent with a turn are included (tool_selector.py)
+
+PROMPT_ROLE = """당신은 중고거래 플랫폼의 AI 판매 어시스턴트입니다.
+
+[역할]
+- 사용자의 자연어 요청을 분석하여 적절한 함수를 호출합니다
+- 항상 친절하고 명확하게 응답합니다
+"""
+
+# One numbered entry per tool under [사용 가능한 함수들], in declaration order
+TOOL_GUIDE = {
+    "query_listings": """query_listings: 매물 조회 (날짜/카테고리/지역 필터)
+   - days_ago: 최근 N일 **범위** (N일 전부터 지금까지)
+   - exact_day_ago: 특정일 **당일만** (정확히 N일 전)
+   - 두 파라미터는 동시 사용 불가 (하나만 선택)""",
+    "adjust_price": "adjust_price: 가격 조정",
+    "boost_listing": "boost_listing: 끌어올리기 (24시간 1회 제한)",
+    "update_content": "update_content: 제목/내용 수정",
+    "get_market_insights": "get_market_insights: 시장 시세 조회",
+    "schedule_listing_rule": """schedule_listing_rule: 자동화 규칙 등록
+   - "매일 자동으로 끌어올려줘" → rule_type="auto_boost"
+   - "일주일 동안 안 팔리면 10% 내려줘" → rule_type="price_drop", after_days=7, drop_percent=10""",
+    "boost_eligible_listings": """boost_eligible_listings: 끌어올리기 가능한 매물 일괄 끌어올리기
+   - "끌어올릴 수 있는 매물 다 끌어올려줘" → boost_eligible_listings() (먼저 조회할 필요 없음)""",
+}
+
+PROMPT_POLICY = """[정책]
+- 끌어올리기는 하루 1회만 가능합니다
+- 가격 인하 시 10% 이상 권장합니다
+- 가격은 0원 이하로 설정할 수 없습니다
+"""
+
+PROMPT_DATE_FILTERS = """[중요 - 날짜 필터 사용법]
+**특정일 조회 (exact_day_ago 사용):**
+- "오늘 올린 물건" → query_listings(exact_day_ago=0)
+- "어제 올린 물건" → query_listings(exact_day_ago=1)
+- "그저께 올린 물건" → query_listings(exact_day_ago=2)
+
+**범위 조회 (days_ago 사용):**
+- "최근 3일" → query_listings(days_ago=3)
+- "최근 10일" → query_listings(days_ago=10)
+- "최근 한달" → query_listings(days_ago=30)
+- "지난 주" → query_listings(days_ago=7)
+"""
+
+PROMPT_PRICE_WORKFLOW = """[가격 조정 워크플로우]
+- "어제 올린 물건 가격 낮춰줘" 같은 요청:
+  1. 먼저 query_listings(exact_day_ago=1)로 조회
+  2. 결과를 확인한 후 adjust_price() 호출
+- 가격 조정 시 정확한 계산:
+  - "10% 낮춰줘" → 현재가 × 0.9
+  - "5만원 낮춰줘" → 현재가 - 50000
+"""
+
+PROMPT_FORMAT = """[응답 형식 가이드]
+응답은 반드시 **Markdown 형식**으로 작성하세요:
+- 제목이나 섹션 구분: ## 제목
+- 강조: **중요한 내용**
+- 리스트: 간결하게 작성
+- 숫자: 천 단위 콤마 사용 (예: 35,000원)
+"""
+
+PROMPT_QUERY_RESPONSE = """**매우 중요 - 매물 조회 응답 규칙**:
+매물 조회 시 **절대로** 매물 정보를 텍스트로 나열하지 마세요!
+
+**❌ 절대 금지 - 이렇게 하지 마세요:**
+- "1. 유니클로 캐시미어 니트 (35,000원, 의류, 서초구)"
+- "ID 8: 유니클로 캐시미어 니트 - 35,000원"
+- "아이폰 13 프로 (850,000원, 전자기기, 강남구), IKEA 책상 (120,000원, 가구, 서초구)"
+- 매물 제목, 가격, 카테고리, 지역 등을 텍스트로 나열하는 모든 형태
+
+**✅ 올바른 응답 예시:**
+- "어제 등록된 매물 **2개**를 찾았습니다."
+- "최근 3일간 **5개**의 전자기기 매물이 있습니다."
+- "가격을 낮출 매물 **3개**를 찾았습니다."
+
+**이유**: 매물 상세 정보(제목, 가격, 카테고리, 지역)는 UI 카드로 자동 표시됩니다.
+응답 텍스트에는 **개수와 간단한 설명만** 포함하세요.
+"""
+
+# Tools whose turns need the policy text / the seller's listing summary
+POLICY_PROMPT_TOOLS = {"adjust_price", "boost_listing", "schedule_listing_rule", "boost_eligible_listings"}
+LISTING_PROMPT_TOOLS = set(TOOL_GUIDE) - {"get_market_insights"}
+
+
+class TurnActions(list):
+    """actions_taken of one turn, remembering which queued writes each action made"""
+
+    def __init__(self):
+        super().__init__()
+        self._writes: List[tuple] = []
+
+    def record(self, tool: str, result: Dict[str, Any], writes: tuple):
+        """Add an action; writes: the unit of work's queue positions before and after it ran"""
+        self.append({"tool": tool, "result": result})
+        self._writes.append(writes)
+
+    def saved(self, uow: Optional[UnitOfWork]) -> List[Dict[str, Any]]:
+        """Actions whose writes were kept after uow was closed (a failed turn drops its queue)"""
+        if uow is None:
+            return []
+        return [action for action, writes in zip(self, self._writes) if uow.saved(*writes)]
+
+
 class GeminiAgent:
     """LLM Agent using Function Calling"""
 
     def __init__(self, api_key: str = GEMINI_API_KEY, model_name: str = GEMINI_MODEL):
-        """Initialize Gemini agent with function calling"""
-        genai.configure(api_key=api_key)
+        """Initialize Gemini agent with function calling (the SDK loads in warm_up)"""
+        self.api_key = api_key
         self.model_name = model_name
 
-        # Safety settings
-        self.safety_settings = {
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
+        # Set by warm_up()
+        self.model_class = None
+        self.safety_settings = None
+        self.function_response_part = None
+        self.selector: Optional[ToolSelector] = None
+        self._backend_lock = threading.Lock()
 
         # Register tools as function declarations
         self.tools = [
@@ -133,18 +272,122 @@ class GeminiAgent:
                     }
                 },
                 required=["category", "region"]
+            ),
+            self._create_function_declaration(
+                "schedule_listing_rule",
+                "매물 자동화 규칙을 등록합니다. 자동 끌어올리기(auto_boost) 또는 N일 동안 안 팔리면 X% 가격 인하(price_drop)를 예약합니다.",
+                {
+                    "listing_id": {
+                        "type": "INTEGER",
+                        "description": "매물 ID"
+                    },
+                    "rule_type": {
+                        "type": "STRING",
+                        "description": "규칙 종류: auto_boost (24시간마다 자동 끌어올리기), price_drop (주기적 가격 인하)"
+                    },
+                    "drop_percent": {
+                        "type": "INTEGER",
+                        "description": "인하율 (%) - price_drop 전용"
+                    },
+                    "after_days": {
+                        "type": "INTEGER",
+                        "description": "며칠 동안 안 팔리면 인하할지 (N일마다 반복) - price_drop 전용"
+                    },
+                    "min_price": {
+                        "type": "INTEGER",
+                        "description": "최저 가격 (원) - 이 가격 아래로는 내리지 않음 (선택사항)"
+                    }
+                },
+                required=["listing_id", "rule_type"]
+            ),
+            self._create_function_declaration(
+                "boost_eligible_listings",
+                "끌어올리기 가능한(쿨다운이 지난) 판매중 매물을 한 번에 모두 끌어올립니다.",
+                {
+                    "dry_run": {
+                        "type": "BOOLEAN",
+                        "description": "true면 끌어올리지 않고 가능한 매물만 조회"
+                    },
+                    "limit": {
+                        "type": "INTEGER",
+                        "description": "최대 개수 (선택사항, 오래 기다린 매물부터)"
+                    }
+                }
             )
         ]
 
+        # Plan mode describes the same tools in the prompt instead
+        self.plan_instruction = plan_instruction(self.tools)
+
+        # Tools taking a listing ID; the model usually has to look the ID up first
+        self.needs_listing_id = {d["name"] for d in self.tools if "listing_id" in d["parameters"]["required"]}
+
+        # Prompt size with every tool (without the listing summary), for the savings metric
+        self._declaration_chars = {d["name"]: len(json.dumps(d, ensure_ascii=False)) for d in self.tools}
+        self._full_prompt_chars = len(self.render_system_instruction([])) + sum(self._declaration_chars.values())
+
         # Map function names to actual functions
         self.function_map = {
             "query_listings": query_listings,
             "adjust_price": adjust_price,
             "boost_listing": boost_listing,
             "update_content": update_content,
-            "get_market_insights": get_market_insights
+            "get_market_insights": get_market_insights,
+            "schedule_listing_rule": schedule_listing_rule,
+            "boost_eligible_listings": boost_eligible_listings
         }
 
+        # Retries / hedging / circuit breaker around model calls
+        self.llm = ResilientCaller()
+
+        # Per-seller listing summaries for the system prompt
+        self.summary_cache = VersionedCache(SUMMARY_CACHE_SIZE)
+
+        # Tools that take the caller's seller_id
+        self.seller_scoped_tools = {
+            name for name, func in self.function_map.items()
+            if "seller_id" in inspect.signature(func).parameters
+        }
+
+    def warm_up(self):
+        """Import and configure the LLM SDK (blocking; safe to call from a thread, idempotent)"""
+        with self._backend_lock:
+            if self.model_class is not None:
+                return
+            start = time.perf_counter()
+            if TOOL_SELECTION and self.selector is None:
+                self.selector = load_selector(self.needs_listing_id)
+            if LLM_BACKEND == "fake":
+                from fake_llm import FakeGenerativeModel, function_response_part
+                self.function_response_part = function_response_part
+                self.safety_settings = {}
+                model_class = FakeGenerativeModel
+            else:
+                import google.generativeai as genai
+                from google.generativeai.types import HarmCategory, HarmBlockThreshold
+
+                genai.configure(api_key=self.api_key)
+
+                def function_response_part(name: str, response: Dict[str, Any]):
+                    return genai.protos.Part(
+                        function_response=genai.protos.FunctionResponse(name=name, response=response)
+                    )
+
+                self.function_response_part = function_response_part
+                # Safety settings
+                self.safety_settings = {
+                    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+                    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+                    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+                    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+                }
+                model_class = genai.GenerativeModel
+            # Published last: other threads treat a set model_class as "ready"
+            self.model_class = model_class
+            logger.info("LLM backend loaded", extra={"fields": {
+                "backend": LLM_BACKEND, "seconds": round(time.perf_counter() - start, 3)
+            }})
+
     def _create_function_declaration(
         self,
         name: str,
@@ -163,152 +406,412 @@ class GeminiAgent:
             }
         }
 
-    async def get_system_instruction(self) -> str:
-        """Get system instruction with current listings"""
-        listings = await db.get_all_listings()
+    def expand_tools(self, tools: Optional[List[str]]) -> Optional[List[str]]:
+        """Add what a tool subset depends on (a listing lookup for ID-taking tools), in declaration order"""
+        if tools is None:
+            return None
+        wanted = set(tools)
+        if wanted & self.needs_listing_id:
+            wanted.add("query_listings")
+        return [d["name"] for d in self.tools if d["name"] in wanted]
 
-        listings_summary = []
-        for listing in listings[:10]:
-            listings_summary.append(
-                f"- ID {listing['id']}: {listing['title']} "
-                f"({listing['price']:,}원, {listing['category']}, "
-                f"{listing['region']}, {listing['created_at'][:10]} 등록)"
-            )
+    def select_tools(self, user_message: str, history: list) -> Optional[List[str]]:
+        """
+        Tools to send for this turn, predicted by the local classifier
 
-        return f"""당신은 중고거래 플랫폼의 AI 판매 어시스턴트입니다.
+        Returns:
+            Tool names ([] for small talk), or None to send every tool
+        """
+        if self.selector is None:
+            return None
+        selected = self.selector.select(user_message)
+        if selected == [] and history:
+            # A follow-up ("응 해줘") may continue an earlier request
+            selected = None
+        if selected is not None:
+            # Tools added after the selector was trained are always sent
+            selected = self.expand_tools(selected + [name for name in self.function_map if name not in self.selector.labels])
+        TOOL_SELECTIONS.inc(outcome="full" if selected is None else ("subset" if selected else "none"))
+        return selected
+
+    async def _turn_prompt(self, seller_id: int, tools: Optional[List[str]]):
+        """
+        System instruction and function declarations for a turn
 
-[역할]
-- 사용자의 자연어 요청을 분석하여 적절한 함수를 호출합니다
-- 항상 친절하고 명확하게 응답합니다
+        Returns:
+            (system instruction, declarations of `tools`; all of them if None)
+        """
+        with tracer.start_span("agent.system_instruction", tools=len(self.tools if tools is None else tools)):
+            system_instruction = await self.get_system_instruction(seller_id, tools)
+        if tools is None:
+            return system_instruction, self.tools
 
-[사용 가능한 함수들]
-1. query_listings: 매물 조회 (날짜/카테고리/지역 필터)
-   - days_ago: 최근 N일 **범위** (N일 전부터 지금까지)
-   - exact_day_ago: 특정일 **당일만** (정확히 N일 전)
-   - 두 파라미터는 동시 사용 불가 (하나만 선택)
-2. adjust_price: 가격 조정
-3. boost_listing: 끌어올리기 (24시간 1회 제한)
-4. update_content: 제목/내용 수정
-5. get_market_insights: 시장 시세 조회
+        declarations = [d for d in self.tools if d["name"] in tools]
+        sent = len(system_instruction) + sum(self._declaration_chars[d["name"]] for d in declarations)
+        PROMPT_CHARS_SAVED.inc(max(self._full_prompt_chars - sent, 0))
+        return system_instruction, declarations
 
-[정책]
-- 끌어올리기는 하루 1회만 가능합니다
-- 가격 인하 시 10% 이상 권장합니다
-- 가격은 0원 이하로 설정할 수 없습니다
+    async def _send_message(self, model, chat, content, iteration: int, deadline: float):
+        """
+        Send one message to the model, recording latency and token usage
 
-[현재 매물 목록]
-{chr(10).join(listings_summary)}
+        Each attempt runs on its own copy of the chat session in a worker
+        thread, so a timed-out or losing hedged call cannot touch the history.
 
-[중요 - 날짜 필터 사용법]
-**특정일 조회 (exact_day_ago 사용):**
-- "오늘 올린 물건" → query_listings(exact_day_ago=0)
-- "어제 올린 물건" → query_listings(exact_day_ago=1)
-- "그저께 올린 물건" → query_listings(exact_day_ago=2)
+        Returns:
+            (response, chat session that produced it)
+        """
+        async def attempt():
+            session = model.start_chat(history=list(chat.history))
+            response = await asyncio.to_thread(session.send_message, content)
+            return response, session
 
-**범위 조회 (days_ago 사용):**
-- "최근 3일" → query_listings(days_ago=3)
-- "최근 10일" → query_listings(days_ago=10)
-- "최근 한달" → query_listings(days_ago=30)
-- "지난 주" → query_listings(days_ago=7)
+        # Don't hold a read snapshot (and the WAL) while the model thinks
+        uow = current_unit_of_work()
+        if uow is not None:
+            await uow.release_snapshot()
 
-[가격 조정 워크플로우]
-- "어제 올린 물건 가격 낮춰줘" 같은 요청:
-  1. 먼저 query_listings(exact_day_ago=1)로 조회
-  2. 결과를 확인한 후 adjust_price() 호출
-- 가격 조정 시 정확한 계산:
-  - "10% 낮춰줘" → 현재가 × 0.9
-  - "5만원 낮춰줘" → 현재가 - 50000
+        start = time.perf_counter()
+        try:
+            with tracer.start_span("llm.send_message", iteration=iteration, model=self.model_name):
+                response, chat = await self.llm.call(attempt, deadline)
+        finally:
+            LLM_CALL_SECONDS.observe(time.perf_counter() - start, iteration=iteration)
+        record_llm_usage(response)
+        return response, chat
+
+    async def _run_tool(
+        self,
+        func_name: str,
+        func_args: Dict[str, Any],
+        seller_id: int,
+        actions_taken: TurnActions,
+        updated_listings: set
+    ) -> Dict[str, Any]:
+        """Execute one tool call and record it in the turn's actions"""
+        # Seller comes from the request, never from the model
+        if func_name in self.seller_scoped_tools:
+            func_args["seller_id"] = seller_id
+        uow = current_unit_of_work()
+        queued = uow.queued if uow is not None else 0
+        # Results go to the model and into the API response: ListingRecords become dicts here
+        result = to_plain(await self.function_map[func_name](**func_args))
+        logger.debug("Function result", extra={"fields": {
+            "function": func_name, "result": result
+        }})
+
+        actions_taken.record(func_name, result, (queued, uow.queued if uow is not None else 0))
+        updated_listings.update(self._updated_listings(result))
+        return result
+
+    @staticmethod
+    def _updated_listings(result: Dict[str, Any]) -> List[int]:
+        """Listings a tool result reports as changed"""
+        if not result.get("success"):
+            return []
+        ids = list(result.get("listing_ids") or [])
+        if result.get("listing_id"):
+            ids.append(result["listing_id"])
+        return ids
+
+    async def _fallback(
+        self,
+        user_message: str,
+        seller_id: int,
+        actions_taken: list,
+        updated_listings: set,
+        reason: str
+    ) -> Dict[str, Any]:
+        """
+        Answer without the model when it is unavailable
 
-[응답 형식 가이드]
-응답은 반드시 **Markdown 형식**으로 작성하세요:
-- 제목이나 섹션 구분: ## 제목
-- 강조: **중요한 내용**
-- 리스트: 간결하게 작성
-- 숫자: 천 단위 콤마 사용 (예: 35,000원)
+        Runs the rule-based plan (fake_llm.plan_for_message) but only its
+        read-only steps; changes are left for the user to request again.
+        If the turn already executed tools, only summarizes what was done.
+        """
+        LLM_FALLBACKS.inc(reason=reason)
+        logger.warning("Answering with rule-based fallback", extra={"fields": {"reason": reason}})
+
+        if actions_taken:
+            done = [action["result"].get("message", action["tool"]) for action in actions_taken]
+            response = "AI 응답이 지연되어 요약 없이 처리 결과만 알려드립니다.\n" + "\n".join(f"- {m}" for m in done)
+        else:
+            previous = None
+            skipped_change = False
+            results = []
+            for step in plan_for_message(user_message):
+                if step["tool"] not in FALLBACK_SAFE_TOOLS:
+                    skipped_change = True
+                    break
+                if previous is not None and (not previous.get("success") or (
+                    "listings" in previous and not previous["listings"]
+                )):
+                    break
+                for args in resolve_step_args(step["args"], results):
+                    previous = await self._run_tool(step["tool"], args, seller_id, actions_taken, updated_listings)
+                results.append(previous)
+
+            lines = ["AI 응답이 지연되어 기본 모드로 응답합니다."]
+            if previous is not None:
+                lines.append(previous.get("message", "조회를 완료했습니다."))
+            if skipped_change:
+                lines.append("매물 변경 요청은 잠시 후 다시 시도해주세요.")
+            elif previous is None:
+                lines.append("지금은 매물 조회와 시세 조회만 가능합니다. 잠시 후 다시 시도해주세요.")
+            response = "\n".join(lines)
 
-**매우 중요 - 매물 조회 응답 규칙**:
-매물 조회 시 **절대로** 매물 정보를 텍스트로 나열하지 마세요!
+        return {
+            "intent": "FALLBACK",
+            "response": response,
+            "reasoning": f"LLM 사용 불가 ({reason}), 규칙 기반으로 처리됨",
+            "actions_taken": actions_taken,
+            "suggested_actions": suggest_actions(actions_taken, seller_id),
+            "updated_listings": list(updated_listings)
+        }
 
-**❌ 절대 금지 - 이렇게 하지 마세요:**
-- "1. 유니클로 캐시미어 니트 (35,000원, 의류, 서초구)"
-- "ID 8: 유니클로 캐시미어 니트 - 35,000원"
-- "아이폰 13 프로 (850,000원, 전자기기, 강남구), IKEA 책상 (120,000원, 가구, 서초구)"
-- 매물 제목, 가격, 카테고리, 지역 등을 텍스트로 나열하는 모든 형태
+    async def get_system_instruction(self, seller_id: int = DEFAULT_SELLER_ID, tools: Optional[List[str]] = None) -> str:
+        """
+        Get system instruction with the seller's current listings
 
-**✅ 올바른 응답 예시:**
-- "어제 등록된 매물 **2개**를 찾았습니다."
-- "최근 3일간 **5개**의 전자기기 매물이 있습니다."
-- "가격을 낮출 매물 **3개**를 찾았습니다."
+        Args:
+            seller_id: Seller whose listings are summarized
+            tools: Tool names sent with this turn (None = all); sections for other tools are left out
+        """
+        listings_summary = []
+        if tools is None or set(tools) & LISTING_PROMPT_TOOLS:
+            # The summary only changes when the seller's listings do (tracked across workers)
+            version = versions.listings_version(seller_id)
+            listings_summary = self.summary_cache.get(seller_id, version)
+            if listings_summary is None:
+                listings_summary = []
+                # Newest 10 only: stop reading after them instead of loading every listing
+                listings = db.iter_listings(seller_id=seller_id, sort_by="created_at", sort_order="DESC", batch_size=10)
+                async for listing in listings:
+                    listings_summary.append(
+                        f"- ID {listing['id']}: {listing['title']} "
+                        f"({listing['price']:,}원, {listing['category']}, "
+                        f"{listing['region']}, {listing['created_at'][:10]} 등록)"
+                    )
+                    if len(listings_summary) == 10:
+                        break
+                await listings.aclose()
+                self.summary_cache.set(seller_id, version, listings_summary)
+
+        return self.render_system_instruction(listings_summary, tools)
+
+    @staticmethod
+    def render_system_instruction(listings_summary: List[str], tools: Optional[List[str]] = None) -> str:
+        """Build the system prompt from the sections relevant to `tools` (None = all)"""
+        wanted = set(TOOL_GUIDE) if tools is None else set(tools)
+        guide = [TOOL_GUIDE[name] for name in TOOL_GUIDE if name in wanted]
+
+        sections = [PROMPT_ROLE]
+        if guide:
+            sections.append("[사용 가능한 함수들]\n" + "\n".join(
+                f"{number}. {text}" for number, text in enumerate(guide, 1)
+            ) + "\n")
+        if wanted & POLICY_PROMPT_TOOLS:
+            sections.append(PROMPT_POLICY)
+        if wanted & LISTING_PROMPT_TOOLS:
+            sections.append(f"[현재 매물 목록]\n{chr(10).join(listings_summary)}\n")
+        if "query_listings" in wanted:
+            sections.append(PROMPT_DATE_FILTERS)
+        if "adjust_price" in wanted:
+            sections.append(PROMPT_PRICE_WORKFLOW)
+        sections.append(PROMPT_FORMAT)
+        if "query_listings" in wanted:
+            sections.append(PROMPT_QUERY_RESPONSE)
+        return "\n".join(sections)
+
+    @staticmethod
+    def _chat_history(history: list) -> list:
+        """Convert request history to Gemini format"""
+        chat_history = []
+        for msg in history or []:
+            if msg.get("role") == "user":
+                chat_history.append({
+                    "role": "user",
+                    "parts": [msg["content"]]
+                })
+            elif msg.get("role") == "assistant":
+                chat_history.append({
+                    "role": "model",
+                    "parts": [msg["content"]]
+                })
+        return chat_history
+
+    async def _process_plan(
+        self,
+        user_message: str,
+        history: list,
+        seller_id: int,
+        tools: Optional[List[str]],
+        deadline: float,
+        actions_taken: list,
+        updated_listings: set
+    ):
+        """
+        Plan mode: one LLM call returns every step, planner.py runs them
 
-**이유**: 매물 상세 정보(제목, 가격, 카테고리, 지역)는 UI 카드로 자동 표시됩니다.
-응답 텍스트에는 **개수와 간단한 설명만** 포함하세요.
-"""
+        Returns:
+            The turn's response, or None if the model's plan was unusable
+            (the caller then falls back to the function-calling loop)
+        """
+        system_instruction, declarations = await self._turn_prompt(seller_id, tools)
+        instruction = self.plan_instruction if tools is None else plan_instruction(declarations)
+
+        model = self.model_class(
+            model_name=self.model_name,
+            system_instruction=f"{system_instruction}\n{instruction}",
+            safety_settings=self.safety_settings,
+            generation_config={"response_mime_type": "application/json"}
+        )
+        chat = model.start_chat(history=self._chat_history(history))
+        response, _ = await self._send_message(model, chat, user_message, iteration=0, deadline=deadline)
+
+        try:
+            plan = ExecutionPlan.model_validate_json(response.text)
+            validate_plan(plan, self.function_map)
+        except (ValueError, PlanError) as e:
+            logger.warning("Unusable plan, falling back to function calling", extra={"fields": {"error": str(e)}})
+            return None
+
+        async def run_tool(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+            logger.info("Calling function", extra={"fields": {"function": name, "mode": "plan"}})
+            return await self._run_tool(name, args, seller_id, actions_taken, updated_listings)
 
-    async def process_message(self, user_message: str, history: list = None) -> Dict[str, Any]:
+        with tracer.start_span("agent.plan", steps=len(plan.steps)):
+            results = await execute_plan(plan, run_tool)
+
+        # The model wrote its response before anything ran: only use it if every step did its job
+        if any(not result.get("success") or result.get("skipped") for result in results):
+            final_response = "\n".join(result["message"] for result in results if result.get("message"))
+        else:
+            final_response = plan.response or (results[-1].get("message") if results else "처리 완료")
+
+        return {
+            "intent": "PLAN",
+            "response": final_response,
+            "reasoning": f"실행 계획 {len(plan.steps)}단계, LLM 호출 1회",
+            "actions_taken": actions_taken,
+            "suggested_actions": suggest_actions(actions_taken, seller_id),
+            "updated_listings": list(updated_listings)
+        }
+
+    async def process_message(
+        self,
+        user_message: str,
+        history: list = None,
+        seller_id: int = DEFAULT_SELLER_ID
+    ) -> Dict[str, Any]:
         """
         Process user message using function calling
 
         Args:
             user_message: User's natural language request
+            seller_id: Authenticated seller; every tool call is scoped to their listings
 
         Returns:
             Response with function call results
         """
+        deadline = asyncio.get_running_loop().time() + LLM_TURN_DEADLINE_SECONDS
+        actions_taken = TurnActions()
+        updated_listings = set()
+        uow = None
         try:
-            # Get system instruction
-            system_instruction = await self.get_system_instruction()
-
-            # Create model with function calling
-            model = genai.GenerativeModel(
-                model_name=self.model_name,
-                system_instruction=system_instruction,
-                tools=self.tools,
-                safety_settings=self.safety_settings
+            # One connection and one commit for the whole turn (a snapshot per model round)
+            async with unit_of_work() as uow:
+                try:
+                    return await self._run_turn(
+                        user_message, history, seller_id, deadline, actions_taken, updated_listings
+                    )
+                except LLMUnavailable as e:
+                    # Keep what the tools already did: the fallback reports it
+                    reason = "circuit_open" if isinstance(e, CircuitOpenError) else "unavailable"
+                    return await self._fallback(user_message, seller_id, actions_taken, updated_listings, reason)
+
+        except Exception as e:
+            # The turn (or its commit) failed and its queued writes were dropped. Writes
+            # that committed when they ran (new rules, boosts) stay: report only those.
+            logger.exception("Agent error")
+            return self._error_response(e, actions_taken.saved(uow))
+
+    @classmethod
+    def _error_response(cls, error: Exception, actions_taken: list) -> Dict[str, Any]:
+        updated_listings = {
+            listing_id for action in actions_taken for listing_id in cls._updated_listings(action["result"])
+        }
+        return {
+            "intent": "ERROR",
+            "response": f"죄송합니다. 요청 처리 중 오류가 발생했습니다: {str(error)}",
+            "reasoning": f"에러: {str(error)}",
+            "actions_taken": actions_taken,
+            "suggested_actions": [],  # 추가: 빈 배열로 초기화
+            "updated_listings": list(updated_listings)
+        }
+
+    async def _run_turn(
+        self,
+        user_message: str,
+        history: Optional[list],
+        seller_id: int,
+        deadline: float,
+        actions_taken: List[Dict[str, Any]],
+        updated_listings: set
+    ) -> Dict[str, Any]:
+        """Function-calling loop of process_message (raises instead of answering with an error)"""
+        if self.model_class is None:
+            # First use without a finished warm-up: load off the event loop
+            await asyncio.to_thread(self.warm_up)
+
+        # Only the tools (and prompt sections) this message needs
+        selected = self.select_tools(user_message, history)
+
+        if AGENT_MODE == "plan":
+            result = await self._process_plan(
+                user_message, history, seller_id, selected, deadline, actions_taken, updated_listings
             )
+            if result is not None:
+                log_turn(user_message, [action["tool"] for action in actions_taken])
+                return result
 
-            # Build chat history for context
-            chat_history = []
-            if history:
-                for msg in history:
-                    # Convert to Gemini format
-                    if msg.get("role") == "user":
-                        chat_history.append({
-                            "role": "user",
-                            "parts": [msg["content"]]
-                        })
-                    elif msg.get("role") == "assistant":
-                        chat_history.append({
-                            "role": "model",
-                            "parts": [msg["content"]]
-                        })
-
-            # Start chat session with history (manual function calling for async support)
-            chat = model.start_chat(history=chat_history)
-
-            # Send initial message
-            response = chat.send_message(user_message)
-
-            # Collect function call results
-            actions_taken = []
-            updated_listings = set()
-            function_responses = []
-
-            # Process function calls manually (supports async)
-            max_iterations = 5  # Prevent infinite loops
-            iteration = 0
-
-            while iteration < max_iterations:
-                # Check if model wants to call functions
-                if not response.candidates:
-                    break
+        # Get system instruction
+        system_instruction, declarations = await self._turn_prompt(seller_id, selected)
 
-                parts = response.candidates[0].content.parts
-                function_calls = [p for p in parts if hasattr(p, 'function_call')]
+        # Create model with function calling
+        model = self.model_class(
+            model_name=self.model_name,
+            system_instruction=system_instruction,
+            tools=declarations or None,
+            safety_settings=self.safety_settings
+        )
 
-                if not function_calls:
-                    # No more function calls, we're done
-                    break
+        # Start chat session with history (manual function calling for async support)
+        chat = model.start_chat(history=self._chat_history(history))
+
+        # Send initial message
+        response, chat = await self._send_message(model, chat, user_message, iteration=0, deadline=deadline)
+
+        # Collect function call results
+        function_responses = []
+
+        # Process function calls manually (supports async)
+        max_iterations = 5  # Prevent infinite loops
+        iteration = 0
 
+        while iteration < max_iterations:
+            # Check if model wants to call functions
+            if not response.candidates:
+                break
+
+            parts = response.candidates[0].content.parts
+            function_calls = [p for p in parts if hasattr(p, 'function_call')]
+
+            if not function_calls:
+                # No more function calls, we're done
+                break
+
+            with tracer.start_span("agent.iteration", iteration=iteration, function_calls=len(function_calls)):
                 # Execute each function call
                 for part in function_calls:
                     fc = part.function_call
@@ -322,69 +825,62 @@ class GeminiAgent:
                         try:
                             func_args = {k: v for k, v in fc.args.items()}
                         except Exception as e:
-                            print(f"Args conversion error: {e}, type: {type(fc.args)}")
+                            logger.warning("Args conversion error", extra={"fields": {
+                                "error": str(e), "args_type": type(fc.args).__name__
+                            }})
                             func_args = {}
 
-                    # 🔍 DEBUG: 함수 호출 로그
-                    print(f"🔧 Calling function: {func_name}")
-                    print(f"📝 Arguments: {func_args}")
+                    logger.info("Calling function", extra={"fields": {
+                        "function": func_name, "iteration": iteration
+                    }})
+                    logger.debug("Function arguments", extra={"fields": {"args": func_args}})
 
                     # Execute async function
                     if func_name in self.function_map:
-                        result = await self.function_map[func_name](**func_args)
-                        print(f"✅ Result: {result}")
-
-                        actions_taken.append({
-                            "tool": func_name,
-                            "result": result
-                        })
-
-                        # Track updated listings
-                        if result.get("success") and result.get("listing_id"):
-                            updated_listings.add(result["listing_id"])
+                        result = await self._run_tool(
+                            func_name, func_args, seller_id, actions_taken, updated_listings
+                        )
 
                         # Prepare function response for model
                         function_responses.append(
-                            genai.protos.Part(
-                                function_response=genai.protos.FunctionResponse(
-                                    name=func_name,
-                                    response={"result": result}
-                                )
-                            )
+                            self.function_response_part(func_name, {"result": result})
                         )
 
                 # Send function results back to model
                 if function_responses:
-                    response = chat.send_message(function_responses)
+                    response, chat = await self._send_message(
+                        model, chat, function_responses, iteration=iteration + 1, deadline=deadline
+                    )
                     function_responses = []
 
-                iteration += 1
+            iteration += 1
 
-            # Get final text response
-            final_response = response.text if response.candidates else "처리 완료"
+        AGENT_ITERATIONS.inc(iteration)
+        AGENT_ITERATION_BUDGET.inc(max_iterations)
+        if iteration >= max_iterations:
+            AGENT_ITERATION_LIMIT_HITS.inc()
 
-            return {
-                "intent": "AUTO_DETECTED",  # Function calling handles this
-                "response": final_response,
-                "reasoning": "Function calling으로 자동 처리됨",
-                "actions_taken": actions_taken,
-                "suggested_actions": [],  # 추가: 빈 배열로 초기화
-                "updated_listings": list(updated_listings)
-            }
+        # Get final text response
+        final_response = response.text if response.candidates else "처리 완료"
+        log_turn(user_message, [action["tool"] for action in actions_taken])
 
-        except Exception as e:
-            import traceback
-            print(f"Agent error: {e}")
-            traceback.print_exc()
-            return {
-                "intent": "ERROR",
-                "response": f"죄송합니다. 요청 처리 중 오류가 발생했습니다: {str(e)}",
-                "reasoning": f"에러: {str(e)}",
-                "actions_taken": [],
-                "suggested_actions": [],  # 추가: 빈 배열로 초기화
-                "updated_listings": []
-            }
+        return {
+            "intent": "AUTO_DETECTED",  # Function calling handles this
+            "response": final_response,
+            "reasoning": "Function calling으로 자동 처리됨",
+            "actions_taken": actions_taken,
+            "suggested_actions": suggest_actions(actions_taken, seller_id),
+            "updated_listings": list(updated_listings)
+        }
+
+
+# Global agent instance, created on first use
+_agent: Optional[GeminiAgent] = None
 
 
-# Global agent instance
-agent = GeminiAgent()
+def get_agent() -> GeminiAgent:
+    """Shared agent (constructing it is cheap; the SDK loads in warm_up)"""
+    global _agent
+    if _agent is None:
+        _agent = GeminiAgent()
+    return _agent
@@ -0,0 +1,88 @@
+"""
+Cold archive for closed listings
+Sold and deleted listings stay in the listings table forever otherwise, and
+every index, scan and VACUUM pays for them although active queries never
+read them. A background task moves the ones unchanged for ARCHIVE_AFTER_DAYS
+to listings_archive (same database file), ARCHIVE_BATCH_SIZE rows per
+transaction, so the hot table only holds what is still being worked on.
+
+Archived listings stay readable but no longer change:
+- Reads of non-active listings (status="sold", export of every status) go
+  through the listings_with_archive view.
+- get_market_stats adds the sold totals kept in listing_archive_stats, so
+  insights do not scan the archive.
+- get_listing_by_id(include_archived=True) finds them by ID; tools and
+  writes only see the hot table.
+"""
+import asyncio
+from typing import Optional
+
+from config import (
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_BATCH_SIZE,
+    ARCHIVE_BATCH_PAUSE_SECONDS,
+    ARCHIVE_START_DELAY_SECONDS,
+    ARCHIVE_INTERVAL_SECONDS,
+)
+from database import db
+from logger import get_logger
+from metrics import LISTINGS_ARCHIVED
+from tracing import tracer
+
+
+logger = get_logger("archiver")
+
+
+class ListingArchiver:
+    """Background task that moves closed listings to the archive in batched transactions"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the background loop (first run after ARCHIVE_START_DELAY_SECONDS)"""
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="listing-archiver")
+        logger.info("Listing archiver started", extra={"fields": {"after_days": ARCHIVE_AFTER_DAYS}})
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        await asyncio.sleep(ARCHIVE_START_DELAY_SECONDS)
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Listing archive run failed")
+            await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+    async def run_once(self, after_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """Archive every eligible listing, one batch per transaction; returns listings moved"""
+        total = 0
+        with tracer.start_span("archiver.run", after_days=after_days):
+            while True:
+                moved = await db.archive_closed_listings(after_days, batch_size)
+                if not moved:
+                    break
+                total += moved
+                LISTINGS_ARCHIVED.inc(moved)
+                # Short transactions with gaps: request writes never wait long for the lock
+                await asyncio.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+        if total:
+            logger.info("Archived closed listings", extra={"fields": {"listings": total}})
+        return total
+
+
+# Global archiver instance
+archiver = ListingArchiver()
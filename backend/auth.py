@@ -0,0 +1,48 @@
+"""
+Seller authentication
+Resolves the seller a request acts for; every listing query is scoped to it
+"""
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from config import DEFAULT_SELLER_ID, SELLER_TOKENS
+
+
+def resolve_seller_id(authorization: Optional[str], seller_header: Optional[str]) -> int:
+    """
+    Map request credentials to a seller ID
+
+    Args:
+        authorization: "Bearer <token>" header value
+        seller_header: X-Seller-ID header value (only trusted without SELLER_TOKENS)
+
+    Raises:
+        HTTPException: 401 for missing/unknown tokens, 400 for a malformed X-Seller-ID
+    """
+    if SELLER_TOKENS:
+        scheme, _, token = (authorization or "").partition(" ")
+        seller_id = SELLER_TOKENS.get(token.strip()) if scheme.lower() == "bearer" else None
+        if seller_id is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Invalid or missing seller token",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        return seller_id
+
+    # Demo mode: no tokens configured
+    if not seller_header:
+        return DEFAULT_SELLER_ID
+    try:
+        return int(seller_header)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Seller-ID must be an integer")
+
+
+async def current_seller(
+    authorization: Optional[str] = Header(None),
+    x_seller_id: Optional[str] = Header(None)
+) -> int:
+    """FastAPI dependency: seller ID of the current request"""
+    return resolve_seller_id(authorization, x_seller_id)
@@ -0,0 +1,178 @@
+"""
+Shared helpers for benchmark scripts
+Latency statistics, result storage and baseline comparison
+"""
+import json
+import math
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import BASE_DIR
+
+
+RESULTS_DIR = BASE_DIR / "bench_results"
+
+
+# === Statistics ===
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Linear-interpolated percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lower = math.floor(k)
+    upper = math.ceil(k)
+    if lower == upper:
+        return sorted_values[int(k)]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def mann_whitney_p(a: Sequence[float], b: Sequence[float]) -> float:
+    """Two-sided Mann-Whitney U test p-value (normal approximation, tie-corrected)"""
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    combined = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = rank
+        t = j - i + 1
+        tie_term += t ** 3 - t
+        i = j + 1
+    rank_sum_a = sum(r for r, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))) if n > 1 else 0
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2) / math.sqrt(variance)
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Summary statistics (milliseconds) for latencies given in seconds"""
+    values = sorted(v * 1000 for v in latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+# === Result storage ===
+
+def git_commit() -> str:
+    """Short commit hash of the working tree ("+dirty" if modified)"""
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=BASE_DIR, capture_output=True, text=True
+        ).stdout.strip()
+        return f"{sha}+dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_result(kind: str, payload: Dict[str, Any]) -> Path:
+    """Store a benchmark result as bench_results/<kind>/<timestamp>-<commit>.json"""
+    directory = RESULTS_DIR / kind
+    directory.mkdir(parents=True, exist_ok=True)
+    payload = dict(payload, kind=kind, commit=payload.get("commit") or git_commit())
+    payload.setdefault("timestamp", datetime.now().isoformat(timespec="seconds"))
+    stamp = payload["timestamp"].replace(":", "").replace("-", "")
+    path = directory / f"{stamp}-{payload['commit'].replace('+', '_')}.json"
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def load_result(kind: str, ref: str = "latest", exclude: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    Load a stored result
+
+    Args:
+        kind: Result kind (subdirectory)
+        ref: "latest", a file path, or a commit hash prefix
+        exclude: Result file to skip (usually the one just written)
+    """
+    candidate = Path(ref)
+    if ref != "latest" and candidate.is_file():
+        return json.loads(candidate.read_text(encoding="utf-8"))
+
+    directory = RESULTS_DIR / kind
+    if not directory.is_dir():
+        return None
+    files = sorted(p for p in directory.glob("*.json") if p != exclude)
+    if ref != "latest":
+        files = [p for p in files if p.stem.split("-", 1)[-1].startswith(ref)]
+    if not files:
+        return None
+    return json.loads(files[-1].read_text(encoding="utf-8"))
+
+
+def _lookup(data: Dict[str, Any], dotted: str) -> Optional[float]:
+    for part in dotted.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data if isinstance(data, (int, float)) else None
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    keys: Sequence[str],
+    higher_is_better: Sequence[str] = (),
+    threshold_percent: float = 10.0
+) -> List[Dict[str, Any]]:
+    """
+    Compare metrics between two results
+
+    Returns one row per key with baseline/current values, percent change and
+    whether the change is a regression beyond threshold_percent
+    """
+    rows = []
+    for key in keys:
+        old = _lookup(baseline, key)
+        new = _lookup(current, key)
+        if old is None or new is None:
+            continue
+        change = ((new - old) / old * 100) if old else 0.0
+        worse = -change if key in higher_is_better else change
+        rows.append({
+            "metric": key,
+            "baseline": old,
+            "current": new,
+            "change_percent": round(change, 1),
+            "regression": worse > threshold_percent,
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], baseline_commit: str):
+    """Print a comparison table"""
+    print(f"\n📊 Compared to baseline {baseline_commit}")
+    print(f"   {'metric':<32} {'baseline':>12} {'current':>12} {'change':>9}")
+    for row in rows:
+        flag = "  ⚠️ regression" if row["regression"] else ""
+        print(
+            f"   {row['metric']:<32} {row['baseline']:>12.3f} {row['current']:>12.3f} "
+            f"{row['change_percent']:>+8.1f}%{flag}"
+        )
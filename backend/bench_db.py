@@ -0,0 +1,305 @@
+"""
+Micro-benchmarks for Database methods and tool functions
+Runs every case at several table sizes without the LLM in the loop and
+compares timings against a saved baseline (Mann-Whitney U test).
+
+Usage:
+    python bench_db.py                          # sizes 1000,10000
+    python bench_db.py --sizes 1000,100000 -k query_listings
+    python bench_db.py --compare latest         # flag significant regressions
+    python bench_db.py -k seller --snapshot     # seller reads from the in-memory snapshot
+    python bench_db.py --sizes 100000 -k none --memory   # bytes per listing held by a read
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+
+# === Benchmark registry ===
+
+CASES: List[Dict[str, Any]] = []
+
+
+def benchmark(name: str, group: str):
+    """Register an async benchmark case: fn(ctx) runs one operation"""
+    def decorator(fn: Callable) -> Callable:
+        CASES.append({"name": name, "group": group, "fn": fn})
+        return fn
+    return decorator
+
+
+class BenchContext:
+    """State shared by cases for one table size"""
+
+    def __init__(self, db, size: int, seed: int):
+        self.db = db
+        self.size = size
+        self.rng = random.Random(seed)
+
+    def random_id(self) -> int:
+        return self.rng.randint(1, self.size)
+
+
+QUERY_FILTERS = {
+    "all": {},
+    "category": {"category": "전자기기"},
+    "region": {"region": "강남구"},
+    "category+region": {"category": "가구", "region": "서초구"},
+    "exact_day_ago=1": {"exact_day_ago": 1},
+    "days_ago=7": {"days_ago": 7},
+}
+
+QUERY_SORTS = {
+    "created_at": ("created_at", "DESC"),
+    "last_boosted_at": ("last_boosted_at", "DESC"),
+    "price_asc": ("price", "ASC"),
+}
+
+
+def _register_cases():
+    import tools
+    from config import DEFAULT_SELLER_ID
+
+    # --- Database reads ---
+    @benchmark("get_listing_by_id", "db")
+    async def _(ctx):
+        await ctx.db.get_listing_by_id(ctx.random_id())
+
+    for sort_name, (sort_by, sort_order) in QUERY_SORTS.items():
+        @benchmark(f"get_all_listings[{sort_name}]", "db")
+        async def _(ctx, sort_by=sort_by, sort_order=sort_order):
+            await ctx.db.get_all_listings(sort_by=sort_by, sort_order=sort_order)
+
+    for filter_name, filters in QUERY_FILTERS.items():
+        for sort_name, (sort_by, sort_order) in QUERY_SORTS.items():
+            @benchmark(f"query_listings[{filter_name},{sort_name}]", "db")
+            async def _(ctx, filters=filters, sort_by=sort_by, sort_order=sort_order):
+                await ctx.db.query_listings(sort_by=sort_by, sort_order=sort_order, **filters)
+
+    # Seller-scoped (what the agent and /listings send; served by the snapshot with --snapshot)
+    @benchmark("get_all_listings[seller,last_boosted_at]", "db")
+    async def _(ctx):
+        await ctx.db.get_all_listings(sort_by="last_boosted_at", seller_id=DEFAULT_SELLER_ID)
+
+    for filter_name, filters in QUERY_FILTERS.items():
+        @benchmark(f"query_listings[seller,{filter_name}]", "db")
+        async def _(ctx, filters=filters):
+            await ctx.db.query_listings(sort_by="last_boosted_at", seller_id=DEFAULT_SELLER_ID, **filters)
+
+    @benchmark("get_boost_eligible_listings", "db")
+    async def _(ctx):
+        await ctx.db.get_boost_eligible_listings()
+
+    # --- Database writes ---
+    @benchmark("create_listing", "db")
+    async def _(ctx):
+        await ctx.db.create_listing("벤치마크 매물", "내용", 10000, "기타", "기타")
+
+    @benchmark("update_price", "db")
+    async def _(ctx):
+        await ctx.db.update_price(ctx.random_id(), ctx.rng.randint(1, 100) * 1000)
+
+    @benchmark("update_content", "db")
+    async def _(ctx):
+        await ctx.db.update_content(ctx.random_id(), title="수정된 제목")
+
+    @benchmark("boost_listing", "db")
+    async def _(ctx):
+        await ctx.db.boost_listing(ctx.random_id())
+
+    @benchmark("update_status", "db")
+    async def _(ctx):
+        await ctx.db.update_status(ctx.random_id(), "active")
+
+    # --- Tools (wrappers incl. validation, instrumentation and result building) ---
+    @benchmark("tool.query_listings[category]", "tools")
+    async def _(ctx):
+        await tools.query_listings(category="전자기기")
+
+    @benchmark("tool.query_listings[exact_day_ago=1]", "tools")
+    async def _(ctx):
+        await tools.query_listings(exact_day_ago=1)
+
+    @benchmark("tool.adjust_price", "tools")
+    async def _(ctx):
+        await tools.adjust_price(ctx.random_id(), ctx.rng.randint(1, 100) * 1000)
+
+    @benchmark("tool.boost_listing", "tools")
+    async def _(ctx):
+        # Mostly exercises the cooldown path once rows have been boosted
+        await tools.boost_listing(ctx.random_id())
+
+    @benchmark("tool.boost_eligible_listings[dry_run]", "tools")
+    async def _(ctx):
+        await tools.boost_eligible_listings(dry_run=True)
+
+    @benchmark("tool.update_content", "tools")
+    async def _(ctx):
+        await tools.update_content(ctx.random_id(), content="수정된 내용")
+
+    @benchmark("tool.get_market_insights", "tools")
+    async def _(ctx):
+        await tools.get_market_insights("전자기기", "강남구")
+
+
+async def run_case(case, ctx, min_time: float, min_rounds: int, max_rounds: int) -> List[float]:
+    """Run one case until min_time has elapsed (bounded by min/max rounds)"""
+    fn = case["fn"]
+    await fn(ctx)  # warmup
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_rounds and (
+        len(samples) < min_rounds or time.perf_counter() - started < min_time
+    ):
+        start = time.perf_counter()
+        await fn(ctx)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def measure_memory(db) -> Dict[str, Any]:
+    """Bytes per row retained by a get_all_listings result, as returned (ListingRecords) and as dicts"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        rows = await db.get_all_listings()
+        as_records, _ = tracemalloc.get_traced_memory()
+        dicts = [row.to_dict() for row in rows]
+        del rows
+        gc.collect()
+        as_dicts, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    count = max(len(dicts), 1)
+    # Both figures include the column values (shared between the two forms)
+    return {
+        "rows": len(dicts),
+        "record_bytes_per_row": round((as_records - start) / count, 1),
+        "dict_bytes_per_row": round((as_dicts - start) / count, 1),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Database/tool micro-benchmarks")
+    parser.add_argument("--sizes", default="1000,10000", help="Comma separated table sizes")
+    parser.add_argument("-k", "--filter", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds per case")
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--max-rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dir", help="Directory for the benchmark databases (default: temporary)")
+    parser.add_argument("--compare", help="Baseline: 'latest', commit prefix or file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Minimum median change (%%) to report")
+    parser.add_argument("--alpha", type=float, default=0.01, help="Significance level")
+    parser.add_argument("--snapshot", action="store_true", help="Enable the in-memory listing snapshot (needs numpy)")
+    parser.add_argument("--query-cache", action="store_true", help="Keep the Database query cache on (repeated reads become hits)")
+    parser.add_argument("--memory", action="store_true", help="Also report bytes per listing held by get_all_listings")
+    parser.add_argument("--no-save", action="store_true")
+    return parser.parse_args()
+
+
+async def run(args) -> int:
+    from bench_common import (
+        summarize, save_result, load_result, mann_whitney_p, percentile
+    )
+    from database import db
+    from init_db import seed_synthetic
+
+    _register_cases()
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    cases = [c for c in CASES if args.filter in c["name"]]
+    base_dir = Path(args.dir or tempfile.mkdtemp(prefix="jol-micro-"))
+    base_dir.mkdir(parents=True, exist_ok=True)
+
+    results: Dict[str, Any] = {}
+    for size in sizes:
+        # Tools use the global db instance, so point it at this size's file
+        db.db_path = str(base_dir / f"bench-{size}.db")
+        await seed_synthetic(size, seed=args.seed)
+        print(f"\n📦 {size:,} listings")
+        print(f"   {'case':<48} {'median':>10} {'iqr':>10} {'ops/s':>9} {'n':>5}")
+
+        for case in cases:
+            ctx = BenchContext(db, size, args.seed)
+            samples = await run_case(case, ctx, args.min_time, args.min_rounds, args.max_rounds)
+            stats = summarize(samples)
+            ordered = sorted(s * 1000 for s in samples)
+            stats["iqr_ms"] = round(percentile(ordered, 75) - percentile(ordered, 25), 3)
+            stats["samples_ms"] = [round(s * 1000, 4) for s in samples]
+            key = f"{case['name']}@{size}"
+            results[key] = stats
+            print(f"   {case['name']:<48} {stats['p50_ms']:>8.3f}ms {stats['iqr_ms']:>8.3f}ms "
+                  f"{1000 / stats['p50_ms'] if stats['p50_ms'] else 0:>9.0f} {stats['count']:>5}")
+
+        if args.memory:
+            memory = await measure_memory(db)
+            results[f"memory[get_all_listings]@{size}"] = memory
+            saved_pct = (1 - memory["record_bytes_per_row"] / memory["dict_bytes_per_row"]) * 100 if memory["dict_bytes_per_row"] else 0
+            print(f"   {'memory[get_all_listings] ' + format(memory['rows'], ',') + ' rows':<48} "
+                  f"{memory['record_bytes_per_row']:>7.0f} B/row as records, "
+                  f"{memory['dict_bytes_per_row']:.0f} B/row as dicts ({saved_pct:.0f}% less)")
+
+    payload = {
+        "params": {
+            "sizes": sizes, "seed": args.seed, "filter": args.filter,
+            "snapshot": args.snapshot, "query_cache": args.query_cache, "memory": args.memory,
+        },
+        "results": results,
+    }
+    saved = None
+    if not args.no_save:
+        saved = save_result("micro", payload)
+        print(f"\n💾 Saved {saved}")
+
+    if not args.compare:
+        return 0
+
+    baseline = load_result("micro", args.compare, exclude=saved)
+    if baseline is None:
+        print(f"\n⚠️ No baseline found for '{args.compare}'")
+        return 0
+
+    regressions = 0
+    print(f"\n📊 Compared to baseline {baseline.get('commit', '?')} "
+          f"(alpha={args.alpha}, threshold={args.threshold}%)")
+    for key, stats in results.items():
+        old = baseline["results"].get(key)
+        if not old or not old.get("p50_ms"):
+            continue
+        change = (stats["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+        p_value = mann_whitney_p(stats["samples_ms"], old.get("samples_ms", []))
+        significant = p_value < args.alpha and abs(change) >= args.threshold
+        if not significant:
+            continue
+        marker = "⚠️ slower" if change > 0 else "✅ faster"
+        if change > 0:
+            regressions += 1
+        print(f"   {key:<56} {old['p50_ms']:>9.3f} → {stats['p50_ms']:>9.3f}ms "
+              f"{change:>+7.1f}% p={p_value:.1e} {marker}")
+    if regressions == 0:
+        print("   no significant regressions")
+    return 1 if regressions else 0
+
+
+def main():
+    args = parse_args()
+    # Never touch the real database: the global instance is repointed per size
+    os.environ["JOL_DATABASE_PATH"] = str(Path(tempfile.gettempdir()) / "jol-micro-unused.db")
+    os.environ.setdefault("JOL_LOG_LEVEL", "WARNING")
+    os.environ["JOL_LISTING_SNAPSHOT"] = "1" if args.snapshot else "0"
+    if not args.query_cache:
+        os.environ["JOL_QUERY_CACHE_SIZE"] = "0"
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+End-to-end load test for /chat and /listings
+Seeds a synthetic dataset, runs the app in-process with the stub LLM
+(fake_llm.py) and drives concurrent traffic with a Korean command mix.
+
+Usage:
+    python bench_e2e.py --listings 10000 --requests 500 --concurrency 16
+    python bench_e2e.py --listings 100000 --llm-latency-ms 300 --compare latest
+    python bench_e2e.py --url http://localhost:8000   # against a running server
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+
+# Realistic command mix (weight, message)
+CHAT_COMMANDS = [
+    (20, "내 매물 보여줘"),
+    (15, "어제 올린 물건 보여줘"),
+    (10, "최근 3일 전자기기 매물 조회해줘"),
+    (10, "어제 올린 물건 가격 10% 낮춰줘"),
+    (10, "가장 오래된 매물 끌어올려줘"),
+    (8, "전자기기 강남구 시세 알려줘"),
+    (7, "가구 서초구 시세 알려줘"),
+    (5, "오늘 올린 의류 보여줘"),
+    (5, "제목 좀 더 매력적으로 바꿔줘"),
+    (5, "최근 7일 가구 가격 5% 인하해줘"),
+    (5, "안녕! 뭘 도와줄 수 있어?"),
+]
+
+# /listings query variants (app.js loads with last_boosted_at DESC)
+LISTINGS_QUERIES = [
+    (70, {"sort_by": "last_boosted_at", "sort_order": "DESC"}),
+    (15, {"sort_by": "created_at", "sort_order": "DESC"}),
+    (10, {"sort_by": "price", "sort_order": "ASC"}),
+    (5, {"status": "sold"}),
+]
+
+
+def _weighted(rng: random.Random, choices):
+    weights = [w for w, _ in choices]
+    return rng.choices([c for _, c in choices], weights=weights, k=1)[0]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-end /chat and /listings benchmark")
+    parser.add_argument("--listings", type=int, default=10000, help="Seeded listings (10k-1M)")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--chat-ratio", type=float, default=0.5, help="Share of /chat requests (rest is /listings)")
+    parser.add_argument("--llm-latency-ms", type=int, default=0, help="Simulated LLM latency per round trip")
+    parser.add_argument("--sellers", type=int, default=1, help="Sellers owning the seeded listings")
+    parser.add_argument("--shards", type=int, default=1, help="SQLite shard files (sellers are hashed across them)")
+    parser.add_argument("--agent-mode", choices=("tools", "plan"), default="tools", help="Function-calling loop or one-call plan mode")
+    parser.add_argument("--tool-selection", choices=("on", "off"), default="on", help="Send only the tools the local classifier predicts")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and traffic")
+    parser.add_argument("--db", help="SQLite file to use (default: temporary file)")
+    parser.add_argument("--reuse-db", action="store_true", help="Do not reseed --db if it already has data")
+    parser.add_argument("--url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--compare", help="Baseline to compare with: 'latest', commit prefix or file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    parser.add_argument("--no-save", action="store_true", help="Do not store the result")
+    return parser.parse_args()
+
+
+async def drive_traffic(client, args, rng: random.Random):
+    """Send args.requests requests from args.concurrency workers"""
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    remaining = args.requests
+    lock = asyncio.Lock()
+
+    # Pre-draw the request sequence so runs are reproducible
+    plan = []
+    for _ in range(args.requests):
+        headers = {"X-Seller-ID": str(rng.randint(1, args.sellers))} if args.sellers > 1 else {}
+        if rng.random() < args.chat_ratio:
+            plan.append(("chat", _weighted(rng, CHAT_COMMANDS), headers))
+        else:
+            plan.append(("listings", _weighted(rng, LISTINGS_QUERIES), headers))
+
+    async def worker():
+        nonlocal remaining
+        while True:
+            async with lock:
+                if remaining <= 0:
+                    return
+                remaining -= 1
+                endpoint, payload, headers = plan[remaining]
+
+            start = time.perf_counter()
+            try:
+                if endpoint == "chat":
+                    response = await client.post("/chat", json={"message": payload, "history": []}, headers=headers)
+                else:
+                    response = await client.get("/listings", params=payload, headers=headers)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            samples[endpoint].append(time.perf_counter() - start)
+            if not ok:
+                errors[endpoint] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return samples, errors, time.perf_counter() - started
+
+
+async def run(args):
+    import httpx
+    from bench_common import summarize, save_result, load_result, compare_results, print_comparison
+
+    rng = random.Random(args.seed)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+            samples, errors, duration = await drive_traffic(client, args, rng)
+        db_totals = None
+    else:
+        import main
+        from database import db
+        from init_db import seed_synthetic
+        from metrics import DB_COMMITS, DB_QUERY_SECONDS, LLM_CALL_SECONDS, LLM_TOKENS, QUERY_CACHE_REQUESTS, SINGLEFLIGHT_CALLS
+
+        def cache_lookups(outcome: str) -> float:
+            return sum(
+                QUERY_CACHE_REQUESTS.value(method=method, outcome=outcome)
+                for method in ("query_listings", "get_all_listings", "get_market_stats")
+            )
+
+        await db.init_db()
+        if not (args.reuse_db and await db.get_all_listings()):
+            print(f"🌱 Seeding {args.listings:,} listings into {db.db_path} ...")
+            seed_start = time.perf_counter()
+            await seed_synthetic(args.listings, seed=args.seed, sellers=args.sellers)
+            print(f"   done in {time.perf_counter() - seed_start:.1f}s")
+
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+                db_before = DB_QUERY_SECONDS.totals()
+                llm_before = LLM_CALL_SECONDS.totals()
+                prompt_before = LLM_TOKENS.value(kind="prompt")
+                commits_before = sum(DB_COMMITS.value(scope=scope) for scope in ("statement", "unit_of_work"))
+                hits_before, misses_before = cache_lookups("hit"), cache_lookups("miss")
+                shared_before = sum(SINGLEFLIGHT_CALLS.value(name=name, role="follower") for name in ("db", "listings"))
+                samples, errors, duration = await drive_traffic(client, args, rng)
+                db_after = DB_QUERY_SECONDS.totals()
+                llm_after = LLM_CALL_SECONDS.totals()
+                prompt_tokens = LLM_TOKENS.value(kind="prompt") - prompt_before
+                commits = sum(DB_COMMITS.value(scope=scope) for scope in ("statement", "unit_of_work")) - commits_before
+                hits = cache_lookups("hit") - hits_before
+                lookups = hits + cache_lookups("miss") - misses_before
+                shared = sum(SINGLEFLIGHT_CALLS.value(name=name, role="follower") for name in ("db", "listings")) - shared_before
+        db_totals = {
+            "queries": db_after["count"] - db_before["count"],
+            "total_s": round(db_after["sum"] - db_before["sum"], 4),
+            "per_request_ms": round((db_after["sum"] - db_before["sum"]) * 1000 / max(args.requests, 1), 3),
+            "commits_per_chat": round(commits / max(len(samples["chat"]), 1), 3),
+            "query_cache_hit_rate": round(hits / lookups, 3) if lookups else 0,
+            "coalesced_reads": shared,
+            "llm_total_s": round(llm_after["sum"] - llm_before["sum"], 4),
+            "llm_calls": llm_after["count"] - llm_before["count"],
+            "llm_call_ms": round(
+                (llm_after["sum"] - llm_before["sum"]) * 1000 / max(llm_after["count"] - llm_before["count"], 1), 2
+            ),
+            "prompt_tokens_per_chat": round(prompt_tokens / max(len(samples["chat"]), 1), 1),
+        }
+
+    all_samples = [s for values in samples.values() for s in values]
+    result = {
+        "params": {
+            "listings": args.listings, "requests": args.requests, "concurrency": args.concurrency,
+            "chat_ratio": args.chat_ratio, "llm_latency_ms": args.llm_latency_ms, "seed": args.seed,
+            "sellers": args.sellers, "shards": args.shards, "agent_mode": args.agent_mode,
+            "tool_selection": args.tool_selection,
+            "target": args.url or "in-process",
+        },
+        "results": {
+            "chat": summarize(samples["chat"]),
+            "listings": summarize(samples["listings"]),
+            "overall": dict(
+                summarize(all_samples),
+                duration_s=round(duration, 3),
+                throughput_rps=round(len(all_samples) / duration, 2) if duration else 0,
+                errors=sum(errors.values()),
+            ),
+        },
+    }
+    if db_totals is not None:
+        result["results"]["db"] = db_totals
+
+    # Report
+    print(f"\n⏱️  {len(all_samples)} requests in {duration:.2f}s "
+          f"({result['results']['overall']['throughput_rps']} req/s, {args.concurrency} clients)")
+    for name in ("chat", "listings", "overall"):
+        stats = result["results"][name]
+        if stats.get("count"):
+            print(f"   {name:<9} n={stats['count']:<5} p50={stats['p50_ms']:.1f}ms "
+                  f"p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms")
+    if db_totals is not None:
+        print(f"   db        {db_totals['queries']} queries, {db_totals['total_s']:.3f}s total, "
+              f"{db_totals['per_request_ms']:.2f}ms per request, {db_totals['commits_per_chat']:.2f} commits per chat, "
+              f"{db_totals['query_cache_hit_rate']:.0%} query cache hits, {db_totals['coalesced_reads']:.0f} coalesced reads")
+        print(f"   llm       {db_totals['llm_calls']} calls, {db_totals['llm_call_ms']:.1f}ms per call, "
+              f"{db_totals['prompt_tokens_per_chat']:.0f} prompt tokens per chat")
+    if errors:
+        print(f"   ⚠️ errors: {dict(errors)}")
+
+    saved = None
+    if not args.no_save:
+        saved = save_result("e2e", result)
+        print(f"\n💾 Saved {saved}")
+
+    if args.compare:
+        baseline = load_result("e2e", args.compare, exclude=saved)
+        if baseline is None:
+            print(f"\n⚠️ No baseline found for '{args.compare}'")
+        else:
+            if baseline.get("params") != result["params"]:
+                print("\n⚠️ Baseline was recorded with different parameters")
+            rows = compare_results(
+                result, baseline,
+                keys=[
+                    "results.chat.p50_ms", "results.chat.p95_ms", "results.chat.p99_ms",
+                    "results.listings.p50_ms", "results.listings.p95_ms", "results.listings.p99_ms",
+                    "results.overall.throughput_rps", "results.db.per_request_ms",
+                    "results.db.prompt_tokens_per_chat",
+                ],
+                higher_is_better=["results.overall.throughput_rps"],
+                threshold_percent=args.threshold,
+            )
+            print_comparison(rows, baseline.get("commit", "?"))
+            if any(row["regression"] for row in rows):
+                return 1
+    return 0
+
+
+def main():
+    args = parse_args()
+
+    # Configure the app before it is imported
+    if not args.url:
+        db_path = args.db or str(Path(tempfile.mkdtemp(prefix="jol-bench-")) / "bench.db")
+        os.environ["JOL_DATABASE_PATH"] = db_path
+        if args.shards > 1:
+            os.environ["JOL_SHARD_COUNT"] = str(args.shards)
+            os.environ["JOL_SHARD_DIR"] = str(Path(db_path).parent / "shards")
+        os.environ["JOL_LLM_BACKEND"] = "fake"
+        os.environ["JOL_AGENT_MODE"] = args.agent_mode
+        os.environ["JOL_TOOL_SELECTION"] = "1" if args.tool_selection == "on" else "0"
+        os.environ["JOL_FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+        os.environ.setdefault("JOL_LOG_LEVEL", "WARNING")
+        # Synthetic clients share a few seller IDs; measure the app, not the rate limiter
+        os.environ.setdefault("JOL_CHAT_RATE_PER_MINUTE", "0")
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Cold start benchmark
+Measures, in fresh interpreters, how long a worker takes to import the
+server, finish startup (lifespan) and load the LLM backend.
+
+Usage:
+    python bench_startup.py                     # 7 runs
+    python bench_startup.py --runs 15 --compare latest
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# Phases reported by the probe, in order
+PHASES = ("import_s", "startup_s", "agent_ready_s")
+
+
+def _probe() -> None:
+    """Runs inside a fresh interpreter: prints phase timings as JSON"""
+    start = time.perf_counter()
+    import main
+    from agent_v2 import get_agent
+    imported = time.perf_counter()
+
+    async def startup():
+        async with main.lifespan(main.app):
+            ready = time.perf_counter()
+            await asyncio.to_thread(get_agent().warm_up)
+            return ready, time.perf_counter()
+
+    ready, agent_ready = asyncio.run(startup())
+    print(json.dumps({
+        "import_s": imported - start,
+        "startup_s": ready - start,
+        "agent_ready_s": agent_ready - start,
+        "heavy_modules": sorted(m for m in ("google.generativeai", "google.protobuf", "uvicorn") if m in sys.modules),
+    }))
+
+
+def probe_env(db_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("JOL_DATABASE_PATH", str(Path(db_dir) / "startup.db"))
+    env.setdefault("JOL_CACHE_CHANNEL_PATH", str(Path(db_dir) / "cache_channel.db"))
+    env.setdefault("JOL_SCHEDULER_ENABLED", "0")
+    env.setdefault("JOL_LOG_LEVEL", "WARNING")
+    return env
+
+
+def measure_import(runs: int = 3) -> List[float]:
+    """Seconds to `import main` in fresh interpreters (no lifespan)"""
+    db_dir = tempfile.mkdtemp(prefix="jol-startup-")
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND_DIR, env=probe_env(db_dir),
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return samples
+
+
+def run_probe(db_dir: str) -> Dict:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, __file__, "--probe"], cwd=BACKEND_DIR, env=probe_env(db_dir),
+        capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - started
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Worker cold start benchmark")
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters to measure")
+    parser.add_argument("--compare", help="Baseline: 'latest', commit prefix or file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.probe:
+        _probe()
+        return 0
+
+    from bench_common import summarize, save_result, load_result, compare_results, print_comparison
+
+    db_dir = tempfile.mkdtemp(prefix="jol-startup-")
+    probes = [run_probe(db_dir) for _ in range(args.runs)]
+
+    results = {}
+    print(f"⏱️  {args.runs} cold starts")
+    for phase in PHASES + ("process_s",):
+        stats = summarize([p[phase] for p in probes])
+        results[phase] = stats
+        print(f"   {phase:<14} p50={stats['p50_ms']:8.1f}ms max={stats['max_ms']:8.1f}ms")
+    heavy = probes[-1]["heavy_modules"]
+    print(f"   loaded after agent warm-up: {', '.join(heavy) or '-'}")
+
+    payload = {"params": {"runs": args.runs}, "results": results}
+    saved = None
+    if not args.no_save:
+        saved = save_result("startup", payload)
+        print(f"\n💾 Saved {saved}")
+
+    if args.compare:
+        baseline = load_result("startup", args.compare, exclude=saved)
+        if baseline is None:
+            print(f"\n⚠️ No baseline found for '{args.compare}'")
+            return 0
+        rows = compare_results(
+            payload, baseline,
+            keys=[f"results.{phase}.p50_ms" for phase in PHASES],
+            threshold_percent=args.threshold
+        )
+        print_comparison(rows, baseline.get("commit", "?"))
+        return 1 if any(row["regression"] for row in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
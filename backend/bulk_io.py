@@ -0,0 +1,166 @@
+"""
+Streaming NDJSON/CSV helpers for bulk listing import and export
+"""
+import codecs
+import csv
+import io
+import json
+import re
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from pydantic import ValidationError
+
+
+# Guard against a client sending one endless line
+MAX_LINE_CHARS = 1_000_000
+
+# Columns written by the CSV export (same order as the listings table)
+EXPORT_COLUMNS = (
+    "id", "title", "content", "price", "category", "region", "image_url", "status",
+    "created_at", "updated_at", "last_boosted_at", "boost_count", "boost_eligible_at",
+)
+
+# (line number, parsed record or None, error message or None)
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+# Characters that change CSV quoting state (default dialect)
+_CSV_QUOTING = re.compile(r'[",]')
+
+
+# === Import ===
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded text lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        if "\n" not in buffer:
+            if len(buffer) > MAX_LINE_CHARS:
+                raise ValueError(f"Line exceeds {MAX_LINE_CHARS} characters")
+            continue
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """Parse one JSON object per line"""
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"JSON 파싱 오류: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "각 줄은 JSON 객체여야 합니다."
+            continue
+        yield line_no, record, None
+
+
+def _ends_in_quotes(line: str, in_quotes: bool) -> bool:
+    """Whether a quoted field is still open after this line (in_quotes: open before it)"""
+    field_start, quoted = 0, in_quotes
+    for match in _CSV_QUOTING.finditer(line):
+        position = match.start()
+        if match.group() == ",":
+            if not in_quotes:
+                field_start, quoted = position + 1, False
+        elif quoted:
+            # Inside a quoted field every quote toggles ("" is an escaped quote)
+            in_quotes = not in_quotes
+        elif position == field_start:
+            quoted = in_quotes = True
+    return in_quotes
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """Parse CSV with a header row; quoted fields may span lines (line numbers are a record's first line)"""
+    header: Optional[Sequence[str]] = None
+    line_no = 0
+    # Lines of a record whose quoted field is still open, their size, and where it began
+    pending: List[str] = []
+    pending_chars = 0
+    start_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not pending:
+            if not line.strip():
+                continue
+            start_no = line_no
+        pending.append(line)
+        pending_chars += len(line) + 1
+        # Each line is scanned once; the record is parsed once it is complete
+        if _ends_in_quotes(line, in_quotes=len(pending) > 1):
+            if pending_chars <= MAX_LINE_CHARS:
+                continue
+            pending, pending_chars = [], 0
+            yield start_no, None, f"CSV 파싱 오류: 레코드가 {MAX_LINE_CHARS}자를 넘습니다."
+            continue
+        text = "\n".join(pending)
+        pending, pending_chars = [], 0
+        try:
+            values = next(csv.reader(io.StringIO(text + "\n"), strict=True))
+        except csv.Error as e:
+            yield start_no, None, f"CSV 파싱 오류: {e}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start_no, None, f"컬럼 수가 헤더와 다릅니다 ({len(values)} != {len(header)})"
+            continue
+        yield start_no, dict(zip(header, values)), None
+    if pending:
+        yield start_no, None, "CSV 파싱 오류: 따옴표가 닫히지 않았습니다."
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """Compact one-line description of a pydantic ValidationError"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+# === Export ===
+
+async def encode_ndjson(rows: AsyncIterator[Mapping[str, Any]], rows_per_chunk: int = 500) -> AsyncIterator[str]:
+    """Encode rows (dicts or other mappings, e.g. ListingRecord) as NDJSON, yielding a chunk every rows_per_chunk rows"""
+    chunk = []
+    async for row in rows:
+        chunk.append(json.dumps(row, ensure_ascii=False, default=dict))
+        if len(chunk) >= rows_per_chunk:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+async def encode_csv(
+    rows: AsyncIterator[Sequence[Any]],
+    columns: Sequence[str] = EXPORT_COLUMNS,
+    rows_per_chunk: int = 500
+) -> AsyncIterator[str]:
+    """Encode rows (values in columns order) as CSV with a header, yielding a chunk every rows_per_chunk rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    async for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue()
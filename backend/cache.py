@@ -0,0 +1,134 @@
+"""
+Cross-process cache coherence
+Workers keep their own in-process caches; a tiny SQLite file holding
+version counters is the invalidation channel between them. Writers bump a
+key's version, readers tag cache entries with the version they were built
+from. `PRAGMA data_version` tells a reader whether any other process has
+committed since its last look, so an unchanged channel costs no query.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from config import CACHE_CHANNEL_PATH
+
+
+# Version keys
+ALL_LISTINGS = "listings:*"  # Bumped by writes that may touch any seller
+RULES = "rules"
+EPOCH = "epoch"  # Bumped along with every other key: "did anything change since?"
+MARKET_UNTAGGED = "market:untagged"  # Writes whose rows' category/region are unknown
+
+
+def listings_key(seller_id: Optional[int]) -> str:
+    """Version key for a seller's listings (None -> every seller)"""
+    return ALL_LISTINGS if seller_id is None else f"listings:{seller_id}"
+
+
+def listings_tag_key(seller_id: int, field: str, value: str) -> str:
+    """Version key for a seller's listings in one category or region"""
+    return f"listings:{seller_id}:{field}:{value}"
+
+
+def listings_untagged_key(seller_id: int) -> str:
+    """Version key bumped by a seller's writes whose rows' category/region are unknown"""
+    return f"listings:{seller_id}:untagged"
+
+
+def market_key(category: str, region: str) -> str:
+    """Version key for every seller's listings in a category and region"""
+    return f"market:{category}:{region}"
+
+
+class VersionChannel:
+    """Monotonic version counters shared by every process through one SQLite file"""
+
+    def __init__(self, path: str = CACHE_CHANNEL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._data_version: Optional[int] = None
+        self._versions: Dict[str, int] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross fork(): reopen in each worker
+        if self._conn is None or self._pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_versions (
+                    key TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            """)
+            self._conn, self._pid = conn, os.getpid()
+            self._data_version = None
+            self._versions = {}
+        return self._conn
+
+    def get(self, key: str) -> int:
+        """Current version of key (0 if never bumped)"""
+        with self._lock:
+            conn = self._connection()
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                # Another process committed: forget what we knew
+                self._versions.clear()
+                self._data_version = data_version
+            if key not in self._versions:
+                row = conn.execute("SELECT version FROM cache_versions WHERE key = ?", (key,)).fetchone()
+                self._versions[key] = row[0] if row else 0
+            return self._versions[key]
+
+    def bump(self, *keys: str) -> None:
+        """Invalidate every cache entry built from these keys, in all processes"""
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("""
+                INSERT INTO cache_versions (key, version) VALUES (?, 1)
+                ON CONFLICT(key) DO UPDATE SET version = version + 1
+            """, [(key,) for key in (*keys, EPOCH)])
+            # Our own commits do not change data_version, so refresh these keys directly
+            for key in (*keys, EPOCH):
+                self._versions[key] = conn.execute(
+                    "SELECT version FROM cache_versions WHERE key = ?", (key,)
+                ).fetchone()[0]
+
+    def listings_version(self, seller_id: int) -> str:
+        """Combined version of a seller's listings (global and per-seller counters)"""
+        return f"{self.get(ALL_LISTINGS)}.{self.get(listings_key(seller_id))}"
+
+
+class VersionedCache:
+    """Small LRU cache whose entries are valid only for the version they were stored with"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, version: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, version: Any, value: Any) -> int:
+        """Store value; returns how many least recently used entries were evicted"""
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+
+# Global channel instance
+versions = VersionChannel()
@@ -0,0 +1,24 @@
+"""
+Shared pytest fixtures: a fresh Database and version channel per test (never the ones in data/)
+"""
+import asyncio
+
+import pytest
+
+from cache import versions, VersionedCache
+from database import Database
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Empty Database in tmp_path with the query cache on and its own cache version channel"""
+    monkeypatch.setattr(versions, "path", str(tmp_path / "cache_channel.db"))
+    monkeypatch.setattr(versions, "_conn", None)
+    database = Database(str(tmp_path / "jol.db"))
+    database.snapshot = None
+    database.query_cache = VersionedCache(64)
+    asyncio.run(database.init_db())
+    yield database
+    if versions._conn is not None:
+        versions._conn.close()
+        versions._conn = None
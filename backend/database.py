@@ -3,12 +3,191 @@ Database operations for JOL AI Agent
 SQLite with async support
 """
 import aiosqlite
+import asyncio
+import bisect
+import functools
+import hashlib
+import heapq
+import inspect
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Callable, Iterable, Sequence, Tuple, Union
 from pathlib import Path
 
-from config import DATABASE_PATH
+from config import (
+    DATABASE_PATH, BOOST_COOLDOWN_HOURS, DEFAULT_SELLER_ID,
+    SHARD_COUNT, SHARD_DIR, SHARD_VNODES, SHARD_ID_STRIDE, LISTING_SNAPSHOT,
+    QUERY_CACHE_SIZE, QUERY_CACHE_MAX_ROWS
+)
+from metrics import instrument_db, DB_COMMITS, QUERY_CACHE_REQUESTS, QUERY_CACHE_EVICTIONS
+from tracing import tracer
+from cache import (
+    versions, VersionedCache, listings_key, listings_tag_key, listings_untagged_key, market_key,
+    ALL_LISTINGS, RULES, EPOCH, MARKET_UNTAGGED
+)
+from unit_of_work import current_unit_of_work
+from singleflight import SingleFlight
+from listing_record import ListingRecord, LISTING_COLUMNS, LISTING_SELECT, fetch_listings
+import listing_snapshot
+
+
+# SQLite datetime() modifier for the boost cooldown
+BOOST_COOLDOWN_MODIFIER = f"+{BOOST_COOLDOWN_HOURS} hours"
+
+
+
+def _tag_keys(seller_id: int, tags: Optional[List[Tuple[str, str]]]) -> List[str]:
+    """Version keys of a seller's write touching rows with these (category, region) tags (None: unknown)"""
+    if tags is None:
+        return [listings_untagged_key(seller_id), MARKET_UNTAGGED]
+    keys = []
+    for category, region in tags:
+        keys += [
+            listings_tag_key(seller_id, "category", category),
+            listings_tag_key(seller_id, "region", region),
+            market_key(category, region),
+        ]
+    return keys
+
+
+async def _written_tags(database: "Database", arguments: Dict[str, Any]) -> Optional[List[Tuple[str, str]]]:
+    """(category, region) of the rows a write touched, from its arguments or the row itself"""
+    if arguments.get("category") is not None and arguments.get("region") is not None:
+        return [(arguments["category"], arguments["region"])]
+    if arguments.get("listing_id") is not None:
+        tags = await database._listing_tags(arguments["listing_id"])
+        return [tags] if tags else []
+    return None
+
+
+def invalidates(*kinds: str):
+    """Decorator: after a successful write, bump the cache versions it affects
+
+    "listings" bumps the seller's listings version (every seller's when the
+    call has no seller_id) and, for the query cache, the category/region
+    versions of the rows it touched; "rules" bumps the rule schedule version.
+    Inside a unit of work the versions are bumped again once the write is
+    committed, so nothing cached from the old rows in between survives.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            result = await func(*args, **kwargs)
+            keys = []
+            if "listings" in kinds:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                seller_id = bound.arguments.get("seller_id")
+                keys.append(listings_key(seller_id))
+                if seller_id is not None:
+                    keys += _tag_keys(seller_id, await _written_tags(args[0], bound.arguments))
+            if "rules" in kinds:
+                keys.append(RULES)
+            versions.bump(*keys)
+            uow = current_unit_of_work()
+            if uow is not None:
+                uow.invalidate(*keys)
+            return result
+
+        return wrapper
+    return decorator
+
+
+def _listings_dependencies(arguments: Dict[str, Any]) -> Optional[List[str]]:
+    """Version keys a listings read depends on (None: not cached)"""
+    seller_id = arguments.get("seller_id")
+    if seller_id is None:
+        # Every seller's writes would invalidate it: not worth caching
+        return None
+    for field in ("category", "region"):
+        if arguments.get(field):
+            return [ALL_LISTINGS, listings_tag_key(seller_id, field, arguments[field]), listings_untagged_key(seller_id)]
+    return [ALL_LISTINGS, listings_key(seller_id)]
+
+
+def _market_dependencies(arguments: Dict[str, Any]) -> Optional[List[str]]:
+    return [ALL_LISTINGS, market_key(arguments["category"], arguments["region"]), MARKET_UNTAGGED]
+
+
+def _sees_latest(db_path: str) -> bool:
+    """Whether a read now reflects every write the cache versions account for
+
+    False inside a unit of work with queued writes, or whose read snapshot
+    began before the last version bump.
+    """
+    uow = current_unit_of_work()
+    if uow is None:
+        return True
+    epoch = uow.snapshot_epoch(db_path)
+    return not uow.has_pending(db_path) and (epoch is None or epoch == versions.get(EPOCH))
+
+
+def cached_read(dependencies: Callable[[Dict[str, Any]], Optional[List[str]]]):
+    """Decorator: serve a read method from the Database's query cache
+
+    Entries are keyed on the normalized arguments (defaults applied, sort
+    order upper-cased, today's UTC date for relative date filters) and stored
+    with the versions of the keys `dependencies` returns, so the writes that
+    bump those keys (see invalidates) are what evicts them. On a miss,
+    concurrent identical reads under the same versions share one query
+    (singleflight). Callers get their own list (and dicts); ListingRecords
+    are shared and read-only.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        method = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = {name: value for name, value in bound.arguments.items() if name != "self"}
+            keys = dependencies(arguments)
+            if keys is None:
+                return await func(self, *args, **kwargs)
+            if isinstance(arguments.get("sort_order"), str):
+                arguments["sort_order"] = arguments["sort_order"].upper()
+            if arguments.get("days_ago") is not None or arguments.get("exact_day_ago") is not None:
+                arguments["date"] = time.strftime("%Y-%m-%d", time.gmtime())
+            cache_key = (self.db_path, method, tuple(sorted(arguments.items())))
+            version = tuple(versions.get(key) for key in keys)
+
+            if self.query_cache is not None:
+                cached = self.query_cache.get(cache_key, version)
+                if cached is not None:
+                    QUERY_CACHE_REQUESTS.inc(method=method, outcome="hit")
+                    return _copy(cached)
+                QUERY_CACHE_REQUESTS.inc(method=method, outcome="miss")
+
+            async def fetch():
+                result = await func(self, *args, **kwargs)
+                # A unit of work reads from the snapshot its transaction began with:
+                # store only if nothing was bumped since then
+                fits = not isinstance(result, list) or len(result) <= QUERY_CACHE_MAX_ROWS
+                if self.query_cache is not None and fits and _sees_latest(self.db_path):
+                    evicted = self.query_cache.set(cache_key, version, _copy(result))
+                    if evicted:
+                        QUERY_CACHE_EVICTIONS.inc(evicted, method=method)
+                return result
+
+            if not _sees_latest(self.db_path):
+                # Must see its own queued writes (or would share an old snapshot)
+                return await fetch()
+            result, shared = await self.flights.do((cache_key, version), fetch)
+            return _copy(result) if shared else result
+
+        return wrapper
+    return decorator
+
+
+def _copy(result):
+    if isinstance(result, list):
+        return [row if isinstance(row, ListingRecord) else dict(row) for row in result]
+    return dict(result)
 
 
 class Database:
@@ -18,11 +197,20 @@ class Database:
         self.db_path = db_path
         # Ensure data directory exists
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Optional in-memory read model of active listings (needs numpy)
+        self.snapshot = (
+            listing_snapshot.ListingSnapshot() if LISTING_SNAPSHOT and listing_snapshot.available() else None
+        )
+        # Recent read results and reads in progress (see cached_read)
+        self.query_cache = VersionedCache(QUERY_CACHE_SIZE) if QUERY_CACHE_SIZE > 0 else None
+        self.flights = SingleFlight("db")
 
     async def init_db(self):
         """Initialize database schema"""
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
+            # Readers holding a snapshot (unit_of_work.py) must not block writers
+            await db.execute("PRAGMA journal_mode=WAL")
+            await db.execute(f"""
                 CREATE TABLE IF NOT EXISTS listings (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     title TEXT NOT NULL,
@@ -35,17 +223,272 @@ class Database:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     last_boosted_at TIMESTAMP NULL,
-                    boost_count INTEGER DEFAULT 0
+                    boost_count INTEGER DEFAULT 0,
+                    boost_eligible_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    seller_id INTEGER NOT NULL DEFAULT {int(DEFAULT_SELLER_ID)}
                 )
             """)
+            await self._migrate_listings(db)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listings_boost_eligible
+                ON listings (status, boost_eligible_at)
+            """)
+            # Per-seller indexes: every seller-scoped query leads with seller_id
+            # (the COALESCE index matches the last_boosted_at sort expression)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listings_seller_created
+                ON listings (seller_id, status, created_at)
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listings_seller_boosted
+                ON listings (seller_id, status, COALESCE(last_boosted_at, created_at))
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listings_seller_category
+                ON listings (seller_id, status, category, created_at)
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listings_seller_boost_eligible
+                ON listings (seller_id, status, boost_eligible_at)
+            """)
+            # Changed rows since a point in time (listing_snapshot.py refreshes)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listings_seller_updated
+                ON listings (seller_id, updated_at)
+            """)
+            # Cross-seller market aggregates
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listings_market
+                ON listings (category, region, status)
+            """)
+            # Cold archive (archiver.py): closed listings leave the hot table and its indexes.
+            # IDs are never reused (AUTOINCREMENT), so rows keep theirs.
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS listings_archive (
+                    id INTEGER PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    price INTEGER NOT NULL,
+                    category TEXT NOT NULL,
+                    region TEXT NOT NULL,
+                    image_url TEXT,
+                    status TEXT NOT NULL,
+                    created_at TIMESTAMP,
+                    updated_at TIMESTAMP,
+                    last_boosted_at TIMESTAMP NULL,
+                    boost_count INTEGER DEFAULT 0,
+                    boost_eligible_at TIMESTAMP,
+                    seller_id INTEGER NOT NULL,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listings_archive_seller
+                ON listings_archive (seller_id, status, created_at)
+            """)
+            # Sold totals of archived rows for get_market_stats (archived rows never change)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS listing_archive_stats (
+                    category TEXT NOT NULL,
+                    region TEXT NOT NULL,
+                    sold_count INTEGER NOT NULL DEFAULT 0,
+                    sell_days_sum REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (category, region)
+                )
+            """)
+            # What non-active reads select from
+            await db.execute(f"""
+                CREATE VIEW IF NOT EXISTS listings_with_archive AS
+                SELECT {LISTING_SELECT} FROM listings
+                UNION ALL
+                SELECT {LISTING_SELECT} FROM listings_archive
+            """)
+            # Archive candidates only (the partial index empties as they are moved)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listings_closed
+                ON listings (updated_at) WHERE status IN ('sold', 'deleted')
+            """)
+            # Scheduled automation rules (see scheduler.py)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS listing_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    listing_id INTEGER NOT NULL,
+                    rule_type TEXT NOT NULL,
+                    drop_percent INTEGER NULL,
+                    after_days INTEGER NULL,
+                    min_price INTEGER NULL,
+                    next_run_at TIMESTAMP NOT NULL,
+                    last_run_at TIMESTAMP NULL,
+                    run_count INTEGER DEFAULT 0,
+                    active INTEGER DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_listing_rules_due
+                ON listing_rules (active, next_run_at)
+            """)
             await db.commit()
 
+    async def _migrate_listings(self, db):
+        """Add columns missing from databases created by older versions"""
+        cursor = await db.execute("PRAGMA table_info(listings)")
+        columns = {row[1] for row in await cursor.fetchall()}
+        if "boost_eligible_at" not in columns:
+            # ALTER TABLE cannot use a CURRENT_TIMESTAMP default; inserts set the column explicitly
+            await db.execute("ALTER TABLE listings ADD COLUMN boost_eligible_at TIMESTAMP")
+            await db.execute("""
+                UPDATE listings
+                SET boost_eligible_at = COALESCE(datetime(last_boosted_at, ?), created_at)
+            """, (BOOST_COOLDOWN_MODIFIER,))
+        if "seller_id" not in columns:
+            # Existing rows belong to the default (demo) seller
+            await db.execute(
+                f"ALTER TABLE listings ADD COLUMN seller_id INTEGER NOT NULL DEFAULT {int(DEFAULT_SELLER_ID)}"
+            )
+
     async def get_connection(self):
         """Get database connection"""
         return await aiosqlite.connect(self.db_path)
 
+    @staticmethod
+    def _scoped(query: str, params: list, seller_id: Optional[int]) -> tuple:
+        """Restrict a single-listing statement (ending in WHERE ...) to seller_id"""
+        if seller_id is None:
+            return query, list(params)
+        return query.rstrip() + " AND seller_id = ?", [*params, seller_id]
+
+    @staticmethod
+    def _listings_query(
+        select: str,
+        status: Optional[str] = "active",
+        seller_id: Optional[int] = None,
+        category: Optional[str] = None,
+        region: Optional[str] = None,
+        days_ago: Optional[int] = None,
+        exact_day_ago: Optional[int] = None,
+        sort_by: str = "created_at",
+        sort_order: str = "DESC"
+    ) -> tuple:
+        """SELECT over listings with the query_listings filters and ORDER BY (status None: every status)
+
+        Reads of closed listings (any status but active) include listings_archive.
+        """
+        conditions = []
+        params = []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+
+        if seller_id is not None:
+            conditions.append("seller_id = ?")
+            params.append(seller_id)
+
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+
+        if region:
+            conditions.append("region = ?")
+            params.append(region)
+
+        # 날짜 필터 처리 (둘 중 하나만 사용)
+        if exact_day_ago is not None:
+            # 특정일 당일만
+            if exact_day_ago == 0:
+                conditions.append("date(created_at) = date('now')")
+            else:
+                conditions.append(f"date(created_at) = date('now', '-{int(exact_day_ago)} days')")
+        elif days_ago is not None:
+            # 범위 (N일 전부터 지금까지)
+            if days_ago > 0:
+                conditions.append(f"date(created_at) >= date('now', '-{int(days_ago)} days')")
+
+        # Validate sort_by to prevent SQL injection
+        allowed_sort_fields = ["created_at", "updated_at", "last_boosted_at", "price", "boost_count", "id"]
+        if sort_by not in allowed_sort_fields:
+            sort_by = "created_at"
+
+        # Validate sort_order
+        sort_order = sort_order.upper()
+        if sort_order not in ["ASC", "DESC"]:
+            sort_order = "DESC"
+
+        # Use COALESCE for last_boosted_at to fall back to created_at
+        if sort_by == "last_boosted_at":
+            order_clause = f"COALESCE(last_boosted_at, created_at) {sort_order}"
+        else:
+            order_clause = f"{sort_by} {sort_order}"
+
+        source = "listings" if status == "active" else "listings_with_archive"
+        query = f"SELECT {select} FROM {source}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {order_clause}"
+        return query, params
+
+    def _use_snapshot(self, status: str, seller_id: Optional[int]) -> bool:
+        """Whether a read can be answered from the in-memory snapshot"""
+        if self.snapshot is None or status != "active" or seller_id is None:
+            return False
+        # The snapshot only sees committed rows
+        uow = current_unit_of_work()
+        return uow is None or not uow.has_pending(self.db_path)
+
+    @asynccontextmanager
+    async def _reader(self, listing_id: Optional[int] = None, fresh: bool = True) -> AsyncIterator[aiosqlite.Connection]:
+        """Connection for a read: the unit of work's snapshot, or a short-lived one
+
+        Args:
+            listing_id: The only listing the read can return (lets queued writes to others stay queued)
+            fresh: False if the read only needs columns no write changes (never commits queued writes)
+        """
+        uow = current_unit_of_work()
+        if uow is not None:
+            async with uow.reader(self.db_path, listing_id, fresh) as db:
+                yield db
+            return
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            yield db
+
+    async def _listing_tags(self, listing_id: int) -> Optional[Tuple[str, str]]:
+        """(category, region) of a listing; neither changes after creation"""
+        async with self._reader(listing_id, fresh=False) as db:
+            cursor = await db.execute("SELECT category, region FROM listings WHERE id = ?", (listing_id,))
+            row = await cursor.fetchone()
+            return tuple(row) if row else None
+
+    async def _execute_write(self, query: str, params: list, listing_id: Optional[int] = None):
+        """Run an UPDATE whose result is not needed (queued until the unit of work commits)"""
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.defer(self.db_path, query, params, listing_id)
+            return
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(query, params)
+            await db.commit()
+        DB_COMMITS.inc(scope="statement")
+
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Write transaction committed on exit (with the unit of work's queued writes, if any)"""
+        uow = current_unit_of_work()
+        if uow is not None:
+            async with uow.transaction(self.db_path) as db:
+                yield db
+            return
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            yield db
+            await db.commit()
+        DB_COMMITS.inc(scope="statement")
+
     # === CREATE ===
 
+    @instrument_db
+    @tracer.traced("db.create_listing")
+    @invalidates("listings")
     async def create_listing(
         self,
         title: str,
@@ -53,66 +496,98 @@ class Database:
         price: int,
         category: str,
         region: str,
-        image_url: str = None
+        image_url: str = None,
+        seller_id: int = DEFAULT_SELLER_ID
     ) -> int:
         """Create new listing and return ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction() as db:
             cursor = await db.execute("""
-                INSERT INTO listings (title, content, price, category, region, image_url)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (title, content, price, category, region, image_url))
-            await db.commit()
+                INSERT INTO listings (seller_id, title, content, price, category, region, image_url, boost_eligible_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (seller_id, title, content, price, category, region, image_url))
             return cursor.lastrowid
 
+    @instrument_db
+    @tracer.traced("db.create_listings_bulk")
+    @invalidates("listings")
+    async def create_listings_bulk(
+        self,
+        listings: Iterable[Dict[str, Any]],
+        seller_id: int = DEFAULT_SELLER_ID
+    ) -> List[int]:
+        """Create many listings in a single transaction and return their IDs (in order)"""
+        ids = []
+        async with self._transaction() as db:
+            for listing in listings:
+                cursor = await db.execute("""
+                    INSERT INTO listings (seller_id, title, content, price, category, region, image_url, boost_eligible_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """, (
+                    seller_id, listing["title"], listing["content"], listing["price"],
+                    listing["category"], listing["region"], listing.get("image_url")
+                ))
+                ids.append(cursor.lastrowid)
+        return ids
+
     # === READ ===
 
-    async def get_listing_by_id(self, listing_id: int) -> Optional[Dict[str, Any]]:
-        """Get single listing by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("""
-                SELECT * FROM listings WHERE id = ?
-            """, (listing_id,))
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+    @instrument_db
+    @tracer.traced("db.get_listing_by_id")
+    async def get_listing_by_id(
+        self,
+        listing_id: int,
+        seller_id: Optional[int] = None,
+        include_archived: bool = False
+    ) -> Optional[ListingRecord]:
+        """Get single listing by ID (only if owned by seller_id, when given)
 
+        Args:
+            include_archived: Also look in listings_archive (archived listings are read-only)
+        """
+        condition = "id = ?"
+        params = [listing_id]
+        if seller_id is not None:
+            condition += " AND seller_id = ?"
+            params.append(seller_id)
+
+        tables = ("listings", "listings_archive") if include_archived else ("listings",)
+        async with self._reader(listing_id) as db:
+            for table in tables:
+                rows = await fetch_listings(db, f"SELECT {LISTING_SELECT} FROM {table} WHERE {condition}", params)
+                if rows:
+                    return rows[0]
+            return None
+
+    @instrument_db
+    @tracer.traced("db.get_all_listings")
+    @cached_read(_listings_dependencies)
     async def get_all_listings(
         self,
         status: str = "active",
         sort_by: str = "created_at",
-        sort_order: str = "DESC"
-    ) -> List[Dict[str, Any]]:
+        sort_order: str = "DESC",
+        seller_id: Optional[int] = None
+    ) -> List[ListingRecord]:
         """Get all listings with given status
 
         Args:
             status: Filter by status (active, sold, deleted)
+            seller_id: Only this seller's listings (None for every seller)
             sort_by: Field to sort by (created_at, updated_at, last_boosted_at, price, boost_count)
             sort_order: Sort order (ASC or DESC)
         """
-        # Validate sort_by to prevent SQL injection
-        allowed_sort_fields = ["created_at", "updated_at", "last_boosted_at", "price", "boost_count", "id"]
-        if sort_by not in allowed_sort_fields:
-            sort_by = "created_at"
+        if self._use_snapshot(status, seller_id):
+            return await self.snapshot.query(self.db_path, seller_id, sort_by=sort_by, sort_order=sort_order)
 
-        # Validate sort_order
-        sort_order = sort_order.upper()
-        if sort_order not in ["ASC", "DESC"]:
-            sort_order = "DESC"
-
-        # Use COALESCE for last_boosted_at to fall back to created_at
-        if sort_by == "last_boosted_at":
-            order_clause = f"COALESCE(last_boosted_at, created_at) {sort_order}"
-        else:
-            order_clause = f"{sort_by} {sort_order}"
-
-        query = f"SELECT * FROM listings WHERE status = ? ORDER BY {order_clause}"
-
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(query, (status,))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        query, params = self._listings_query(
+            LISTING_SELECT, status=status, seller_id=seller_id, sort_by=sort_by, sort_order=sort_order
+        )
+        async with self._reader() as db:
+            return await fetch_listings(db, query, params)
 
+    @instrument_db
+    @tracer.traced("db.query_listings")
+    @cached_read(_listings_dependencies)
     async def query_listings(
         self,
         category: Optional[str] = None,
@@ -121,11 +596,13 @@ class Database:
         days_ago: Optional[int] = None,
         exact_day_ago: Optional[int] = None,
         sort_by: str = "created_at",
-        sort_order: str = "DESC"
-    ) -> List[Dict[str, Any]]:
+        sort_order: str = "DESC",
+        seller_id: Optional[int] = None
+    ) -> List[ListingRecord]:
         """Query listings with filters
 
         Args:
+            seller_id: Only this seller's listings (None for every seller)
             category: Filter by category
             region: Filter by region
             status: Filter by status (active, sold, deleted)
@@ -134,71 +611,116 @@ class Database:
             sort_by: Field to sort by (created_at, updated_at, last_boosted_at, price, boost_count)
             sort_order: Sort order (ASC or DESC)
         """
-        query = "SELECT * FROM listings WHERE status = ?"
-        params = [status]
+        if self._use_snapshot(status, seller_id):
+            return await self.snapshot.query(
+                self.db_path, seller_id, category=category, region=region, days_ago=days_ago,
+                exact_day_ago=exact_day_ago, sort_by=sort_by, sort_order=sort_order
+            )
 
-        if category:
-            query += " AND category = ?"
-            params.append(category)
+        query, params = self._listings_query(
+            LISTING_SELECT, status=status, seller_id=seller_id, category=category, region=region,
+            days_ago=days_ago, exact_day_ago=exact_day_ago, sort_by=sort_by, sort_order=sort_order
+        )
+        async with self._reader() as db:
+            return await fetch_listings(db, query, params)
 
-        if region:
-            query += " AND region = ?"
-            params.append(region)
-
-        # 날짜 필터 처리 (둘 중 하나만 사용)
-        if exact_day_ago is not None:
-            # 특정일 당일만
-            if exact_day_ago == 0:
-                query += " AND date(created_at) = date('now')"
-            else:
-                query += f" AND date(created_at) = date('now', '-{exact_day_ago} days')"
-        elif days_ago is not None:
-            # 범위 (N일 전부터 지금까지)
-            if days_ago > 0:
-                query += f" AND date(created_at) >= date('now', '-{days_ago} days')"
+    async def iter_listings(
+        self,
+        status: Optional[str] = "active",
+        batch_size: int = 1000,
+        seller_id: Optional[int] = None,
+        category: Optional[str] = None,
+        region: Optional[str] = None,
+        days_ago: Optional[int] = None,
+        exact_day_ago: Optional[int] = None,
+        sort_by: str = "id",
+        sort_order: str = "ASC",
+        columns: Optional[Sequence[str]] = None,
+        as_tuples: bool = False
+    ) -> AsyncIterator[Union[ListingRecord, Dict[str, Any], tuple]]:
+        """Stream listings (query_listings filters, ID order by default), fetching batch_size rows at a time
 
-        # Validate sort_by to prevent SQL injection
-        allowed_sort_fields = ["created_at", "updated_at", "last_boosted_at", "price", "boost_count", "id"]
-        if sort_by not in allowed_sort_fields:
-            sort_by = "created_at"
+        Keeps one connection/cursor open for the whole iteration so memory use
+        stays constant regardless of table size. Leaving the loop early (break,
+        aclose()) stops the query and closes the connection. Inside a unit of
+        work it reads through the unit of work's connection (and sees its
+        queued writes).
 
-        # Validate sort_order
-        sort_order = sort_order.upper()
-        if sort_order not in ["ASC", "DESC"]:
-            sort_order = "DESC"
+        Args:
+            status: Filter by status (None for all rows)
+            batch_size: Rows fetched per round trip
+            seller_id: Only this seller's listings (None for every seller)
+            columns: Only these LISTING_COLUMNS, as dicts (default: all, as ListingRecords)
+            as_tuples: Yield plain tuples in column order instead
 
-        # Use COALESCE for last_boosted_at to fall back to created_at
-        if sort_by == "last_boosted_at":
-            order_clause = f"COALESCE(last_boosted_at, created_at) {sort_order}"
-        else:
-            order_clause = f"{sort_by} {sort_order}"
+        Raises:
+            ValueError: Unknown column
+        """
+        records = columns is None and not as_tuples
+        if columns is None:
+            columns = LISTING_COLUMNS
+        unknown = set(columns) - set(LISTING_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown listing columns: {sorted(unknown)}")
+        query, params = self._listings_query(
+            ", ".join(columns), status=status, seller_id=seller_id, category=category, region=region,
+            days_ago=days_ago, exact_day_ago=exact_day_ago, sort_by=sort_by, sort_order=sort_order
+        )
 
-        query += f" ORDER BY {order_clause}"
+        async with self._reader() as db:
+            async with await db.cursor() as cursor:
+                cursor.row_factory = ListingRecord.row_factory if records else None
+                await cursor.execute(query, params)
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row if records or as_tuples else dict(zip(columns, row))
 
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+    @instrument_db
+    @tracer.traced("db.get_boost_eligible_listings")
+    async def get_boost_eligible_listings(
+        self,
+        limit: Optional[int] = None,
+        seller_id: Optional[int] = None
+    ) -> List[ListingRecord]:
+        """Active listings whose boost cooldown has passed (longest-waiting first)"""
+        query = f"SELECT {LISTING_SELECT} FROM listings WHERE status = 'active' AND boost_eligible_at <= CURRENT_TIMESTAMP"
+        params = []
+        if seller_id is not None:
+            query += " AND seller_id = ?"
+            params.append(seller_id)
+        query += " ORDER BY boost_eligible_at"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        async with self._reader() as db:
+            return await fetch_listings(db, query, params)
 
     # === UPDATE ===
 
-    async def update_price(self, listing_id: int, new_price: int) -> bool:
+    @instrument_db
+    @tracer.traced("db.update_price")
+    @invalidates("listings")
+    async def update_price(self, listing_id: int, new_price: int, seller_id: Optional[int] = None) -> bool:
         """Update listing price"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                UPDATE listings
-                SET price = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (new_price, listing_id))
-            await db.commit()
-            return True
+        query, params = self._scoped("""
+            UPDATE listings
+            SET price = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, [new_price, listing_id], seller_id)
+        await self._execute_write(query, params, listing_id)
+        return True
 
+    @instrument_db
+    @tracer.traced("db.update_content")
+    @invalidates("listings")
     async def update_content(
         self,
         listing_id: int,
         title: Optional[str] = None,
-        content: Optional[str] = None
+        content: Optional[str] = None,
+        seller_id: Optional[int] = None
     ) -> bool:
         """Update listing title or content"""
         updates = []
@@ -216,54 +738,679 @@ class Database:
             return False
 
         updates.append("updated_at = CURRENT_TIMESTAMP")
-        query = f"UPDATE listings SET {', '.join(updates)} WHERE id = ?"
         params.append(listing_id)
+        query, params = self._scoped(
+            f"UPDATE listings SET {', '.join(updates)} WHERE id = ?", params, seller_id
+        )
 
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(query, params)
-            await db.commit()
-            return True
+        await self._execute_write(query, params, listing_id)
+        return True
 
-    async def boost_listing(self, listing_id: int) -> bool:
-        """Boost listing (update timestamp)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
+    @instrument_db
+    @tracer.traced("db.boost_listing")
+    @invalidates("listings")
+    async def boost_listing(self, listing_id: int, seller_id: Optional[int] = None) -> bool:
+        """Boost listing (update timestamp)
+
+        Guarded like boost_eligible_listings: a listing boosted since the
+        caller read it (another request, the scheduler) is not boosted again
+        within its cooldown. Runs at once, not queued, so the result is known.
+
+        Returns:
+            False if the listing was not found, not active or still cooling down
+        """
+        query, params = self._scoped("""
+            UPDATE listings
+            SET last_boosted_at = CURRENT_TIMESTAMP,
+                boost_count = boost_count + 1,
+                boost_eligible_at = datetime('now', ?),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'active' AND boost_eligible_at <= CURRENT_TIMESTAMP
+        """, [BOOST_COOLDOWN_MODIFIER, listing_id], seller_id)
+        async with self._transaction() as db:
+            cursor = await db.execute(query, params)
+            return cursor.rowcount > 0
+
+    @instrument_db
+    @tracer.traced("db.boost_eligible_listings")
+    @invalidates("listings")
+    async def boost_eligible_listings(
+        self,
+        limit: Optional[int] = None,
+        seller_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Boost every active listing whose cooldown has passed in one statement
+
+        Args:
+            limit: Boost at most this many (longest-waiting first)
+            seller_id: Only this seller's listings (None for every seller)
+
+        Returns:
+            Boosted listings (id, title, boost_count, last_boosted_at)
+        """
+        where = "status = 'active' AND boost_eligible_at <= CURRENT_TIMESTAMP"
+        params = [BOOST_COOLDOWN_MODIFIER]
+        if seller_id is not None:
+            where += " AND seller_id = ?"
+            params.append(seller_id)
+        if limit is not None:
+            where = f"""id IN (
+                SELECT id FROM listings WHERE {where}
+                ORDER BY boost_eligible_at LIMIT {int(limit)}
+            )"""
+        async with self._transaction() as db:
+            cursor = await db.execute(f"""
                 UPDATE listings
                 SET last_boosted_at = CURRENT_TIMESTAMP,
                     boost_count = boost_count + 1,
+                    boost_eligible_at = datetime('now', ?),
                     updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (listing_id,))
-            await db.commit()
-            return True
+                WHERE {where}
+                RETURNING id, title, boost_count, last_boosted_at
+            """, params)
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
 
-    async def update_status(self, listing_id: int, status: str) -> bool:
+    @instrument_db
+    @tracer.traced("db.update_status")
+    @invalidates("listings")
+    async def update_status(self, listing_id: int, status: str, seller_id: Optional[int] = None) -> bool:
         """Update listing status (active/sold)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                UPDATE listings
-                SET status = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (status, listing_id))
-            await db.commit()
-            return True
+        query, params = self._scoped("""
+            UPDATE listings
+            SET status = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, [status, listing_id], seller_id)
+        await self._execute_write(query, params, listing_id)
+        return True
 
     # === DELETE ===
 
-    async def delete_listing(self, listing_id: int) -> bool:
+    async def delete_listing(self, listing_id: int, seller_id: Optional[int] = None) -> bool:
         """Delete listing (soft delete by setting status)"""
-        return await self.update_status(listing_id, "deleted")
+        return await self.update_status(listing_id, "deleted", seller_id=seller_id)
+
+    # === AGGREGATES ===
+
+    @instrument_db
+    @tracer.traced("db.get_market_stats")
+    @cached_read(_market_dependencies)
+    async def get_market_stats(self, category: str, region: str) -> Dict[str, Any]:
+        """Cross-seller price/sell-time totals for a category and region
+
+        Returns sums and counts (not averages) so results from several
+        databases can be added together. Archived sold listings are counted
+        through listing_archive_stats.
+        """
+        async with self._reader() as db:
+            cursor = await db.execute("""
+                SELECT
+                    COUNT(*) FILTER (WHERE status = 'active'),
+                    COALESCE(SUM(price) FILTER (WHERE status = 'active'), 0),
+                    COUNT(*) FILTER (WHERE status = 'sold'),
+                    COALESCE(SUM(julianday(updated_at) - julianday(created_at)) FILTER (WHERE status = 'sold'), 0)
+                FROM listings
+                WHERE category = ? AND region = ?
+            """, (category, region))
+            active_count, price_sum, sold_count, sell_days_sum = await cursor.fetchone()
+            cursor = await db.execute("""
+                SELECT sold_count, sell_days_sum FROM listing_archive_stats WHERE category = ? AND region = ?
+            """, (category, region))
+            archived = await cursor.fetchone()
+            if archived:
+                sold_count += archived[0]
+                sell_days_sum += archived[1]
+            return {
+                "active_count": active_count,
+                "price_sum": price_sum,
+                "sold_count": sold_count,
+                "sell_days_sum": sell_days_sum,
+            }
+
+    # === ARCHIVE ===
+
+    @instrument_db
+    @tracer.traced("db.archive_closed_listings")
+    async def archive_closed_listings(self, older_than_days: int, limit: int) -> int:
+        """Move up to limit sold/deleted listings unchanged for older_than_days to listings_archive
+
+        One transaction: rows are copied, their sold totals added to
+        listing_archive_stats, and then deleted from listings. Reads return
+        the same results before and after, so no cache version is bumped.
+
+        Returns:
+            Listings moved
+        """
+        async with self._transaction() as db:
+            # One cutoff for every statement: the batch must be the same rows in each
+            cursor = await db.execute("SELECT datetime('now', ?)", (f"-{int(older_than_days)} days",))
+            (cutoff,) = await cursor.fetchone()
+            # Without statistics the planner prefers the status index and sorts every closed row
+            cursor = await db.execute("""
+                SELECT id FROM listings INDEXED BY idx_listings_closed
+                WHERE status IN ('sold', 'deleted') AND updated_at < ?
+                ORDER BY updated_at
+                LIMIT ?
+            """, (cutoff, int(limit)))
+            ids = [row[0] for row in await cursor.fetchall()]
+            if not ids:
+                return 0
+            # Re-checked in each statement: a row may have changed since it was picked
+            batch = f"""
+                id IN ({", ".join("?" for _ in ids)})
+                AND status IN ('sold', 'deleted') AND updated_at < ?
+            """
+            params = (*ids, cutoff)
+            await db.execute(f"""
+                INSERT INTO listings_archive ({LISTING_SELECT})
+                SELECT {LISTING_SELECT} FROM listings WHERE {batch}
+            """, params)
+            await db.execute(f"""
+                INSERT INTO listing_archive_stats (category, region, sold_count, sell_days_sum)
+                SELECT category, region, COUNT(*), SUM(julianday(updated_at) - julianday(created_at))
+                FROM listings
+                WHERE {batch} AND status = 'sold'
+                GROUP BY category, region
+                ON CONFLICT (category, region) DO UPDATE SET
+                    sold_count = sold_count + excluded.sold_count,
+                    sell_days_sum = sell_days_sum + excluded.sell_days_sum
+            """, params)
+            cursor = await db.execute(f"DELETE FROM listings WHERE {batch}", params)
+            return cursor.rowcount
+
+    # === RULES (scheduler) ===
+
+    @instrument_db
+    @tracer.traced("db.create_rule")
+    @invalidates("rules")
+    async def create_rule(
+        self,
+        listing_id: int,
+        rule_type: str,
+        next_run_at: str,
+        drop_percent: Optional[int] = None,
+        after_days: Optional[int] = None,
+        min_price: Optional[int] = None,
+        seller_id: Optional[int] = None
+    ) -> int:
+        """Create automation rule and return ID (seller_id only routes in sharded mode)"""
+        async with self._transaction() as db:
+            cursor = await db.execute("""
+                INSERT INTO listing_rules (listing_id, rule_type, drop_percent, after_days, min_price, next_run_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (listing_id, rule_type, drop_percent, after_days, min_price, next_run_at))
+            return cursor.lastrowid
+
+    @instrument_db
+    @tracer.traced("db.get_rule_schedule")
+    async def get_rule_schedule(self) -> List[tuple]:
+        """(id, next_run_at) of all active rules (for building the due-time heap)"""
+        async with self._reader() as db:
+            cursor = await db.execute("""
+                SELECT id, next_run_at FROM listing_rules WHERE active = 1
+            """)
+            return [tuple(row) for row in await cursor.fetchall()]
+
+    @instrument_db
+    @tracer.traced("db.get_due_rules")
+    async def get_due_rules(self, now: str, rule_ids: List[int]) -> List[Dict[str, Any]]:
+        """Active rules among rule_ids that are due, joined with their listing"""
+        if not rule_ids:
+            return []
+        placeholders = ", ".join("?" for _ in rule_ids)
+        async with self._reader() as db:
+            cursor = await db.execute(f"""
+                SELECT r.*, l.status AS listing_status, l.price AS listing_price,
+                       l.created_at AS listing_created_at, l.boost_eligible_at AS listing_boost_eligible_at
+                FROM listing_rules r
+                LEFT JOIN listings l ON l.id = r.listing_id
+                WHERE r.active = 1 AND r.next_run_at <= ? AND r.id IN ({placeholders})
+            """, (now, *rule_ids))
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    @instrument_db
+    @tracer.traced("db.apply_rule_actions")
+    @invalidates("listings")
+    async def apply_rule_actions(
+        self,
+        boosts: List[tuple],
+        price_updates: List[tuple],
+        rule_updates: List[tuple]
+    ) -> List[int]:
+        """Apply scheduler results in one transaction
+
+        Boosts are guarded like boost_listing: a listing sold or boosted
+        since the rules were evaluated is skipped, and its rule's run is
+        not counted.
+
+        Args:
+            boosts: (listing_id, rule_id) pairs to boost
+            price_updates: (new_price, listing_id) pairs
+            rule_updates: (next_run_at, active, ran, rule_id) tuples
+
+        Returns:
+            IDs of the listings boosted
+        """
+        boosted = set()
+        async with self._transaction() as db:
+            if boosts:
+                listing_ids = sorted({listing_id for listing_id, _ in boosts})
+                cursor = await db.execute(f"""
+                    UPDATE listings
+                    SET last_boosted_at = CURRENT_TIMESTAMP,
+                        boost_count = boost_count + 1,
+                        boost_eligible_at = datetime('now', ?),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({", ".join("?" for _ in listing_ids)})
+                        AND status = 'active' AND boost_eligible_at <= CURRENT_TIMESTAMP
+                    RETURNING id
+                """, [BOOST_COOLDOWN_MODIFIER, *listing_ids])
+                boosted = {row[0] for row in await cursor.fetchall()}
+                skipped = {rule_id for listing_id, rule_id in boosts if listing_id not in boosted}
+                rule_updates = [
+                    (next_run, active, 0 if rule_id in skipped else ran, rule_id)
+                    for next_run, active, ran, rule_id in rule_updates
+                ]
+            if price_updates:
+                await db.executemany("""
+                    UPDATE listings
+                    SET price = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, price_updates)
+            if rule_updates:
+                await db.executemany("""
+                    UPDATE listing_rules
+                    SET next_run_at = ?,
+                        active = ?,
+                        run_count = run_count + ?,
+                        last_run_at = CASE WHEN ? > 0 THEN CURRENT_TIMESTAMP ELSE last_run_at END
+                    WHERE id = ?
+                """, [(next_run, active, ran, ran, rule_id) for next_run, active, ran, rule_id in rule_updates])
+        return sorted(boosted)
 
     # === UTILITY ===
 
+    @invalidates("listings")
     async def clear_all_listings(self):
-        """Clear all listings and reset ID counter (for testing)"""
+        """Clear all listings (archived ones and their rules too) and reset ID counters (for testing)"""
         async with aiosqlite.connect(self.db_path) as db:
             await db.execute("DELETE FROM listings")
-            # Reset autoincrement counter
-            await db.execute("DELETE FROM sqlite_sequence WHERE name='listings'")
+            await db.execute("DELETE FROM listings_archive")
+            await db.execute("DELETE FROM listing_archive_stats")
+            await db.execute("DELETE FROM listing_rules")
+            # Reset autoincrement counters
+            await db.execute("DELETE FROM sqlite_sequence WHERE name IN ('listings', 'listing_rules')")
             await db.commit()
 
 
-# Global database instance
-db = Database()
+# === Sharding ===
+
+def shard_path(directory: str, index: int) -> str:
+    """File of shard #index inside directory"""
+    return str(Path(directory) / f"shard-{index:02d}.db")
+
+
+class HashRing:
+    """Consistent-hash ring mapping seller IDs to shard indexes
+
+    Each shard owns `vnodes` points on the ring, so growing from N to N+1
+    shards only moves about 1/(N+1) of the sellers.
+    """
+
+    def __init__(self, shard_count: int, vnodes: int = SHARD_VNODES):
+        points = sorted(
+            (self._hash(f"shard-{shard}#{vnode}"), shard)
+            for shard in range(shard_count)
+            for vnode in range(vnodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def shard_for(self, seller_id: int) -> int:
+        index = bisect.bisect(self._keys, self._hash(str(seller_id))) % len(self._keys)
+        return self._shards[index]
+
+
+def _merge_key(sort_by: str, columns: Optional[Sequence[str]] = None, positional: bool = False):
+    """Python equivalent of the ORDER BY used by get_all_listings/query_listings
+
+    Args:
+        columns: Columns the rows hold (None: all)
+        positional: Rows are tuples in columns order instead of dicts
+
+    Raises:
+        ValueError: The sort columns are not among columns
+    """
+    if sort_by not in ("created_at", "updated_at", "last_boosted_at", "price", "boost_count", "id"):
+        sort_by = "created_at"
+    needed = ("last_boosted_at", "created_at") if sort_by == "last_boosted_at" else (sort_by,)
+    columns = list(columns or LISTING_COLUMNS)
+    missing = [name for name in needed if name not in columns]
+    if missing:
+        raise ValueError(f"Merging sorted rows needs columns {missing}")
+    if positional:
+        index = [columns.index(name) for name in needed]
+        if sort_by == "last_boosted_at":
+            return lambda row: row[index[0]] or row[index[1]]
+        return lambda row: row[index[0]]
+    if sort_by == "last_boosted_at":
+        return lambda row: row["last_boosted_at"] or row["created_at"]
+    return lambda row: row[sort_by]
+
+
+async def _merge_sorted(iterators: List[AsyncIterator], key: Callable, reverse: bool) -> AsyncIterator:
+    """heapq.merge for async iterators: holds one row per iterator"""
+    heap = []
+
+    async def push(index: int):
+        try:
+            row = await iterators[index].__anext__()
+        except StopAsyncIteration:
+            return
+        value = key(row)
+        # Ties keep iterator order; rows themselves are never compared
+        heapq.heappush(heap, (_Reversed(value) if reverse else value, index, row))
+
+    try:
+        for index in range(len(iterators)):
+            await push(index)
+        while heap:
+            _, index, row = heapq.heappop(heap)
+            yield row
+            await push(index)
+    finally:
+        for iterator in iterators:
+            await iterator.aclose()
+
+
+@functools.total_ordering
+class _Reversed:
+    """Inverts comparisons (descending merge of arbitrary values)"""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+
+class ShardedDatabase:
+    """Database API over N SQLite files, one shard per seller
+
+    Sellers are routed through a HashRing. Listing and rule IDs stay
+    globally unique because shard i allocates IDs from
+    [i * SHARD_ID_STRIDE, (i + 1) * SHARD_ID_STRIDE). Rows keep their IDs
+    when rebalance_shards.py moves a seller. Calls without a seller_id
+    scatter to every shard and merge the results. Each shard is its own
+    file with its own SQLite write lock, so writes to different shards run
+    in parallel. Connections are opened per call, as in Database. Within
+    one process, writes to the same shard wait on that shard's
+    asyncio.Lock instead of retrying on SQLite's busy timeout; worker
+    processes (serve.py) still contend for the shard's write lock.
+    """
+
+    def __init__(self, directory: str = SHARD_DIR, shard_count: int = SHARD_COUNT):
+        self.directory = directory
+        self.shards = [Database(shard_path(directory, i)) for i in range(shard_count)]
+        self.ring = HashRing(shard_count)
+        self._write_locks = [asyncio.Lock() for _ in self.shards]
+
+    @property
+    def db_path(self) -> str:
+        return self.directory
+
+    def shard_index(self, seller_id: int) -> int:
+        return self.ring.shard_for(seller_id)
+
+    def shard_for_seller(self, seller_id: int) -> Database:
+        return self.shards[self.shard_index(seller_id)]
+
+    async def _gather(self, method: str, *args, **kwargs) -> list:
+        """Call a Database method on every shard concurrently"""
+        return await asyncio.gather(*(getattr(shard, method)(*args, **kwargs) for shard in self.shards))
+
+    async def _write(self, index: int, method: str, *args, **kwargs):
+        """Run a write on one shard, one at a time per shard in this process"""
+        async with self._write_locks[index]:
+            return await getattr(self.shards[index], method)(*args, **kwargs)
+
+    async def _locate(self, listing_id: int, seller_id: Optional[int]) -> Optional[int]:
+        """Shard index holding listing_id (scatter lookup when the seller is unknown)"""
+        if seller_id is not None:
+            return self.shard_index(seller_id)
+        found = await self._gather("get_listing_by_id", listing_id)
+        for index, listing in enumerate(found):
+            if listing:
+                return index
+        return None
+
+    async def init_db(self):
+        """Initialize every shard and pin its ID ranges"""
+        Path(self.directory).mkdir(parents=True, exist_ok=True)
+        for index, shard in enumerate(self.shards):
+            await shard.init_db()
+        await self.pin_id_ranges()
+
+    async def pin_id_ranges(self):
+        """Point each shard's AUTOINCREMENT counters at the top of its own ID range"""
+        for index, shard in enumerate(self.shards):
+            low, high = index * SHARD_ID_STRIDE, (index + 1) * SHARD_ID_STRIDE
+            async with aiosqlite.connect(shard.db_path) as conn:
+                for table in ("listings", "listing_rules"):
+                    cursor = await conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+                    row = await cursor.fetchone()
+                    cursor = await conn.execute(
+                        f"SELECT MAX(id) FROM {table} WHERE id >= ? AND id < ?", (low, high)
+                    )
+                    (max_id,) = await cursor.fetchone()
+                    # Never move backwards inside the range: IDs of moved-away rows must not be reused
+                    candidates = [value for value in (row and row[0], max_id) if value and low <= value < high]
+                    await conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+                    await conn.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, max([low, *candidates]))
+                    )
+                await conn.commit()
+
+    # === CREATE ===
+
+    async def create_listing(self, *args, seller_id: int = DEFAULT_SELLER_ID, **kwargs) -> int:
+        return await self._write(self.shard_index(seller_id), "create_listing", *args, seller_id=seller_id, **kwargs)
+
+    async def create_listings_bulk(
+        self,
+        listings: Iterable[Dict[str, Any]],
+        seller_id: int = DEFAULT_SELLER_ID
+    ) -> List[int]:
+        return await self._write(self.shard_index(seller_id), "create_listings_bulk", listings, seller_id=seller_id)
+
+    # === READ ===
+
+    async def get_listing_by_id(
+        self,
+        listing_id: int,
+        seller_id: Optional[int] = None,
+        include_archived: bool = False
+    ) -> Optional[ListingRecord]:
+        if seller_id is not None:
+            return await self.shard_for_seller(seller_id).get_listing_by_id(
+                listing_id, seller_id=seller_id, include_archived=include_archived
+            )
+        for listing in await self._gather("get_listing_by_id", listing_id, include_archived=include_archived):
+            if listing:
+                return listing
+        return None
+
+    async def _merged(self, method: str, sort_by: str, sort_order: str, **kwargs) -> List[ListingRecord]:
+        results = await self._gather(method, sort_by=sort_by, sort_order=sort_order, **kwargs)
+        return list(heapq.merge(*results, key=_merge_key(sort_by), reverse=sort_order.upper() != "ASC"))
+
+    async def get_all_listings(
+        self,
+        status: str = "active",
+        sort_by: str = "created_at",
+        sort_order: str = "DESC",
+        seller_id: Optional[int] = None
+    ) -> List[ListingRecord]:
+        if seller_id is not None:
+            return await self.shard_for_seller(seller_id).get_all_listings(
+                status=status, sort_by=sort_by, sort_order=sort_order, seller_id=seller_id
+            )
+        return await self._merged("get_all_listings", sort_by, sort_order, status=status)
+
+    async def query_listings(
+        self,
+        sort_by: str = "created_at",
+        sort_order: str = "DESC",
+        seller_id: Optional[int] = None,
+        **filters
+    ) -> List[ListingRecord]:
+        if seller_id is not None:
+            return await self.shard_for_seller(seller_id).query_listings(
+                sort_by=sort_by, sort_order=sort_order, seller_id=seller_id, **filters
+            )
+        return await self._merged("query_listings", sort_by, sort_order, **filters)
+
+    async def iter_listings(
+        self,
+        status: Optional[str] = "active",
+        batch_size: int = 1000,
+        seller_id: Optional[int] = None,
+        sort_by: str = "id",
+        sort_order: str = "ASC",
+        columns: Optional[Sequence[str]] = None,
+        as_tuples: bool = False,
+        **filters
+    ) -> AsyncIterator[Union[ListingRecord, Dict[str, Any], tuple]]:
+        """Stream listings; without seller_id, every shard's stream is merged in sort order"""
+        kwargs = dict(
+            status=status, batch_size=batch_size, sort_by=sort_by, sort_order=sort_order,
+            columns=columns, as_tuples=as_tuples, **filters
+        )
+        if seller_id is not None:
+            async for row in self.shard_for_seller(seller_id).iter_listings(seller_id=seller_id, **kwargs):
+                yield row
+            return
+        key = _merge_key(sort_by, columns, positional=as_tuples)
+        merged = _merge_sorted(
+            [shard.iter_listings(**kwargs) for shard in self.shards], key, reverse=sort_order.upper() != "ASC"
+        )
+        try:
+            async for row in merged:
+                yield row
+        finally:
+            await merged.aclose()
+
+    async def get_boost_eligible_listings(
+        self,
+        limit: Optional[int] = None,
+        seller_id: Optional[int] = None
+    ) -> List[ListingRecord]:
+        if seller_id is not None:
+            return await self.shard_for_seller(seller_id).get_boost_eligible_listings(limit=limit, seller_id=seller_id)
+        results = await self._gather("get_boost_eligible_listings", limit=limit)
+        merged = list(heapq.merge(*results, key=lambda row: row["boost_eligible_at"]))
+        return merged[:limit] if limit is not None else merged
+
+    # === UPDATE ===
+
+    async def _update(self, method: str, listing_id: int, *args, seller_id: Optional[int] = None, **kwargs) -> bool:
+        index = await self._locate(listing_id, seller_id)
+        if index is None:
+            return False
+        return await self._write(index, method, listing_id, *args, seller_id=seller_id, **kwargs)
+
+    async def update_price(self, listing_id: int, new_price: int, seller_id: Optional[int] = None) -> bool:
+        return await self._update("update_price", listing_id, new_price, seller_id=seller_id)
+
+    async def update_content(self, listing_id: int, seller_id: Optional[int] = None, **kwargs) -> bool:
+        return await self._update("update_content", listing_id, seller_id=seller_id, **kwargs)
+
+    async def boost_listing(self, listing_id: int, seller_id: Optional[int] = None) -> bool:
+        return await self._update("boost_listing", listing_id, seller_id=seller_id)
+
+    async def update_status(self, listing_id: int, status: str, seller_id: Optional[int] = None) -> bool:
+        return await self._update("update_status", listing_id, status, seller_id=seller_id)
+
+    async def delete_listing(self, listing_id: int, seller_id: Optional[int] = None) -> bool:
+        return await self.update_status(listing_id, "deleted", seller_id=seller_id)
+
+    async def boost_eligible_listings(
+        self,
+        limit: Optional[int] = None,
+        seller_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Bulk boost; without seller_id, limit applies per shard"""
+        if seller_id is not None:
+            return await self._write(
+                self.shard_index(seller_id), "boost_eligible_listings", limit=limit, seller_id=seller_id
+            )
+        results = await asyncio.gather(*(
+            self._write(index, "boost_eligible_listings", limit=limit) for index in range(len(self.shards))
+        ))
+        return [row for rows in results for row in rows]
+
+    # === AGGREGATES ===
+
+    async def get_market_stats(self, category: str, region: str) -> Dict[str, Any]:
+        """Scatter-gather: totals from every shard added together"""
+        totals = {"active_count": 0, "price_sum": 0, "sold_count": 0, "sell_days_sum": 0}
+        for stats in await self._gather("get_market_stats", category, region):
+            for key in totals:
+                totals[key] += stats[key]
+        return totals
+
+    # === ARCHIVE ===
+
+    async def archive_closed_listings(self, older_than_days: int, limit: int) -> int:
+        """One batch per shard (limit applies per shard); returns listings moved"""
+        moved = await asyncio.gather(*(
+            self._write(index, "archive_closed_listings", older_than_days, limit) for index in range(len(self.shards))
+        ))
+        return sum(moved)
+
+    # === RULES (scheduler) ===
+
+    async def create_rule(self, listing_id: int, *args, seller_id: Optional[int] = None, **kwargs) -> int:
+        # Rules live next to their listing so get_due_rules can join locally
+        index = await self._locate(listing_id, seller_id)
+        if index is None:
+            raise ValueError(f"Listing {listing_id} not found in any shard")
+        return await self._write(index, "create_rule", listing_id, *args, **kwargs)
+
+    async def get_rule_schedule(self) -> List[tuple]:
+        return [row for rows in await self._gather("get_rule_schedule") for row in rows]
+
+    async def get_due_rules(self, now: str, rule_ids: List[int]) -> List[Dict[str, Any]]:
+        return [row for rows in await self._gather("get_due_rules", now, rule_ids) for row in rows]
+
+    async def apply_rule_actions(
+        self,
+        boosts: List[tuple],
+        price_updates: List[tuple],
+        rule_updates: List[tuple]
+    ) -> List[int]:
+        """Apply on every shard; IDs are globally unique, so foreign rows are no-ops"""
+        boosted = await asyncio.gather(*(
+            self._write(index, "apply_rule_actions", boosts, price_updates, rule_updates)
+            for index in range(len(self.shards))
+        ))
+        return sorted(listing_id for ids in boosted for listing_id in ids)
+
+    # === UTILITY ===
+
+    async def clear_all_listings(self):
+        await self._gather("clear_all_listings")
+        await self.pin_id_ranges()
+
+
+# Global database instance (sharded when JOL_SHARD_COUNT > 1)
+db = ShardedDatabase() if SHARD_COUNT > 1 else Database()
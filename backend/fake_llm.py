@@ -0,0 +1,286 @@
+"""
+Stub Gemini model for benchmarks and offline development
+Mimics the parts of google.generativeai used by agent_v2 (GenerativeModel,
+start_chat, send_message) and answers Korean commands with fixed tool plans.
+Failures and stalls can be injected (JOL_FAKE_LLM_ERROR_RATE / _SLOW_RATE)
+to exercise the resilience layer.
+"""
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from config import (
+    CATEGORIES, REGIONS, FAKE_LLM_LATENCY_MS,
+    FAKE_LLM_ERROR_RATE, FAKE_LLM_SLOW_RATE, FAKE_LLM_SLOW_MS
+)
+from planner import PlanError, resolve_step_args
+
+
+class FakeUpstreamError(Exception):
+    """Injected upstream failure; `code` mimics google.api_core's HTTP status"""
+
+    code = 503
+
+
+class FakeFunctionCall:
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+
+
+class FakeFunctionCallPart:
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.function_call = FakeFunctionCall(name, args)
+
+
+class FakeTextPart:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeContent:
+    def __init__(self, parts: list):
+        self.parts = parts
+
+
+class FakeCandidate:
+    def __init__(self, parts: list):
+        self.content = FakeContent(parts)
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, candidate_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = candidate_tokens
+        self.total_token_count = prompt_tokens + candidate_tokens
+
+
+class FakeResponse:
+    def __init__(self, parts: list, prompt_tokens: int):
+        self.candidates = [FakeCandidate(parts)]
+        text_parts = [p.text for p in parts if isinstance(p, FakeTextPart)]
+        self.text = "\n".join(text_parts)
+        self.usage_metadata = FakeUsage(prompt_tokens, sum(len(t) for t in text_parts) // 2 + 8 * (len(parts) - len(text_parts)))
+
+
+def _day_filter(message: str) -> Dict[str, int]:
+    """Translate Korean date expressions the same way the system prompt asks the real model to"""
+    match = re.search(r"최근\s*(\d+)\s*일", message)
+    if match:
+        return {"days_ago": int(match.group(1))}
+    if "최근 한달" in message:
+        return {"days_ago": 30}
+    if "지난 주" in message or "이번 주" in message:
+        return {"days_ago": 7}
+    for word, day in (("그저께", 2), ("어제", 1), ("오늘", 0)):
+        if word in message:
+            return {"exact_day_ago": day}
+    return {}
+
+
+def _percent(message: str, default: int = 10) -> int:
+    match = re.search(r"(\d+)\s*%", message)
+    return int(match.group(1)) if match else default
+
+
+def plan_for_message(message: str) -> List[Dict[str, Any]]:
+    """
+    Rule-based tool plan for a user message
+
+    Returns a list of steps in plan format ({"tool": name, "args": dict});
+    args may use planner references ("$step1.listings[0].id", "=price * 0.9")
+    """
+    query_args: Dict[str, Any] = _day_filter(message)
+    for category in CATEGORIES:
+        if category in message:
+            query_args["category"] = category
+    for region in REGIONS:
+        if region in message:
+            query_args["region"] = region
+
+    if "시세" in message or "시장" in message:
+        return [{"tool": "get_market_insights", "args": {
+            "category": query_args.get("category", "전자기기"),
+            "region": query_args.get("region", "강남구"),
+        }}]
+
+    if "끌어올" in message and any(word in message for word in ("다 ", "모두", "전부")):
+        return [{"tool": "boost_eligible_listings", "args": {}}]
+
+    if "끌어올" in message:
+        query_args.setdefault("sort_by", "last_boosted_at")
+        query_args.setdefault("sort_order", "ASC")
+        return [
+            {"tool": "query_listings", "args": query_args},
+            {"tool": "boost_listing", "args": {"listing_id": "$step1.listings[0].id"}},
+        ]
+
+    if ("가격" in message or "인하" in message) and ("낮춰" in message or "인하" in message or "%" in message):
+        # "전부/모두/다" applies to every listing found, otherwise to the first one
+        target = "[*]" if any(word in message for word in ("다 ", "모두", "전부")) else "[0]"
+        ratio = 1 - _percent(message) / 100
+        return [
+            {"tool": "query_listings", "args": query_args},
+            {"tool": "adjust_price", "args": {
+                "listing_id": f"$step1.listings{target}.id",
+                "new_price": f"=max(int($step1.listings{target}.price * {ratio}), 1)",
+            }},
+        ]
+
+    if "제목" in message:
+        return [
+            {"tool": "query_listings", "args": query_args},
+            {"tool": "update_content", "args": {
+                "listing_id": "$step1.listings[0].id",
+                "title": "=$step1.listings[0].title + ' [가격 협상 가능]'",
+            }},
+        ]
+
+    if any(word in message for word in ("보여", "조회", "매물", "물건")):
+        return [{"tool": "query_listings", "args": query_args}]
+
+    return []
+
+
+class FakeFunctionResponse:
+    def __init__(self, name: str, response: Dict[str, Any]):
+        self.name = name
+        self.response = response
+
+
+class FakeFunctionResponsePart:
+    def __init__(self, name: str, response: Dict[str, Any]):
+        self.function_response = FakeFunctionResponse(name, response)
+
+
+def function_response_part(name: str, response: Dict[str, Any]) -> FakeFunctionResponsePart:
+    """Stand-in for genai.protos.Part(function_response=...)"""
+    return FakeFunctionResponsePart(name, response)
+
+
+def _result_from_parts(parts: list) -> Optional[Dict[str, Any]]:
+    """
+    Tool result from the FunctionResponse parts sent by the agent
+
+    Several parts (a fanned-out step) are combined like planner.execute_plan does
+    """
+    results = []
+    for part in parts:
+        function_response = getattr(part, "function_response", None)
+        if function_response is None:
+            continue
+        response = function_response.response
+        if not isinstance(response, dict):
+            response = type(function_response).to_dict(function_response)["response"]
+        results.append(response.get("result"))
+    if len(results) <= 1:
+        return results[0] if results else None
+    succeeded = [r for r in results if r.get("success")]
+    return {
+        "success": len(succeeded) == len(results),
+        "count": len(results),
+        "results": results,
+        "message": f"매물 {len(succeeded)}개를 처리했습니다."
+    }
+
+
+class FakeChatSession:
+    """Chat session that walks through the plan for the first user message"""
+
+    def __init__(self, model: "FakeGenerativeModel", history: list):
+        self.model = model
+        self.history = list(history or [])
+        self._plan: List[Dict[str, Any]] = []
+        self._step = 0
+
+        # A session copied from another one's history resumes its plan:
+        # one step per function response sent since the last user message
+        self._results: List[Dict[str, Any]] = []
+        texts = [i for i, item in enumerate(self.history) if isinstance(item, str)]
+        if texts:
+            self._plan = plan_for_message(self.history[texts[-1]])
+            self._step = len(self.history) - texts[-1]
+            self._results = [_result_from_parts(item) for item in self.history[texts[-1] + 1:]]
+
+    def _respond(self, parts: list) -> FakeResponse:
+        if self.model.error_rate and random.random() < self.model.error_rate:
+            raise FakeUpstreamError("503 Service Unavailable (injected)")
+        if self.model.slow_rate and random.random() < self.model.slow_rate:
+            time.sleep(self.model.slow_ms / 1000)
+        if self.model.latency_ms:
+            # Blocking on purpose: the real SDK's send_message is synchronous too
+            time.sleep(self.model.latency_ms / 1000)
+        prompt_chars = len(self.model.system_instruction) + self.model.tool_chars + sum(len(str(h)) for h in self.history)
+        prompt_tokens = prompt_chars // 2
+        return FakeResponse(parts, prompt_tokens)
+
+    def send_message(self, content) -> FakeResponse:
+        self.history.append(content)
+
+        if isinstance(content, str):
+            self._plan = plan_for_message(content)
+            self._step = 0
+            self._results = []
+            previous = None
+            if self.model.json_mode:
+                # Plan mode: the whole plan in one answer
+                return self._respond([FakeTextPart(json.dumps({
+                    "steps": self._plan,
+                    "response": "요청하신 작업을 처리했습니다." if self._plan else
+                        "안녕하세요! 매물 조회, 가격 조정, 끌어올리기, 시세 조회를 도와드릴 수 있어요."
+                }, ensure_ascii=False))])
+        else:
+            previous = _result_from_parts(content)
+            self._results.append(previous)
+
+        if self._step < len(self._plan):
+            if previous is not None and (not previous.get("success") or (
+                "listings" in previous and not previous["listings"]
+            )):
+                # Nothing to act on; stop with a text answer
+                self._plan = []
+                return self._respond([FakeTextPart(previous.get("message", "처리할 매물이 없습니다."))])
+
+            step = self._plan[self._step]
+            self._step += 1
+            try:
+                calls = resolve_step_args(step["args"], self._results)
+            except PlanError as e:
+                self._plan = []
+                return self._respond([FakeTextPart(f"요청을 처리할 수 없습니다: {e}")])
+            # A [*] step becomes several function calls in one answer
+            return self._respond([FakeFunctionCallPart(step["tool"], args) for args in calls])
+
+        if previous is not None:
+            return self._respond([FakeTextPart(previous.get("message", "처리 완료했습니다."))])
+        return self._respond([FakeTextPart("안녕하세요! 매물 조회, 가격 조정, 끌어올리기, 시세 조회를 도와드릴 수 있어요.")])
+
+
+class FakeGenerativeModel:
+    """Drop-in replacement for genai.GenerativeModel"""
+
+    latency_ms = FAKE_LLM_LATENCY_MS
+    error_rate = FAKE_LLM_ERROR_RATE
+    slow_rate = FAKE_LLM_SLOW_RATE
+    slow_ms = FAKE_LLM_SLOW_MS
+
+    def __init__(
+        self,
+        model_name: str = "fake",
+        system_instruction: str = "",
+        tools=None,
+        safety_settings=None,
+        generation_config=None,
+        **kwargs
+    ):
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+        self.tools = tools
+        # Declarations count towards the prompt like they do upstream
+        self.tool_chars = len(json.dumps(tools, ensure_ascii=False)) if tools else 0
+        self.json_mode = (generation_config or {}).get("response_mime_type") == "application/json"
+
+    def start_chat(self, history: list = None) -> FakeChatSession:
+        return FakeChatSession(self, history)
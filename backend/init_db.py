@@ -1,11 +1,26 @@
 """
 Initialize database with sample data
 Run this script to create the database and populate with test listings
+
+Usage:
+    python init_db.py                                  # 10 hand-written sample listings
+    python init_db.py --synthetic 1000000 --seed 7     # bulk synthetic dataset
 """
+import argparse
 import asyncio
-import sys
-from datetime import datetime, timedelta
-from database import db
+import itertools
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Iterable, Optional, Tuple
+
+import aiosqlite
+
+from database import db, ShardedDatabase
+from cache import versions, ALL_LISTINGS
+from listing_record import LISTING_COLUMNS
+from config import CATEGORIES, REGIONS, BOOST_COOLDOWN_HOURS, DEFAULT_SELLER_ID
 
 
 # Sample listings data (10 realistic items)
@@ -113,6 +128,222 @@ SAMPLE_LISTINGS = [
 ]
 
 
+# === Synthetic data generator ===
+
+# Per-category title vocabulary and log-normal price parameters (median KRW, sigma)
+CATEGORY_PROFILES = {
+    "전자기기": {
+        "brands": ["애플", "삼성", "LG", "소니", "로지텍", "닌텐도", "다이슨"],
+        "items": ["맥북 에어", "아이폰 13", "갤럭시 S23", "아이패드 프로", "27인치 모니터", "무선 이어폰",
+                  "기계식 키보드", "무선 마우스", "스위치 OLED", "블루투스 스피커", "공기청정기"],
+        "median_price": 250000,
+        "sigma": 0.9,
+    },
+    "가구": {
+        "brands": ["이케아", "한샘", "시디즈", "리바트", "일룸", "무인양품"],
+        "items": ["책상", "3인용 소파", "사무용 의자", "원목 식탁", "책장", "침대 프레임", "서랍장", "수납장"],
+        "median_price": 120000,
+        "sigma": 0.7,
+    },
+    "의류": {
+        "brands": ["노스페이스", "유니클로", "나이키", "아디다스", "자라", "무신사 스탠다드", "폴로"],
+        "items": ["패딩", "니트", "후드티", "청바지", "코트", "운동화", "셔츠", "가디건"],
+        "median_price": 40000,
+        "sigma": 0.8,
+    },
+    "도서": {
+        "brands": ["민음사", "창비", "문학동네", "한빛미디어", "길벗"],
+        "items": ["소설 전집", "파이썬 입문서", "토익 문제집", "자기계발서", "만화책 세트", "동화책 묶음"],
+        "median_price": 12000,
+        "sigma": 0.6,
+    },
+    "스포츠": {
+        "brands": ["요넥스", "윌슨", "자이언트", "캠핑온", "나이키"],
+        "items": ["배드민턴 라켓", "테니스 라켓", "로드 자전거", "캠핑 텐트", "요가 매트", "덤벨 세트", "골프채"],
+        "median_price": 90000,
+        "sigma": 1.0,
+    },
+    "기타": {
+        "brands": ["무인양품", "레고", "스타벅스", "다이소"],
+        "items": ["레고 세트", "텀블러", "화분", "캐리어", "유모차", "가습기"],
+        "median_price": 30000,
+        "sigma": 0.9,
+    },
+}
+
+TITLE_SUFFIXES = ["팝니다", "급매", "판매", "거의 새것", "상태 좋아요", "직거래", "가격 내림", "풀박스", ""]
+
+CONTENT_TEMPLATES = [
+    "{item} 판매합니다. {months}개월 사용했고 상태 {condition}. {trade} 가능합니다.",
+    "{brand} {item}입니다. 구매 후 {months}개월 정도 썼습니다. 사용감 {condition}. {trade} 선호합니다.",
+    "이사 가면서 정리합니다. {brand} {item}, 상태 {condition}. {trade}만 가능해요.",
+]
+
+CONDITIONS = ["최상입니다", "아주 좋습니다", "양호합니다", "약간 있습니다"]
+TRADES = ["직거래", "택배 거래", "직거래/택배 모두"]
+
+# Status mix of the generated inventory
+STATUS_WEIGHTS = (("active", 0.75), ("sold", 0.2), ("deleted", 0.05))
+
+# Columns of generated rows: every listings column but id, in table order
+SEED_COLUMNS = tuple(column for column in LISTING_COLUMNS if column != "id")
+
+
+def _timestamp(value: datetime) -> str:
+    """Format like SQLite CURRENT_TIMESTAMP (UTC, second precision)"""
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def generate_listings(
+    count: int,
+    seed: int = 42,
+    max_age_days: int = 60,
+    now: Optional[datetime] = None,
+    sellers: int = 1
+) -> Iterator[Tuple]:
+    """
+    Generate synthetic listing rows (in SEED_COLUMNS order)
+
+    Args:
+        count: Number of rows
+        seed: Random seed (same seed -> same dataset)
+        max_age_days: Oldest created_at relative to now
+        now: Reference time (UTC, defaults to current time)
+        sellers: Number of sellers (IDs from DEFAULT_SELLER_ID up, Zipf-like sizes)
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    statuses = [status for status, _ in STATUS_WEIGHTS]
+    status_weights = [weight for _, weight in STATUS_WEIGHTS]
+    # Skew categories a bit: electronics and clothes dominate real second-hand markets
+    category_weights = [30 if c in ("전자기기", "의류") else 10 for c in CATEGORIES]
+    # A few power sellers own most of the inventory (weight 1/rank)
+    seller_ids = list(range(DEFAULT_SELLER_ID, DEFAULT_SELLER_ID + sellers))
+    seller_cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, sellers + 1)))
+
+    for _ in range(count):
+        category = rng.choices(CATEGORIES, weights=category_weights)[0]
+        profile = CATEGORY_PROFILES.get(category, CATEGORY_PROFILES["기타"])
+        brand = rng.choice(profile["brands"])
+        item = rng.choice(profile["items"])
+        suffix = rng.choice(TITLE_SUFFIXES)
+        title = f"{brand} {item} {suffix}".strip()
+        content = rng.choice(CONTENT_TEMPLATES).format(
+            brand=brand, item=item, months=rng.randint(1, 36),
+            condition=rng.choice(CONDITIONS), trade=rng.choice(TRADES),
+        )
+
+        # Log-normal prices rounded to typical asking-price steps
+        raw_price = rng.lognormvariate(math.log(profile["median_price"]), profile["sigma"])
+        step = 1000 if raw_price < 100000 else 10000
+        price = max(step, int(round(raw_price / step)) * step)
+
+        # Older listings are rarer (exponential age distribution)
+        age_seconds = min(rng.expovariate(1 / (max_age_days * 86400 / 4)), max_age_days * 86400)
+        created_at = now - timedelta(seconds=age_seconds)
+
+        # Boost history: roughly one boost per few days of age, only after the first day
+        boost_count = 0
+        last_boosted_at = None
+        age_days = age_seconds / 86400
+        if age_days > 1 and rng.random() < 0.6:
+            boost_count = rng.randint(1, max(1, int(age_days / 3)))
+            last_boosted_at = created_at + timedelta(seconds=rng.uniform(86400, age_seconds))
+
+        boost_eligible_at = created_at
+        if last_boosted_at:
+            boost_eligible_at = last_boosted_at + timedelta(hours=BOOST_COOLDOWN_HOURS)
+
+        status = rng.choices(statuses, weights=status_weights)[0]
+        updated_at = last_boosted_at or created_at
+        if status != "active":
+            updated_at = max(updated_at, created_at + timedelta(seconds=rng.uniform(0, age_seconds)))
+
+        yield (
+            title, content, price, category, rng.choice(REGIONS), None, status,
+            _timestamp(created_at), _timestamp(updated_at),
+            _timestamp(last_boosted_at) if last_boosted_at else None, boost_count,
+            _timestamp(boost_eligible_at),
+            rng.choices(seller_ids, cum_weights=seller_cum_weights)[0] if sellers > 1 else DEFAULT_SELLER_ID,
+        )
+
+
+async def bulk_insert_listings(rows: Iterable[Tuple], batch_size: int = 50000, db_path: str = None) -> int:
+    """
+    Insert rows (SEED_COLUMNS order) with executemany in large transactions
+
+    Returns:
+        Number of inserted rows
+    """
+    db_path = db_path or db.db_path
+    placeholders = ", ".join("?" for _ in SEED_COLUMNS)
+    query = f"INSERT INTO listings ({', '.join(SEED_COLUMNS)}) VALUES ({placeholders})"
+
+    inserted = 0
+    async with aiosqlite.connect(db_path) as conn:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await conn.executemany(query, batch)
+                await conn.commit()
+                inserted += len(batch)
+                batch = []
+        if batch:
+            await conn.executemany(query, batch)
+            await conn.commit()
+            inserted += len(batch)
+    # Running workers must drop cached listings
+    versions.bump(ALL_LISTINGS)
+    return inserted
+
+
+async def insert_listings(rows: Iterable[Tuple], batch_size: int = 50000) -> int:
+    """Insert rows into the global database, routing each row to its seller's shard when sharded"""
+    if not isinstance(db, ShardedDatabase):
+        return await bulk_insert_listings(rows, batch_size=batch_size)
+
+    seller_column = SEED_COLUMNS.index("seller_id")
+    buffers = {index: [] for index in range(len(db.shards))}
+    inserted = 0
+    for row in rows:
+        index = db.shard_index(row[seller_column])
+        buffers[index].append(row)
+        if len(buffers[index]) >= batch_size:
+            inserted += await bulk_insert_listings(buffers[index], batch_size, db.shards[index].db_path)
+            buffers[index] = []
+    for index, buffer in buffers.items():
+        if buffer:
+            inserted += await bulk_insert_listings(buffer, batch_size, db.shards[index].db_path)
+    return inserted
+
+
+async def seed_synthetic(
+    count: int,
+    seed: int = 42,
+    batch_size: int = 50000,
+    db_path: str = None,
+    sellers: int = 1
+) -> int:
+    """Replace all listings with a synthetic dataset of the given size"""
+    if db_path is None and isinstance(db, ShardedDatabase):
+        await db.init_db()
+        await db.clear_all_listings()
+        return await insert_listings(generate_listings(count, seed=seed, sellers=sellers), batch_size=batch_size)
+
+    target = db_path or db.db_path
+    await db.init_db()
+    async with aiosqlite.connect(target) as conn:
+        # Archived rows and rules of the previous dataset would point at reused IDs
+        for table in ("listings", "listings_archive", "listing_archive_stats", "listing_rules"):
+            await conn.execute(f"DELETE FROM {table}")
+        await conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('listings', 'listing_rules')")
+        await conn.commit()
+    return await bulk_insert_listings(
+        generate_listings(count, seed=seed, sellers=sellers), batch_size=batch_size, db_path=target
+    )
+
+
 async def init_database():
     """Initialize database and insert sample data"""
     print("🔧 Initializing database...")
@@ -128,52 +359,31 @@ async def init_database():
     # Insert sample listings
     print(f"\n📦 Inserting {len(SAMPLE_LISTINGS)} sample listings...")
 
-    for idx, listing in enumerate(SAMPLE_LISTINGS, 1):
-        # Extract timing information
-        days_ago = listing.pop("days_ago", 0)
-        boost_count = listing.pop("boost_count", 0)
-
-        listing_id = await db.create_listing(
-            title=listing["title"],
-            content=listing["content"],
-            price=listing["price"],
-            category=listing["category"],
-            region=listing["region"],
-            image_url=listing.get("image_url")
-        )
+    # last_boosted_at is left as NULL (never boosted)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = []
+    for listing in SAMPLE_LISTINGS:
+        created_at = _timestamp(now - timedelta(days=listing["days_ago"]))
+        rows.append((
+            listing["title"], listing["content"], listing["price"], listing["category"],
+            listing["region"], listing.get("image_url"), "active",
+            created_at, created_at, None, listing["boost_count"], created_at, DEFAULT_SELLER_ID,
+        ))
+    await insert_listings(rows)
 
-        # Update created_at to simulate different dates
-        # last_boosted_at is left as NULL (never boosted)
-        import aiosqlite
-        async with aiosqlite.connect(db.db_path) as conn:
-            if days_ago > 0:
-                created_date = datetime.now() - timedelta(days=days_ago)
-                await conn.execute("""
-                    UPDATE listings
-                    SET created_at = ?, updated_at = ?, boost_count = ?
-                    WHERE id = ?
-                """, (created_date.isoformat(), created_date.isoformat(), boost_count, listing_id))
-            else:
-                await conn.execute("""
-                    UPDATE listings
-                    SET boost_count = ?
-                    WHERE id = ?
-                """, (boost_count, listing_id))
-            await conn.commit()
-
-        print(f"  {idx}. {listing['title'][:30]}... (ID: {listing_id}, {days_ago}일 전)")
+    for idx, listing in enumerate(SAMPLE_LISTINGS, 1):
+        print(f"  {idx}. {listing['title'][:30]}... (ID: {idx}, {listing['days_ago']}일 전)")
 
     print("\n✅ Sample data inserted successfully!")
 
     # Verify data
-    all_listings = await db.get_all_listings()
-    print(f"\n📊 Total listings in database: {len(all_listings)}")
-
     # Show summary by category
     categories = {}
-    for listing in all_listings:
-        cat = listing["category"]
+    total = 0
+    async for (cat,) in db.iter_listings(columns=("category",), as_tuples=True):
         categories[cat] = categories.get(cat, 0) + 1
+        total += 1
+    print(f"\n📊 Total listings in database: {total}")
 
     print("\n📈 Summary by category:")
     for cat, count in categories.items():
@@ -182,5 +392,24 @@ async def init_database():
     print("\n🎉 Database initialization complete!")
 
 
+async def init_synthetic(count: int, seed: int, batch_size: int, sellers: int = 1):
+    """Initialize database with a synthetic dataset"""
+    print(f"🔧 Generating {count:,} synthetic listings for {sellers:,} seller(s) (seed={seed})...")
+    start = time.perf_counter()
+    inserted = await seed_synthetic(count, seed=seed, batch_size=batch_size, sellers=sellers)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Inserted {inserted:,} listings in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
 if __name__ == "__main__":
-    asyncio.run(init_database())
+    parser = argparse.ArgumentParser(description="Initialize the JOL database")
+    parser.add_argument("--synthetic", type=int, help="Generate N synthetic listings instead of the samples")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for --synthetic")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Rows per transaction")
+    parser.add_argument("--sellers", type=int, default=1, help="Number of sellers for --synthetic")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        asyncio.run(init_synthetic(args.synthetic, args.seed, args.batch_size, args.sellers))
+    else:
+        asyncio.run(init_database())
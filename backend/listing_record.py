@@ -0,0 +1,100 @@
+"""
+Compact listing rows
+Database returns listings as ListingRecord: one object with a slot per
+column, built by the cursor's row factory straight from the SQLite tuple
+(no sqlite3.Row, no per-row dict). It reads like the dict it replaces
+(record["price"], record.get(...), **record, ListingResponse.model_validate)
+and also by attribute (record.price).
+
+Records are shared between callers (query cache, snapshot, coalesced reads)
+and must be treated as read-only. JSON payloads need plain dicts: convert
+with to_plain() where results leave the process (LLM function responses,
+API responses).
+"""
+from collections.abc import Mapping
+from operator import attrgetter
+from typing import Any, Dict, List, Sequence
+
+import aiosqlite
+
+
+# Columns of the listings table (explicit order for tuple rows and SELECTs)
+LISTING_COLUMNS = (
+    "id", "title", "content", "price", "category", "region", "image_url", "status",
+    "created_at", "updated_at", "last_boosted_at", "boost_count", "boost_eligible_at", "seller_id",
+)
+LISTING_SELECT = ", ".join(LISTING_COLUMNS)
+
+_COLUMN_SET = frozenset(LISTING_COLUMNS)
+_values = attrgetter(*LISTING_COLUMNS)
+
+
+class ListingRecord(Mapping):
+    """One listings row (read-only mapping over LISTING_COLUMNS)"""
+    __slots__ = LISTING_COLUMNS
+
+    def __init__(
+        self, id, title, content, price, category, region, image_url, status,
+        created_at, updated_at, last_boosted_at, boost_count, boost_eligible_at, seller_id
+    ):
+        self.id = id
+        self.title = title
+        self.content = content
+        self.price = price
+        self.category = category
+        self.region = region
+        self.image_url = image_url
+        self.status = status
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.last_boosted_at = last_boosted_at
+        self.boost_count = boost_count
+        self.boost_eligible_at = boost_eligible_at
+        self.seller_id = seller_id
+
+    @staticmethod
+    def row_factory(cursor, row: tuple) -> "ListingRecord":
+        """sqlite3 row factory for SELECT LISTING_SELECT"""
+        return ListingRecord(*row)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _COLUMN_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _COLUMN_SET else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in _COLUMN_SET
+
+    def __iter__(self):
+        return iter(LISTING_COLUMNS)
+
+    def __len__(self) -> int:
+        return len(LISTING_COLUMNS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(LISTING_COLUMNS, _values(self)))
+
+    def __repr__(self) -> str:
+        return f"ListingRecord(id={self.id!r}, title={self.title!r}, status={self.status!r})"
+
+
+async def fetch_listings(db: aiosqlite.Connection, query: str, params: Sequence[Any] = ()) -> List[ListingRecord]:
+    """Rows of a SELECT LISTING_SELECT query, built as ListingRecords by the cursor"""
+    async with await db.cursor() as cursor:
+        cursor.row_factory = ListingRecord.row_factory
+        await cursor.execute(query, params)
+        return await cursor.fetchall()
+
+
+def to_plain(value: Any) -> Any:
+    """Copy of a tool/API result with every ListingRecord (also nested in dicts and lists) as a dict"""
+    if isinstance(value, ListingRecord):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    return value
@@ -0,0 +1,246 @@
+"""
+In-memory columnar snapshot of active listings
+Seller-scoped reads of active listings (query_listings, get_all_listings and
+everything built on them) can be answered from NumPy arrays instead of
+SQLite: one array per filter/sort column plus an ID -> row index, one
+partition per seller and database file.
+
+SQLite stays the source of truth. Every Database write bumps the seller's
+cache version (cache.py); when a partition's version is out of date it
+re-reads only the rows whose updated_at moved since its last refresh (every
+write sets updated_at), and reloads completely if the active row count still
+disagrees (rows deleted or moved by rebalance_shards.py).
+
+Enable with JOL_LISTING_SNAPSHOT=1. NumPy is optional: without it the
+snapshot stays off and every read goes to SQLite.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import aiosqlite
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+from cache import versions
+from listing_record import ListingRecord, LISTING_SELECT, fetch_listings
+from metrics import LISTING_SNAPSHOT_REFRESHES
+
+
+SORT_FIELDS = ("created_at", "updated_at", "last_boosted_at", "price", "boost_count", "id")
+
+# Row positions in a partition's column matrix
+ID, PRICE, CATEGORY, REGION, CREATED, UPDATED, BOOSTED, BOOST_COUNT = range(8)
+SORT_COLUMNS = {
+    "created_at": CREATED, "updated_at": UPDATED, "last_boosted_at": BOOSTED,
+    "price": PRICE, "boost_count": BOOST_COUNT, "id": ID,
+}
+
+# Re-read rows updated this long before the last refresh: a transaction can
+# commit a little after its CURRENT_TIMESTAMP was taken
+DELTA_MARGIN = "-5 seconds"
+
+SECONDS_PER_DAY = 86400
+
+
+def available() -> bool:
+    """Whether NumPy is installed"""
+    return np is not None
+
+
+def _epoch_seconds(values: Sequence[Optional[str]]) -> "np.ndarray":
+    """SQLite timestamps (UTC text) -> int64 seconds, NULL -> NaT's minimum int64"""
+    return np.array(values, dtype="datetime64[s]").astype(np.int64)
+
+
+class _Partition:
+    """Active listings of one seller: ListingRecords plus one int64 column each for filtering and sorting"""
+
+    def __init__(self, rows: List[ListingRecord], codes: Dict[str, int]):
+        self.codes = codes
+        self.rows: List[Optional[ListingRecord]] = list(rows)
+        self.index = {row.id: position for position, row in enumerate(self.rows)}
+        self.size = len(self.rows)
+        self.columns = np.zeros((8, max(self.size, 16)), dtype=np.int64)
+        self.alive = np.zeros(self.columns.shape[1], dtype=bool)
+        self.alive[:self.size] = True
+        self.version: Optional[str] = None
+        self.watermark: Optional[str] = None
+        if self.rows:
+            self.columns[:, :self.size] = self._values(self.rows)
+
+    @property
+    def count(self) -> int:
+        return len(self.index)
+
+    def _code(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        return self.codes.setdefault(value, len(self.codes))
+
+    def _values(self, rows: List[ListingRecord]) -> "np.ndarray":
+        created = _epoch_seconds([row.created_at for row in rows])
+        boosted = _epoch_seconds([row.last_boosted_at for row in rows])
+        # ORDER BY COALESCE(last_boosted_at, created_at)
+        boosted = np.where(boosted == np.iinfo(np.int64).min, created, boosted)
+        return np.array([
+            [row.id for row in rows],
+            [row.price for row in rows],
+            [self._code(row.category) for row in rows],
+            [self._code(row.region) for row in rows],
+            created,
+            _epoch_seconds([row.updated_at for row in rows]),
+            boosted,
+            [row.boost_count or 0 for row in rows],
+        ], dtype=np.int64)
+
+    def upsert(self, row: ListingRecord):
+        """Apply a re-read row: keep it if active, drop it otherwise"""
+        position = self.index.get(row.id)
+        if row.status != "active":
+            if position is not None:
+                self.alive[position] = False
+                self.rows[position] = None
+                del self.index[row.id]
+            return
+        if position is None:
+            if self.size == self.columns.shape[1]:
+                self._grow()
+            position = self.size
+            self.size += 1
+            self.rows.append(None)
+            self.index[row.id] = position
+        self.rows[position] = row
+        self.columns[:, position] = self._values([row])[:, 0]
+        self.alive[position] = True
+
+    def _grow(self):
+        capacity = self.columns.shape[1] * 2
+        columns = np.zeros((8, capacity), dtype=np.int64)
+        columns[:, :self.size] = self.columns[:, :self.size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        self.columns, self.alive = columns, alive
+
+    def select(
+        self,
+        category: Optional[str],
+        region: Optional[str],
+        days_ago: Optional[int],
+        exact_day_ago: Optional[int],
+        sort_by: str,
+        sort_order: str,
+        today: int
+    ) -> List[ListingRecord]:
+        """Filter and sort with vectorized operations (same semantics as Database.query_listings)"""
+        columns = self.columns[:, :self.size]
+        mask = self.alive[:self.size].copy()
+        for column, value in ((CATEGORY, category), (REGION, region)):
+            if value:
+                code = self.codes.get(value)
+                if code is None:
+                    return []
+                mask &= columns[column] == code
+        if exact_day_ago is not None:
+            mask &= columns[CREATED] // SECONDS_PER_DAY == today - exact_day_ago
+        elif days_ago is not None and days_ago > 0:
+            mask &= columns[CREATED] // SECONDS_PER_DAY >= today - days_ago
+
+        positions = np.flatnonzero(mask)
+        # Ties are broken by ID, in the direction of the sort
+        order = np.lexsort((columns[ID, positions], columns[SORT_COLUMNS[sort_by], positions]))
+        if sort_order == "DESC":
+            order = order[::-1]
+        # Records are read-only: shared with the caller, not copied
+        return [self.rows[position] for position in positions[order].tolist()]
+
+
+class ListingSnapshot:
+    """Columnar read model of active listings, one partition per (database file, seller)"""
+
+    def __init__(self):
+        self._partitions: Dict[Tuple[str, int], _Partition] = {}
+        self._locks: Dict[Tuple[str, int], asyncio.Lock] = {}
+        # Category/region codes shared by every partition
+        self._codes: Dict[str, int] = {}
+
+    async def query(
+        self,
+        db_path: str,
+        seller_id: int,
+        category: Optional[str] = None,
+        region: Optional[str] = None,
+        days_ago: Optional[int] = None,
+        exact_day_ago: Optional[int] = None,
+        sort_by: str = "created_at",
+        sort_order: str = "DESC"
+    ) -> List[ListingRecord]:
+        """
+        Active listings of a seller, filtered and sorted like Database.query_listings
+
+        Args:
+            db_path: SQLite file holding the seller's listings
+        """
+        if sort_by not in SORT_FIELDS:
+            sort_by = "created_at"
+        sort_order = sort_order.upper()
+        if sort_order not in ("ASC", "DESC"):
+            sort_order = "DESC"
+        partition = await self._partition(db_path, seller_id)
+        # date('now') in SQLite is the UTC day as well
+        today = int(time.time() // SECONDS_PER_DAY)
+        return partition.select(category, region, days_ago, exact_day_ago, sort_by, sort_order, today)
+
+    async def _partition(self, db_path: str, seller_id: int) -> _Partition:
+        """Partition brought up to date with the seller's cache version"""
+        key = (db_path, seller_id)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Read before loading: a write committed meanwhile leaves the partition stale, not wrong
+            version = versions.listings_version(seller_id)
+            partition = self._partitions.get(key)
+            if partition is not None and partition.version == version:
+                return partition
+            async with aiosqlite.connect(db_path) as conn:
+                # One read transaction: changed rows, count and watermark agree with each other
+                await conn.execute("BEGIN")
+                cursor = await conn.execute("SELECT datetime('now', ?)", (DELTA_MARGIN,))
+                (watermark,) = await cursor.fetchone()
+                if partition is not None:
+                    partition = await self._apply_changes(conn, partition, seller_id)
+                if partition is None:
+                    rows = await fetch_listings(
+                        conn, f"SELECT {LISTING_SELECT} FROM listings WHERE seller_id = ? AND status = 'active'", (seller_id,)
+                    )
+                    partition = _Partition(rows, self._codes)
+                    LISTING_SNAPSHOT_REFRESHES.inc(kind="full")
+                await conn.execute("COMMIT")
+            partition.version, partition.watermark = version, watermark
+            self._partitions[key] = partition
+            return partition
+
+    async def _apply_changes(
+        self,
+        conn: aiosqlite.Connection,
+        partition: _Partition,
+        seller_id: int
+    ) -> Optional[_Partition]:
+        """Re-read rows updated since the last refresh (None if a full reload is needed)"""
+        rows = await fetch_listings(
+            conn, f"SELECT {LISTING_SELECT} FROM listings WHERE seller_id = ? AND updated_at >= ?",
+            (seller_id, partition.watermark)
+        )
+        for row in rows:
+            partition.upsert(row)
+        cursor = await conn.execute(
+            "SELECT COUNT(*) FROM listings WHERE seller_id = ? AND status = 'active'", (seller_id,)
+        )
+        (count,) = await cursor.fetchone()
+        # Reload when rows vanished, or to drop the slots of rows that left
+        if count != partition.count or partition.size > 2 * count + 1024:
+            return None
+        LISTING_SNAPSHOT_REFRESHES.inc(kind="delta")
+        return partition
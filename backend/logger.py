@@ -0,0 +1,135 @@
+"""
+Structured logging for JOL AI Agent
+Non-blocking queue handler with per-request correlation IDs
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import LOG_LEVEL, LOG_FORMAT
+
+
+# Correlation ID of the request currently being handled ("-" outside requests)
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def new_request_id() -> str:
+    """Generate a short random request ID"""
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to every record (runs in the caller's context)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; structured fields come from extra={"fields": {...}}"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human readable format for local development"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-5s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the record intact for the listener's formatter"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message eagerly (args may be mutated later) but defer
+        # the actual formatting/serialization to the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """Route all logging through a background queue listener (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    # Only our own loggers go down to DEBUG; third-party libraries
+    # (aiosqlite logs every operation at DEBUG) stay at INFO or above
+    app_level = logging.getLevelName(level.upper())
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(max(app_level, logging.INFO))
+    logging.getLogger("jol").setLevel(app_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive fork(): give prefork workers their own
+    global _listener
+    if _listener is not None:
+        _listener = None
+        setup_logging()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a module logger"""
+    return logging.getLogger(f"jol.{name}")
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
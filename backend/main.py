@@ -1,20 +1,49 @@
 """
 FastAPI main server for JOL AI Agent
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, HTMLResponse, StreamingResponse, Response
+from pydantic import TypeAdapter, ValidationError
 from contextlib import asynccontextmanager
-import uvicorn
+import asyncio
+import hashlib
+import os
+import time
+from typing import Optional
 
 from models import (
     ChatRequest, ChatResponse, ListingResponse,
-    ListingCreateRequest, ActionResult, SuggestedAction
+    ListingCreateRequest, ActionResult, SuggestedAction,
+    ActionExecuteRequest, ActionExecuteResponse,
+    BulkImportResponse, BulkImportError
 )
 from database import db
-from agent_v2 import agent
-from config import HOST, PORT, RELOAD, CORS_ORIGINS
+from agent_v2 import get_agent
+from metrics import registry, CHAT_REQUEST_SECONDS, ACTION_REQUEST_SECONDS
+from logger import setup_logging, get_logger, request_id_var, new_request_id
+from tracing import tracer, render_waterfall_html
+from bulk_io import (
+    iter_ndjson_records, iter_csv_records, format_validation_error,
+    encode_ndjson, encode_csv, EXPORT_COLUMNS
+)
+from scheduler import scheduler
+from archiver import archiver
+from admission import chat_admission, AdmissionRejected, retry_after_header
+from actions import ActionTokenError, verify_action, execute_action, updated_listing_ids
+from auth import current_seller, resolve_seller_id
+from cache import versions, VersionedCache
+from singleflight import SingleFlight
+from listing_record import to_plain
+from config import (
+    HOST, PORT, RELOAD, CORS_ORIGINS, BULK_IMPORT_BATCH_SIZE, EXPORT_FETCH_SIZE,
+    SCHEDULER_ENABLED, LISTINGS_CACHE_SIZE, AGENT_WARMUP, ARCHIVE_ENABLED, DEBUG_TRACE_ENABLED
+)
+
+
+setup_logging()
+logger = get_logger("server")
 
 
 # === Lifespan events ===
@@ -23,14 +52,34 @@ from config import HOST, PORT, RELOAD, CORS_ORIGINS
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup: Initialize database
-    print("🚀 Starting JOL AI Agent Server...")
+    logger.info("Starting JOL AI Agent Server")
     await db.init_db()
-    print("✅ Database initialized")
+    logger.info("Database initialized")
+
+    # Load the LLM SDK: in the background by default so the worker is
+    # ready for non-chat traffic immediately; "lazy" waits for the first /chat
+    warmup = None
+    if AGENT_WARMUP == "startup":
+        await asyncio.to_thread(get_agent().warm_up)
+    elif AGENT_WARMUP == "background":
+        warmup = asyncio.create_task(asyncio.to_thread(get_agent().warm_up), name="agent-warmup")
+
+    # Start background rule scheduler (auto boost / price drop);
+    # with serve.py only worker 0 runs it so rules fire once
+    if SCHEDULER_ENABLED and os.getenv("JOL_WORKER_ID", "0") == "0":
+        await scheduler.start()
+    # Background move of old sold/deleted listings to listings_archive (also worker 0 only)
+    if ARCHIVE_ENABLED and os.getenv("JOL_WORKER_ID", "0") == "0":
+        await archiver.start()
 
     yield
 
     # Shutdown
-    print("👋 Shutting down server...")
+    logger.info("Shutting down server")
+    await scheduler.stop()
+    await archiver.stop()
+    if warmup is not None and not warmup.done():
+        await warmup
 
 
 # === FastAPI App ===
@@ -52,6 +101,30 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Assign a correlation ID to each request (honors incoming X-Request-ID)"""
+    request_id = request.headers.get("x-request-id", "")[:64] or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        with tracer.start_span(f"{request.method} {request.url.path}") as span:
+            if span is not None:
+                # Owner of the trace: /debug/trace only shows a seller their own requests
+                try:
+                    span.set_attribute("seller.id", resolve_seller_id(
+                        request.headers.get("authorization"), request.headers.get("x-seller-id")
+                    ))
+                except HTTPException:
+                    pass
+            response = await call_next(request)
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
 # === Routes ===
 
 @app.get("/")
@@ -66,22 +139,67 @@ async def health_check():
     return {"status": "healthy", "service": "JOL AI Agent"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/debug/trace/{request_id}")
+async def debug_trace(request_id: str, format: str = "html", seller_id: int = Depends(current_seller)):
+    """
+    Render the recorded spans of a request as a waterfall
+
+    Only requests the authenticated seller made are shown (request IDs are
+    chosen by clients, so one ID can cover several sellers' requests).
+    Disabled with JOL_DEBUG_TRACE=0.
+
+    Args:
+        request_id: Value of the X-Request-ID response header
+        format: "html" (default) or "json"
+    """
+    if not DEBUG_TRACE_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    spans = tracer.get_trace(request_id)
+    owned = {
+        span.trace_id for span in spans
+        if span.parent_span_id is None and span.attributes.get("seller.id") == seller_id
+    }
+    spans = [span for span in spans if span.trace_id in owned]
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"Trace {request_id} not found")
+    if format == "json":
+        return {"request_id": request_id, "spans": [span.to_dict() for span in spans]}
+    return HTMLResponse(render_waterfall_html(request_id, spans))
+
+
 # === Chat Endpoint ===
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, seller_id: int = Depends(current_seller)):
     """
     Process chat message and execute agent actions
 
+    Runs behind admission control: 429 when the seller exceeds their rate,
+    503 when every agent slot is busy and the wait queue is full or too slow.
+
     Args:
         request: ChatRequest with user message
+        seller_id: Authenticated seller (the agent only sees their listings)
 
     Returns:
         ChatResponse with agent response and actions
     """
+    start = time.perf_counter()
+    outcome = "error"
     try:
         # Process message through agent with history
-        result = await agent.process_message(request.message, history=request.history)
+        with tracer.start_span("chat", message_length=len(request.message), history_length=len(request.history)):
+            async with chat_admission.admit(seller_id):
+                result = await get_agent().process_message(request.message, history=request.history, seller_id=seller_id)
 
         # Convert to response format
         actions_taken = [
@@ -97,28 +215,99 @@ async def chat(request: ChatRequest):
             for action in result["suggested_actions"]
         ]
 
-        return ChatResponse(
+        response = ChatResponse(
             response=result["response"],
             reasoning=result["reasoning"],
             actions_taken=actions_taken,
             suggested_actions=suggested_actions,
             updated_listings=result["updated_listings"]
         )
-
+        outcome = {"ERROR": "error", "FALLBACK": "fallback"}.get(result.get("intent"), "success")
+        return response
+
+    except AdmissionRejected as e:
+        outcome = "rejected"
+        detail = "Too many requests" if e.status_code == 429 else "Server busy, try again shortly"
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"{detail} ({e.reason})",
+            headers={"Retry-After": retry_after_header(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
+    finally:
+        CHAT_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+
+
+# === Suggested Actions ===
+
+@app.post("/actions/execute", response_model=ActionExecuteResponse)
+async def execute_suggested_action(request: ActionExecuteRequest, seller_id: int = Depends(current_seller)):
+    """
+    Run a suggested action from a chat response directly (no LLM round trip)
+
+    The tool and its arguments come from the signed token, not the client:
+    403 for invalid tokens or another seller's, 410 once expired,
+    400 if the tool or arguments no longer match the tools registry.
+
+    Args:
+        request: ActionExecuteRequest with SuggestedAction.token
+        seller_id: Authenticated seller (must be the one the token was issued to)
+
+    Returns:
+        ActionExecuteResponse with the tool result and changed listings
+    """
+    start = time.perf_counter()
+    tool, outcome = "unknown", "rejected"
+    try:
+        tool, params = verify_action(request.token, seller_id)
+        with tracer.start_span("action.execute", tool=tool):
+            result = to_plain(await execute_action(tool, params, seller_id))
+        outcome = "success" if result.get("success") else "failed"
+        return ActionExecuteResponse(tool=tool, result=result, updated_listings=updated_listing_ids(result))
+    except ActionTokenError as e:
+        raise HTTPException(status_code=e.status_code, detail=f"Action rejected ({e.reason})")
+    except Exception as e:
+        outcome = "error"
+        raise HTTPException(status_code=500, detail=f"Action error: {str(e)}")
+    finally:
+        ACTION_REQUEST_SECONDS.observe(time.perf_counter() - start, tool=tool, outcome=outcome)
 
 
 # === Listings Endpoints ===
 
+# Serialized /listings responses, valid for one listings version of the seller
+listings_cache = VersionedCache(LISTINGS_CACHE_SIZE)
+listings_adapter = TypeAdapter(list[ListingResponse])
+# Tabs reloading together after a write build the body once
+listings_flights = SingleFlight("listings")
+
+
+async def _listings_body(status: str, sort_by: str, sort_order: str, seller_id: int) -> bytes:
+    listings = await db.get_all_listings(
+        status=status,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        seller_id=seller_id
+    )
+    # ListingRecords are read by attribute (ListingResponse has from_attributes)
+    return listings_adapter.dump_json(listings_adapter.validate_python(listings, from_attributes=True))
+
+
 @app.get("/listings", response_model=list[ListingResponse])
 async def get_listings(
+    request: Request,
     status: str = "active",
     sort_by: str = "created_at",
-    sort_order: str = "DESC"
+    sort_order: str = "DESC",
+    seller_id: int = Depends(current_seller)
 ):
     """
-    Get all listings with optional status filter and sorting
+    Get the seller's listings with optional status filter and sorting
+
+    Responses carry an ETag derived from the seller's listings version, so
+    clients can revalidate with If-None-Match (304) and workers can reuse
+    the serialized body until any worker writes to those listings.
 
     Args:
         status: Listing status filter (default: "active")
@@ -128,19 +317,69 @@ async def get_listings(
     Returns:
         List of listings
     """
-    try:
-        listings = await db.get_all_listings(
-            status=status,
-            sort_by=sort_by,
-            sort_order=sort_order
+    # Read the version before querying: the body is then at least that fresh
+    version = versions.listings_version(seller_id)
+    cache_key = (seller_id, status, sort_by, sort_order)
+    params_hash = hashlib.md5(repr(cache_key).encode("utf-8")).hexdigest()[:12]
+    etag = f'W/"{version}-{params_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    body = listings_cache.get(cache_key, version)
+    if body is None:
+        try:
+            body, _ = await listings_flights.do(
+                (cache_key, version), lambda: _listings_body(status, sort_by, sort_order, seller_id)
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        listings_cache.set(cache_key, version, body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/listings/export")
+async def export_listings(
+    status: Optional[str] = "active",
+    format: str = "ndjson",
+    seller_id: int = Depends(current_seller)
+):
+    """
+    Stream listings as NDJSON or CSV
+
+    Rows are read from an open cursor in batches and written as they are
+    fetched, so the table is never loaded into memory.
+
+    Args:
+        status: Listing status filter ("all" for every row)
+        format: "ndjson" (default) or "csv"
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    status = None if status == "all" else status
+    if format == "csv":
+        # Plain tuples in CSV column order: no dict per row
+        rows = db.iter_listings(
+            status=status, batch_size=EXPORT_FETCH_SIZE, seller_id=seller_id,
+            columns=EXPORT_COLUMNS, as_tuples=True
         )
-        return [ListingResponse(**listing) for listing in listings]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        body, media_type = encode_csv(rows), "text/csv; charset=utf-8"
+    else:
+        rows = db.iter_listings(status=status, batch_size=EXPORT_FETCH_SIZE, seller_id=seller_id)
+        body, media_type = encode_ndjson(rows), "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="listings.{format}"'}
+    )
 
 
 @app.get("/listings/{listing_id}", response_model=ListingResponse)
-async def get_listing(listing_id: int):
+async def get_listing(listing_id: int, seller_id: int = Depends(current_seller)):
     """
     Get single listing by ID
 
@@ -151,10 +390,10 @@ async def get_listing(listing_id: int):
         Listing details
     """
     try:
-        listing = await db.get_listing_by_id(listing_id)
+        listing = await db.get_listing_by_id(listing_id, seller_id=seller_id, include_archived=True)
         if not listing:
             raise HTTPException(status_code=404, detail=f"Listing {listing_id} not found")
-        return ListingResponse(**listing)
+        return ListingResponse.model_validate(listing)
     except HTTPException:
         raise
     except Exception as e:
@@ -162,7 +401,7 @@ async def get_listing(listing_id: int):
 
 
 @app.post("/listings", response_model=ListingResponse)
-async def create_listing(request: ListingCreateRequest):
+async def create_listing(request: ListingCreateRequest, seller_id: int = Depends(current_seller)):
     """
     Create new listing
 
@@ -178,17 +417,90 @@ async def create_listing(request: ListingCreateRequest):
             content=request.content,
             price=request.price,
             category=request.category,
-            region=request.region
+            region=request.region,
+            seller_id=seller_id
         )
 
-        # Fetch created listing
-        listing = await db.get_listing_by_id(listing_id)
-        return ListingResponse(**listing)
+        # Fetch created listing (seller_id routes to its shard)
+        listing = await db.get_listing_by_id(listing_id, seller_id=seller_id)
+        return ListingResponse.model_validate(listing)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+
+@app.post("/listings/bulk", response_model=BulkImportResponse)
+async def bulk_import_listings(
+    request: Request,
+    format: Optional[str] = None,
+    seller_id: int = Depends(current_seller)
+):
+    """
+    Create many listings from a streamed NDJSON or CSV body
+
+    Rows are parsed and validated as they arrive and inserted in batched
+    transactions; invalid rows are reported by line number and skipped.
+
+    Args:
+        request: Body with one listing per line (CSV needs a header row)
+        format: "ndjson" or "csv" (default: from Content-Type)
+
+    Returns:
+        Counts, created IDs and per-row errors
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    parser = iter_csv_records if format == "csv" else iter_ndjson_records
+    received = 0
+    listing_ids: list[int] = []
+    errors: list[BulkImportError] = []
+    batch: list[dict] = []
+    batch_lines: list[int] = []
+
+    async def flush():
+        try:
+            listing_ids.extend(await db.create_listings_bulk(batch, seller_id=seller_id))
+        except Exception as e:
+            # The batch transaction was rolled back; report every row in it
+            errors.extend(BulkImportError(line=line, error=f"Database error: {str(e)}") for line in batch_lines)
+        batch.clear()
+        batch_lines.clear()
+
+    try:
+        async for line_no, record, error in parser(request.stream()):
+            received += 1
+            if error:
+                errors.append(BulkImportError(line=line_no, error=error))
+                continue
+            try:
+                listing = ListingCreateRequest.model_validate(record)
+            except ValidationError as e:
+                errors.append(BulkImportError(line=line_no, error=format_validation_error(e)))
+                continue
+
+            batch.append(listing.model_dump())
+            batch_lines.append(line_no)
+            if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+                await flush()
+    except ValueError as e:
+        errors.append(BulkImportError(line=received + 1, error=str(e)))
+
+    if batch:
+        await flush()
+
+    return BulkImportResponse(
+        received=received,
+        inserted=len(listing_ids),
+        failed=len(errors),
+        listing_ids=listing_ids,
+        errors=errors
+    )
+
+
 # === Static files (CSS, JS) ===
 
 app.mount("/static", StaticFiles(directory="../frontend"), name="static")
@@ -207,6 +519,7 @@ if __name__ == "__main__":
     ╚══════════════════════════════════════════════════════════╝
     """)
 
+    import uvicorn
     uvicorn.run(
         "main:app",
         host=HOST,
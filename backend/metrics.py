@@ -0,0 +1,443 @@
+"""
+In-process metrics for JOL AI Agent
+Lightweight counters/histograms rendered in Prometheus text format
+"""
+import bisect
+import functools
+import threading
+import time
+from collections.abc import Mapping, Sequence as SequenceABC
+from typing import Dict, Tuple, Sequence, Optional, Callable, Any
+
+
+# Default latency buckets (seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Row count buckets for DB reads
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a label set as {a="x",b="y"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """Increase counter by amount"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value for a label set (0 if never incremented)"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        return self._values.get(key, 0)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge:
+    """Value that can go up and down (e.g. in-flight requests), with optional labels"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        return self._values.get(key, 0)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """Record one observation"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self, **labels) -> Dict[str, float]:
+        """Count and sum for a label set"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        series = self._series.get(key)
+        if series is None:
+            return {"count": 0, "sum": 0.0}
+        return {"count": sum(series[:-1]), "sum": series[-1]}
+
+    def totals(self) -> Dict[str, float]:
+        """Count and sum across all label sets"""
+        with self._lock:
+            series_list = [list(series) for series in self._series.values()]
+        return {
+            "count": sum(sum(series[:-1]) for series in series_list),
+            "sum": sum(series[-1] for series in series_list),
+        }
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds all metrics and renders the /metrics payload"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, description, labels))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry
+registry = MetricsRegistry()
+
+
+# === HTTP / Agent metrics ===
+
+CHAT_REQUEST_SECONDS = registry.histogram(
+    "jol_chat_request_seconds",
+    "End-to-end /chat latency",
+    labels=("outcome",)
+)
+
+CHAT_INFLIGHT = registry.gauge(
+    "jol_chat_inflight",
+    "/chat requests currently running the agent"
+)
+
+CHAT_QUEUE_DEPTH = registry.gauge(
+    "jol_chat_queue_depth",
+    "/chat requests waiting for an agent slot"
+)
+
+CHAT_QUEUE_WAIT_SECONDS = registry.histogram(
+    "jol_chat_queue_wait_seconds",
+    "Time admitted /chat requests waited for an agent slot"
+)
+
+CHAT_REJECTED = registry.counter(
+    "jol_chat_rejected_total",
+    "/chat requests shed by admission control",
+    labels=("reason",)
+)
+
+ACTION_REQUEST_SECONDS = registry.histogram(
+    "jol_action_request_seconds",
+    "/actions/execute latency (suggested actions run without the LLM)",
+    labels=("tool", "outcome")
+)
+
+LLM_CALL_SECONDS = registry.histogram(
+    "jol_llm_call_seconds",
+    "Latency of a single LLM round trip per agent iteration",
+    labels=("iteration",)
+)
+
+AGENT_ITERATIONS = registry.counter(
+    "jol_agent_iterations_total",
+    "Function-calling iterations used by the agent"
+)
+
+AGENT_ITERATION_BUDGET = registry.counter(
+    "jol_agent_iteration_budget_total",
+    "Function-calling iterations allowed (sum of max_iterations per turn)"
+)
+
+AGENT_ITERATION_LIMIT_HITS = registry.counter(
+    "jol_agent_iteration_limit_hits_total",
+    "Turns that stopped because max_iterations was reached"
+)
+
+LLM_RETRIES = registry.counter(
+    "jol_llm_retries_total",
+    "LLM calls retried after a timeout or retryable error",
+    labels=("reason",)
+)
+
+LLM_HEDGES = registry.counter(
+    "jol_llm_hedges_total",
+    "Hedged duplicate LLM requests (sent, and those that answered first)",
+    labels=("outcome",)
+)
+
+LLM_BREAKER_STATE = registry.gauge(
+    "jol_llm_breaker_state",
+    "LLM circuit breaker state (0=closed, 1=open, 2=half-open)"
+)
+
+LLM_FALLBACKS = registry.counter(
+    "jol_llm_fallbacks_total",
+    "Chat turns answered by the rule-based fallback",
+    labels=("reason",)
+)
+
+LLM_TOKENS = registry.counter(
+    "jol_llm_tokens_total",
+    "LLM token usage reported by the API",
+    labels=("kind",)
+)
+
+TOOL_SELECTIONS = registry.counter(
+    "jol_tool_selection_total",
+    "Chat turns by tool selection outcome (subset, none, full)",
+    labels=("outcome",)
+)
+
+PROMPT_CHARS_SAVED = registry.counter(
+    "jol_prompt_chars_saved_total",
+    "System prompt and tool declaration characters not sent thanks to tool selection"
+)
+
+# === Tool metrics ===
+
+TOOL_CALL_SECONDS = registry.histogram(
+    "jol_tool_call_seconds",
+    "Tool function latency",
+    labels=("tool",)
+)
+
+TOOL_ERRORS = registry.counter(
+    "jol_tool_errors_total",
+    "Tool calls that raised or returned success=False",
+    labels=("tool",)
+)
+
+# === Database metrics ===
+
+DB_QUERY_SECONDS = registry.histogram(
+    "jol_db_query_seconds",
+    "Database method latency",
+    labels=("method",)
+)
+
+DB_ROWS_RETURNED = registry.histogram(
+    "jol_db_rows_returned",
+    "Rows returned by database read methods",
+    labels=("method",),
+    buckets=ROW_BUCKETS
+)
+
+DB_COMMITS = registry.counter(
+    "jol_db_commits_total",
+    "Committed write transactions (statement: outside a unit of work)",
+    labels=("scope",)
+)
+
+QUERY_CACHE_REQUESTS = registry.counter(
+    "jol_query_cache_requests_total",
+    "Database query cache lookups (outcome: hit, miss)",
+    labels=("method", "outcome")
+)
+
+QUERY_CACHE_EVICTIONS = registry.counter(
+    "jol_query_cache_evictions_total",
+    "Database query cache entries evicted to stay within JOL_QUERY_CACHE_SIZE",
+    labels=("method",)
+)
+
+SINGLEFLIGHT_CALLS = registry.counter(
+    "jol_singleflight_calls_total",
+    "Coalesced reads: leader ran the call, follower shared a concurrent identical one",
+    labels=("name", "role")
+)
+
+LISTING_SNAPSHOT_REFRESHES = registry.counter(
+    "jol_listing_snapshot_refreshes_total",
+    "In-memory listing snapshot refreshes (full reload or changed rows only)",
+    labels=("kind",)
+)
+
+# === Scheduler metrics ===
+
+SCHEDULER_ACTIONS = registry.counter(
+    "jol_scheduler_actions_total",
+    "Listing changes applied by scheduled rules",
+    labels=("action",)
+)
+
+LISTINGS_ARCHIVED = registry.counter(
+    "jol_listings_archived_total",
+    "Closed listings moved from the listings table to listings_archive"
+)
+
+
+# === Instrumentation helpers ===
+
+def record_llm_usage(response) -> None:
+    """Count tokens from a Gemini response's usage_metadata (if present)"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (
+        ("prompt", "prompt_token_count"),
+        ("candidates", "candidates_token_count"),
+        ("total", "total_token_count"),
+    ):
+        count = getattr(usage, attr, 0) or 0
+        if count:
+            LLM_TOKENS.inc(count, kind=kind)
+
+
+def instrument_tool(func: Callable) -> Callable:
+    """Decorator: record latency and failures of an async tool function"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            TOOL_ERRORS.inc(tool=name)
+            raise
+        finally:
+            TOOL_CALL_SECONDS.observe(time.perf_counter() - start, tool=name)
+        if isinstance(result, dict) and not result.get("success", True):
+            TOOL_ERRORS.inc(tool=name)
+        return result
+
+    return wrapper
+
+
+def instrument_db(func: Callable) -> Callable:
+    """Decorator: record latency and returned row count of an async Database method"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, method=name)
+        if isinstance(result, Mapping):
+            # One row (dict, ListingRecord)
+            DB_ROWS_RETURNED.observe(1, method=name)
+        elif isinstance(result, SequenceABC) and not isinstance(result, (str, bytes)):
+            DB_ROWS_RETURNED.observe(len(result), method=name)
+        elif result is None:
+            DB_ROWS_RETURNED.observe(0, method=name)
+        return result
+
+    return wrapper
@@ -14,6 +14,11 @@ class ChatRequest(BaseModel):
     history: List[Dict[str, str]] = Field(default=[], description="Chat history for context")
 
 
+class ActionExecuteRequest(BaseModel):
+    """Run a suggested action"""
+    token: str = Field(..., min_length=1, description="SuggestedAction.token from a chat response")
+
+
 class ListingCreateRequest(BaseModel):
     """Create new listing request"""
     title: str = Field(..., min_length=1, max_length=200)
@@ -39,6 +44,7 @@ class ListingResponse(BaseModel):
     updated_at: str
     last_boosted_at: Optional[str] = None
     boost_count: int
+    boost_eligible_at: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -55,6 +61,7 @@ class SuggestedAction(BaseModel):
     label: str
     action: str
     params: Dict[str, Any]
+    token: Optional[str] = Field(default=None, description="Signed token for POST /actions/execute")
 
 
 class ChatResponse(BaseModel):
@@ -66,6 +73,28 @@ class ChatResponse(BaseModel):
     updated_listings: List[int]
 
 
+class ActionExecuteResponse(BaseModel):
+    """Result of a suggested action"""
+    tool: str
+    result: Dict[str, Any]
+    updated_listings: List[int]
+
+
+class BulkImportError(BaseModel):
+    """Error for a single row of a bulk import"""
+    line: int
+    error: str
+
+
+class BulkImportResponse(BaseModel):
+    """Result of a bulk listing import"""
+    received: int
+    inserted: int
+    failed: int
+    listing_ids: List[int]
+    errors: List[BulkImportError]
+
+
 # === Internal Models ===
 
 class Listing(BaseModel):
@@ -0,0 +1,324 @@
+"""
+Plan mode: the model writes the whole tool plan in one call
+Steps refer to earlier results symbolically and the executor resolves them
+locally, so dependent steps cost no extra LLM round trips.
+
+Plan format (JSON):
+    {
+      "steps": [
+        {"tool": "query_listings", "args": {"exact_day_ago": 1}},
+        {"tool": "adjust_price", "args": {"listing_id": "$step1.listings[*].id", "new_price": "=price * 0.9"}}
+      ],
+      "response": "어제 올린 매물 가격을 10% 낮췄습니다."
+    }
+
+- "$stepN.path" is replaced by a value from step N's result (1-based);
+  path segments are .field, [index] and [*].
+- A step whose args contain [*] runs once per element of that list.
+- "=expr" is arithmetic over the current element's fields (price, id, ...)
+  and embedded references ("=$step1.listings[0].price - 50000"), with
+  round/int/min/max/abs and + on strings; float results are rounded to int
+  since every numeric tool parameter is an integer.
+"""
+import ast
+import operator
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from config import PLAN_MAX_STEPS, PLAN_MAX_FANOUT
+
+
+REF_PATTERN = re.compile(r"^\$step(\d+)((?:\.[A-Za-z_]\w*|\[(?:\d+|\*)\])*)$")
+EMBEDDED_REF = re.compile(r"\$step\d+(?:\.[A-Za-z_]\w*|\[(?:\d+|\*)\])*")
+PATH_TOKEN = re.compile(r"\.([A-Za-z_]\w*)|\[(\d+|\*)\]")
+
+
+class PlanError(ValueError):
+    """The plan is malformed or refers to something that does not exist"""
+
+
+class PlanStep(BaseModel):
+    """One tool call; args may hold $step references and =expressions"""
+    tool: str
+    args: Dict[str, Any] = Field(default_factory=dict)
+
+
+class ExecutionPlan(BaseModel):
+    """Model output in plan mode"""
+    steps: List[PlanStep] = Field(default_factory=list)
+    response: str = ""
+
+
+# === References ===
+
+def parse_ref(value: Any) -> Optional[Tuple[int, List[Any]]]:
+    """("$step2.listings[*].id") -> (2, ["listings", "*", "id"]); None if not a reference"""
+    if not isinstance(value, str):
+        return None
+    match = REF_PATTERN.match(value)
+    if not match:
+        return None
+    path = []
+    for field, index in PATH_TOKEN.findall(match.group(2)):
+        if field:
+            path.append(field)
+        else:
+            path.append(index if index == "*" else int(index))
+    return int(match.group(1)), path
+
+
+def references(value: Any) -> List[str]:
+    """Reference strings used by an argument value (whole value or inside an =expression)"""
+    if not isinstance(value, str):
+        return []
+    if value.startswith("="):
+        return EMBEDDED_REF.findall(value)
+    return [value] if REF_PATTERN.match(value) else []
+
+
+def _walk(value: Any, path: List[Any], ref: str) -> Any:
+    for segment in path:
+        try:
+            value = value[segment]
+        except (KeyError, IndexError, TypeError):
+            raise PlanError(f"{ref}: '{segment}' not found")
+    return value
+
+
+def _fanout_source(args: Dict[str, Any], results: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    """The list a step iterates over (the part of its [*] references before the star)"""
+    source_key, source = None, None
+    for value in (ref for arg in args.values() for ref in references(arg)):
+        ref = parse_ref(value)
+        if "*" not in ref[1]:
+            continue
+        step, path = ref
+        star = path.index("*")
+        if "*" in path[star + 1:]:
+            raise PlanError(f"{value}: only one [*] per reference")
+        key = (step, tuple(path[:star]))
+        if source_key is not None and key != source_key:
+            raise PlanError("All [*] references of a step must iterate over the same list")
+        source_key = key
+        source = _walk(results[step - 1], path[:star], value)
+        if not isinstance(source, list):
+            raise PlanError(f"{value}: not a list")
+    return source
+
+
+def _resolve(value: Any, results: List[Dict[str, Any]], index: Optional[int], item: Any) -> Any:
+    ref = parse_ref(value)
+    if ref is not None:
+        step, path = ref
+        path = [index if segment == "*" else segment for segment in path]
+        return _walk(results[step - 1], path, value)
+    if isinstance(value, str) and value.startswith("="):
+        names = dict(item) if isinstance(item, dict) else {}
+
+        def bind(match):
+            name = f"_ref{len(names)}"
+            names[name] = _resolve(match.group(0), results, index, item)
+            return name
+
+        expression = EMBEDDED_REF.sub(bind, value[1:])
+        result = evaluate(expression, names)
+        if not isinstance(result, float):
+            return result
+        try:
+            return int(round(result))
+        except (OverflowError, ValueError):
+            # inf or nan, e.g. "=price * 1e308"
+            raise PlanError(f"Cannot evaluate '{expression}': result is {result}")
+    return value
+
+
+# === Expressions ===
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_UNARY_OPS = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+_FUNCTIONS = {"round": round, "int": int, "min": min, "max": max, "abs": abs}
+
+
+def evaluate(expression: str, names: Dict[str, Any]) -> Any:
+    """
+    Evaluate arithmetic over `names` (no attribute access, no arbitrary calls)
+
+    Raises:
+        PlanError: Syntax errors, unknown names or unsupported constructs
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise PlanError(f"Invalid expression '{expression}': {e.msg}")
+
+    def visit(node):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)) and not isinstance(node.value, bool):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id not in names:
+                raise PlanError(f"Unknown name '{node.id}' in '{expression}'")
+            return names[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            left, right = visit(node.left), visit(node.right)
+            if (isinstance(left, str) or isinstance(right, str)) and not isinstance(node.op, ast.Add):
+                # Only concatenation: "x" * 10**9 must not be possible
+                raise PlanError(f"Unsupported string operation in '{expression}'")
+            return _BINARY_OPS[type(node.op)](left, right)
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+            return _UNARY_OPS[type(node.op)](visit(node.operand))
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in _FUNCTIONS and not node.keywords):
+            return _FUNCTIONS[node.func.id](*(visit(arg) for arg in node.args))
+        raise PlanError(f"Unsupported expression '{expression}'")
+
+    try:
+        return visit(tree)
+    except (TypeError, ZeroDivisionError, OverflowError, ValueError) as e:
+        raise PlanError(f"Cannot evaluate '{expression}': {e}")
+
+
+# === Execution ===
+
+def validate_plan(plan: ExecutionPlan, tools: Dict[str, Any]) -> None:
+    """Reject unknown tools and forward or out-of-range references before anything runs"""
+    if len(plan.steps) > PLAN_MAX_STEPS:
+        raise PlanError(f"Plan has {len(plan.steps)} steps (max {PLAN_MAX_STEPS})")
+    for number, step in enumerate(plan.steps, start=1):
+        if step.tool not in tools:
+            raise PlanError(f"Step {number}: unknown tool '{step.tool}'")
+        for value in (ref for arg in step.args.values() for ref in references(arg)):
+            if not 1 <= parse_ref(value)[0] < number:
+                raise PlanError(f"Step {number}: {value} must refer to an earlier step")
+
+
+def resolve_step_args(args: Dict[str, Any], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Concrete argument sets for one step (one per element when it fans out)
+
+    Args:
+        args: Step arguments with references/expressions
+        results: Results of the steps executed so far, in order
+    """
+    source = _fanout_source(args, results)
+    if source is None:
+        return [{key: _resolve(value, results, None, None) for key, value in args.items()}]
+    if len(source) > PLAN_MAX_FANOUT:
+        raise PlanError(f"Step would run {len(source)} times (max {PLAN_MAX_FANOUT})")
+    return [
+        {key: _resolve(value, results, index, item) for key, value in args.items()}
+        for index, item in enumerate(source)
+    ]
+
+
+def _dependencies(step: PlanStep) -> List[Tuple[int, List[Any]]]:
+    return [parse_ref(ref) for arg in step.args.values() for ref in references(arg)]
+
+
+def _nothing_to_do(dependencies: List[Tuple[int, List[Any]]], results: List[Dict[str, Any]]) -> bool:
+    """A reference goes through an empty list (e.g. the query found no listings)"""
+    for step, path in dependencies:
+        value = results[step - 1]
+        for segment in path:
+            if isinstance(value, list) and not value:
+                return True
+            if isinstance(segment, str) and segment != "*" and isinstance(value, dict):
+                value = value.get(segment)
+            elif isinstance(value, list) and isinstance(segment, int) and segment < len(value):
+                value = value[segment]
+            else:
+                break
+    return False
+
+
+async def execute_plan(
+    plan: ExecutionPlan,
+    run_tool: Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """
+    Run a validated plan
+
+    Args:
+        plan: Plan from the model
+        run_tool: Executes one tool call and returns its result
+
+    Returns:
+        One result per step. Fan-out steps return
+        {"success", "count", "results", "message"} aggregating their calls;
+        steps that depend on a failed step are skipped with success=False,
+        steps whose references run into an empty list are skipped with
+        success=True and count=0.
+    """
+    results: List[Dict[str, Any]] = []
+    for number, step in enumerate(plan.steps, start=1):
+        dependencies = _dependencies(step)
+        if any(not results[ref_step - 1].get("success") for ref_step, _ in dependencies):
+            results.append({"success": False, "skipped": True, "message": f"{number}단계는 이전 단계 실패로 건너뛰었습니다."})
+            continue
+        if _nothing_to_do(dependencies, results):
+            results.append({"success": True, "skipped": True, "count": 0, "results": [], "message": "처리할 매물이 없습니다."})
+            continue
+
+        try:
+            calls = resolve_step_args(step.args, results)
+            fans_out = _fanout_source(step.args, results) is not None
+        except PlanError as e:
+            results.append({"success": False, "message": f"{number}단계 계획 오류: {e}"})
+            continue
+
+        if not fans_out:
+            results.append(await run_tool(step.tool, calls[0]))
+            continue
+
+        outcomes = [await run_tool(step.tool, call) for call in calls]
+        succeeded = [outcome for outcome in outcomes if outcome.get("success")]
+        if len(succeeded) == len(outcomes):
+            message = f"매물 {len(outcomes)}개에 {step.tool}을(를) 적용했습니다."
+        else:
+            message = f"매물 {len(outcomes)}개 중 {len(succeeded)}개만 처리했습니다."
+        results.append({
+            "success": len(succeeded) == len(outcomes),
+            "count": len(outcomes),
+            "results": outcomes,
+            "message": message
+        })
+    return results
+
+
+def plan_instruction(declarations: List[Dict[str, Any]]) -> str:
+    """Prompt section describing the tools and the plan JSON format"""
+    lines = ["[실행 계획 모드]", "함수를 직접 호출하지 말고, 아래 JSON 형식의 실행 계획 하나만 출력하세요.", ""]
+    lines.append("사용 가능한 도구:")
+    for declaration in declarations:
+        params = ", ".join(
+            f"{name}: {spec['type'].lower()}" for name, spec in declaration["parameters"]["properties"].items()
+        )
+        lines.append(f"- {declaration['name']}({params}): {declaration['description']}")
+    lines += [
+        "",
+        "형식:",
+        '{"steps": [{"tool": "도구 이름", "args": {...}}, ...], "response": "사용자에게 보여줄 응답"}',
+        "",
+        "규칙:",
+        '- 이전 단계 결과는 "$step번호.경로"로 참조합니다. 예: "$step1.listings[0].id"',
+        '- "$step1.listings[*].id"처럼 [*]를 쓰면 목록의 각 매물마다 그 단계를 실행합니다',
+        '- "=식"은 각 매물의 필드로 계산합니다. 예: "=price * 0.9", "=max(price - 50000, 1000)"',
+        f"- 단계는 최대 {PLAN_MAX_STEPS}개, 한 단계의 반복은 최대 {PLAN_MAX_FANOUT}개입니다",
+        "- 도구가 필요 없으면 steps를 빈 배열로 두고 response만 작성하세요",
+        "",
+        "예시 - \"어제 올린 것 전부 10% 인하\":",
+        '{"steps": [{"tool": "query_listings", "args": {"exact_day_ago": 1}}, '
+        '{"tool": "adjust_price", "args": {"listing_id": "$step1.listings[*].id", "new_price": "=price * 0.9"}}], '
+        '"response": "어제 올린 매물 가격을 10% 낮췄습니다."}',
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,154 @@
+"""
+Offline shard rebalancer
+Moves each seller's listings (archived ones and rules included) to the shard
+the hash ring assigns for the new shard count. Stop the server before running it.
+
+Usage:
+    python rebalance_shards.py --shards 8              # grow/shrink to 8 shards
+    python rebalance_shards.py --shards 8 --dry-run    # only print the plan
+    python rebalance_shards.py --shards 8 --dir /data/jol-shards
+
+Rows keep their IDs. Each seller is copied with INSERT OR REPLACE before it
+is deleted from the source, so an interrupted run can simply be repeated.
+"""
+import argparse
+import asyncio
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+import aiosqlite
+
+from config import SHARD_DIR
+from database import HashRing, ShardedDatabase, shard_path
+
+
+def existing_shard_count(directory: str) -> int:
+    """Number of shard files present (shard-00.db, shard-01.db, ...)"""
+    indexes = [
+        int(match.group(1))
+        for path in Path(directory).glob("shard-*.db")
+        if (match := re.fullmatch(r"shard-(\d+)\.db", path.name))
+    ]
+    return max(indexes) + 1 if indexes else 0
+
+
+async def plan_moves(directory: str, source_count: int, ring: HashRing) -> Dict[int, Dict[int, int]]:
+    """{source shard: {seller_id: target shard}} for sellers that live on the wrong shard"""
+    plan = {}
+    for index in range(source_count):
+        path = shard_path(directory, index)
+        if not Path(path).exists():
+            continue
+        async with aiosqlite.connect(path) as conn:
+            cursor = await conn.execute("SELECT seller_id FROM listings UNION SELECT seller_id FROM listings_archive")
+            sellers = [row[0] for row in await cursor.fetchall()]
+        moves = {seller: ring.shard_for(seller) for seller in sellers if ring.shard_for(seller) != index}
+        if moves:
+            plan[index] = moves
+    return plan
+
+
+async def _columns(conn, table: str) -> List[str]:
+    cursor = await conn.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in await cursor.fetchall()]
+
+
+async def move_seller(conn, seller_id: int, listing_cols: str, rule_cols: str, archive_cols: str) -> int:
+    """Copy one seller from main to the attached dst database, then delete it from main
+
+    listing_archive_stats stays: market totals are summed over every shard.
+    """
+    # Inserting foreign IDs bumps dst's AUTOINCREMENT counters; restore them afterwards
+    cursor = await conn.execute("SELECT name, seq FROM dst.sqlite_sequence")
+    sequences = await cursor.fetchall()
+
+    cursor = await conn.execute(f"""
+        INSERT OR REPLACE INTO dst.listings ({listing_cols})
+        SELECT {listing_cols} FROM main.listings WHERE seller_id = ?
+    """, (seller_id,))
+    moved = cursor.rowcount
+    await conn.execute(f"""
+        INSERT OR REPLACE INTO dst.listing_rules ({rule_cols})
+        SELECT {rule_cols} FROM main.listing_rules
+        WHERE listing_id IN (SELECT id FROM main.listings WHERE seller_id = ?)
+    """, (seller_id,))
+    await conn.execute("""
+        DELETE FROM main.listing_rules
+        WHERE listing_id IN (SELECT id FROM main.listings WHERE seller_id = ?)
+    """, (seller_id,))
+    await conn.execute("DELETE FROM main.listings WHERE seller_id = ?", (seller_id,))
+    cursor = await conn.execute(f"""
+        INSERT OR REPLACE INTO dst.listings_archive ({archive_cols})
+        SELECT {archive_cols} FROM main.listings_archive WHERE seller_id = ?
+    """, (seller_id,))
+    moved += cursor.rowcount
+    await conn.execute("DELETE FROM main.listings_archive WHERE seller_id = ?", (seller_id,))
+    await conn.executemany("UPDATE dst.sqlite_sequence SET seq = ? WHERE name = ?", [
+        (seq, name) for name, seq in sequences
+    ])
+    await conn.commit()
+    return moved
+
+
+async def rebalance(directory: str, shard_count: int, dry_run: bool = False) -> int:
+    source_count = existing_shard_count(directory)
+    print(f"🔀 Rebalancing {directory}: {source_count} → {shard_count} shards")
+
+    target = ShardedDatabase(directory, shard_count)
+    plan = await plan_moves(directory, source_count, target.ring)
+    sellers_to_move = sum(len(moves) for moves in plan.values())
+    print(f"   {sellers_to_move:,} seller(s) change shard")
+    if dry_run:
+        for source, moves in sorted(plan.items()):
+            per_target = Counter(moves.values())
+            print(f"   shard {source:02d} → " + ", ".join(f"{t:02d}: {n}" for t, n in sorted(per_target.items())))
+        return 0
+
+    # Create the new shards (schema, ID ranges) before copying into them
+    await target.init_db()
+
+    rows_moved = 0
+    for source, moves in sorted(plan.items()):
+        async with aiosqlite.connect(shard_path(directory, source)) as conn:
+            listing_cols = ", ".join(await _columns(conn, "listings"))
+            rule_cols = ", ".join(await _columns(conn, "listing_rules"))
+            archive_cols = ", ".join(await _columns(conn, "listings_archive"))
+            by_target: Dict[int, List[int]] = {}
+            for seller, dest in moves.items():
+                by_target.setdefault(dest, []).append(seller)
+            for dest, sellers in sorted(by_target.items()):
+                await conn.execute("ATTACH DATABASE ? AS dst", (shard_path(directory, dest),))
+                for seller in sellers:
+                    rows_moved += await move_seller(conn, seller, listing_cols, rule_cols, archive_cols)
+                await conn.execute("DETACH DATABASE dst")
+        print(f"   shard {source:02d}: moved {len(moves):,} seller(s)")
+
+    # Re-pin counters (also covers runs interrupted before a restore)
+    await target.pin_id_ranges()
+
+    print(f"✅ Moved {rows_moved:,} listing(s)")
+    for index, shard in enumerate(target.shards):
+        async with aiosqlite.connect(shard.db_path) as conn:
+            cursor = await conn.execute("SELECT COUNT(*), COUNT(DISTINCT seller_id) FROM listings")
+            count, sellers = await cursor.fetchone()
+        print(f"   shard {index:02d}: {count:,} listings, {sellers:,} sellers")
+    if source_count > shard_count:
+        print(f"   shard files {shard_count:02d}..{source_count - 1:02d} are now empty and can be removed")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move sellers to their shard for a new shard count")
+    parser.add_argument("--shards", type=int, required=True, help="New shard count")
+    parser.add_argument("--dir", default=SHARD_DIR, help="Shard directory")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without moving rows")
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    raise SystemExit(asyncio.run(rebalance(args.dir, args.shards, args.dry_run)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Resilience layer for LLM calls
+Deadline-aware retries with full-jitter backoff, optional hedged requests
+after the observed p95 latency, and a circuit breaker so a degraded
+upstream fails fast instead of holding every request for the full timeout.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from config import (
+    LLM_CALL_TIMEOUT_SECONDS,
+    LLM_MAX_ATTEMPTS,
+    LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MIN_DELAY_SECONDS,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET_SECONDS,
+)
+from logger import get_logger
+from metrics import LLM_RETRIES, LLM_HEDGES, LLM_BREAKER_STATE
+
+
+logger = get_logger("resilience")
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying (google.api_core exceptions expose them as .code)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailable(Exception):
+    """The LLM could not answer within the turn's deadline and retry budget"""
+
+
+class CircuitOpenError(LLMUnavailable):
+    """Calls are short-circuited because the upstream keeps failing"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors and 408/429/5xx responses are retried"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS
+
+
+# === Circuit breaker ===
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker
+
+    closed -> open after `failure_threshold` failures in a row; open -> half-open
+    after `reset_seconds`, letting a single probe through; the probe's outcome
+    closes or re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    _STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        LLM_BREAKER_STATE.set(0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("LLM circuit breaker state change", extra={"fields": {
+                "from": self.state, "to": state, "failures": self.failures
+            }})
+        self.state = state
+        LLM_BREAKER_STATE.set(self._STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self._set_state(self.HALF_OPEN)
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        self._set_state(self.CLOSED)
+
+    def release_probe(self):
+        """The call that was let through ended without an answer (e.g. cancelled): let the next one probe"""
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+
+# === Retry / hedging ===
+
+class LatencyWindow:
+    """Recent successful call latencies, for the hedging delay"""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self._samples) < 20:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+    """Runs an async call with retries, optional hedging and a circuit breaker"""
+
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+        call_timeout: float = LLM_CALL_TIMEOUT_SECONDS,
+        backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+        backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+        hedge: bool = LLM_HEDGE_ENABLED,
+        hedge_min_delay: float = LLM_HEDGE_MIN_DELAY_SECONDS
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.call_timeout = call_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.latencies = LatencyWindow()
+
+    def hedge_delay(self) -> float:
+        """Send the duplicate once the first request is slower than p95"""
+        p95 = self.latencies.percentile(0.95)
+        return max(self.hedge_min_delay, p95 or 0.0)
+
+    async def call(self, attempt: Callable[[], Awaitable[T]], deadline: float) -> T:
+        """
+        Call `attempt` until it succeeds, the attempts run out or the deadline passes
+
+        Args:
+            attempt: Factory for one independent upstream call (may be invoked concurrently when hedging)
+            deadline: Absolute event-loop time by which an answer is needed
+
+        Raises:
+            CircuitOpenError: The breaker is open
+            LLMUnavailable: Every attempt failed or the deadline passed
+            Exception: Non-retryable errors from `attempt` are raised as is
+        """
+        loop = asyncio.get_running_loop()
+        last_error: Optional[BaseException] = None
+
+        for number in range(self.max_attempts):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM circuit breaker is open")
+
+            try:
+                result = await self._attempt(attempt, min(self.call_timeout, remaining))
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered; the request itself is bad
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                last_error = e
+                reason = "timeout" if isinstance(e, (asyncio.TimeoutError, TimeoutError)) else "error"
+                logger.warning("LLM call failed", extra={"fields": {
+                    "attempt": number + 1, "reason": reason, "error": str(e) or type(e).__name__
+                }})
+                if number + 1 >= self.max_attempts:
+                    break
+                backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** number))
+                if loop.time() + backoff >= deadline:
+                    break
+                LLM_RETRIES.inc(reason=reason)
+                await asyncio.sleep(backoff)
+                continue
+            except BaseException:
+                # Cancelled mid-call: says nothing about the upstream, but a half-open probe must not stay taken
+                self.breaker.release_probe()
+                raise
+
+            self.breaker.record_success()
+            return result
+
+        raise LLMUnavailable(f"LLM unavailable: {last_error or 'deadline exceeded'}") from last_error
+
+    async def _attempt(self, attempt: Callable[[], Awaitable[T]], timeout: float) -> T:
+        """One logical attempt: the primary call plus, if it is slow, a hedged duplicate"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        primary = asyncio.ensure_future(attempt())
+        tasks = {primary}
+        error: Optional[BaseException] = None
+        try:
+            if self.hedge:
+                delay = self.hedge_delay()
+                if delay < timeout:
+                    done, _ = await asyncio.wait(tasks, timeout=delay)
+                    if not done:
+                        LLM_HEDGES.inc(outcome="sent")
+                        tasks.add(asyncio.ensure_future(attempt()))
+
+            while tasks:
+                remaining = timeout - (loop.time() - start)
+                done, _ = await asyncio.wait(tasks, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError(f"LLM call exceeded {timeout:.1f}s")
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            LLM_HEDGES.inc(outcome="won")
+                        self.latencies.add(loop.time() - start)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,232 @@
+"""
+Scheduled automation for listings
+Persistent rules (auto boost, periodic price drop) evaluated by a background
+asyncio task that sleeps until the next due rule (min-heap on next_run_at)
+"""
+import asyncio
+import heapq
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    BOOST_COOLDOWN_HOURS,
+    SCHEDULER_BATCH_SIZE,
+    SCHEDULER_POLL_SECONDS,
+    SCHEDULER_RESYNC_SECONDS,
+)
+from cache import versions, RULES
+from database import db
+from logger import get_logger
+from metrics import SCHEDULER_ACTIONS
+from tracing import tracer
+
+
+logger = get_logger("scheduler")
+
+RULE_TYPES = ("auto_boost", "price_drop")
+
+
+# === Time helpers (timestamps are stored like CURRENT_TIMESTAMP: UTC) ===
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def format_ts(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value).replace(tzinfo=None)
+
+
+# === Rule evaluation ===
+
+def first_run_at(
+    rule_type: str,
+    created_at: Optional[str],
+    boost_eligible_at: Optional[str],
+    after_days: Optional[int],
+    now: datetime
+) -> datetime:
+    """When a newly registered rule should first run"""
+    if rule_type == "auto_boost":
+        eligible_at = parse_ts(boost_eligible_at)
+        if eligible_at is None:
+            return now
+        return max(now, eligible_at)
+
+    # price_drop: N days after the listing was created (i.e. N days unsold)
+    created = parse_ts(created_at) or now
+    return max(now, created + timedelta(days=after_days or 1))
+
+
+def evaluate_rule(rule: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """
+    Decide what a due rule does
+
+    Returns:
+        {"boost": bool, "new_price": Optional[int], "next_run_at": datetime, "active": bool}
+    """
+    decision = {"boost": False, "new_price": None, "next_run_at": now, "active": True}
+
+    if rule["listing_status"] != "active":
+        # Listing sold, deleted or missing: retire the rule
+        decision["active"] = False
+        return decision
+
+    if rule["rule_type"] == "auto_boost":
+        eligible_at = parse_ts(rule["listing_boost_eligible_at"])
+        if eligible_at is not None and eligible_at > now:
+            # Boosted manually in the meantime
+            decision["next_run_at"] = eligible_at
+        else:
+            decision["boost"] = True
+            decision["next_run_at"] = now + timedelta(hours=BOOST_COOLDOWN_HOURS)
+        return decision
+
+    if rule["rule_type"] == "price_drop":
+        price = rule["listing_price"]
+        new_price = int(price * (100 - rule["drop_percent"]) / 100)
+        floor = rule["min_price"] or 1
+        if new_price < floor:
+            new_price = floor
+        if new_price >= price:
+            # Already at the floor
+            decision["active"] = False
+            return decision
+        decision["new_price"] = new_price
+        decision["next_run_at"] = now + timedelta(days=rule["after_days"] or 1)
+        decision["active"] = new_price > floor
+        return decision
+
+    decision["active"] = False
+    return decision
+
+
+# === Scheduler ===
+
+class RuleScheduler:
+    """Background task that applies due rules in batched transactions"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_sync = 0.0
+        self._rules_version = 0
+
+    async def start(self):
+        """Load the rule schedule and start the background loop"""
+        if self._task is not None:
+            return
+        await self._sync()
+        self._task = asyncio.create_task(self._run(), name="rule-scheduler")
+        logger.info("Rule scheduler started", extra={"fields": {"rules": len(self._heap)}})
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self, rule_id: int, next_run_at: datetime):
+        """Add a newly registered rule to the heap and wake the loop
+
+        No-op unless the loop runs in this process (worker 0): the rules
+        version bump makes that worker's _sync pick the rule up.
+        """
+        if self._task is None or self._task.done():
+            return
+        heapq.heappush(self._heap, (next_run_at.timestamp(), rule_id))
+        self._wakeup.set()
+
+    async def _sync(self):
+        """Rebuild the heap from the database (also picks up rules created elsewhere)"""
+        self._rules_version = versions.get(RULES)
+        schedule = await db.get_rule_schedule()
+        self._heap = [(parse_ts(next_run).timestamp(), rule_id) for rule_id, next_run in schedule]
+        heapq.heapify(self._heap)
+        self._last_sync = asyncio.get_running_loop().time()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Rules registered by other worker processes only show up in the channel
+                if (loop.time() - self._last_sync >= SCHEDULER_RESYNC_SECONDS
+                        or versions.get(RULES) != self._rules_version):
+                    await self._sync()
+
+                now_ts = utcnow().timestamp()
+                delay = SCHEDULER_POLL_SECONDS
+                if self._heap:
+                    delay = min(delay, max(self._heap[0][0] - now_ts, 0))
+
+                if delay > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                await self.run_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Rule scheduler iteration failed")
+                await asyncio.sleep(1)
+
+    async def run_due(self) -> int:
+        """Pop due rules (up to SCHEDULER_BATCH_SIZE) and apply them; returns rules processed"""
+        now = utcnow()
+        now_ts = now.timestamp()
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now_ts and len(due_ids) < SCHEDULER_BATCH_SIZE:
+            due_ids.append(heapq.heappop(self._heap)[1])
+        if not due_ids:
+            return 0
+
+        with tracer.start_span("scheduler.run_due", rules=len(due_ids)):
+            # Heap entries can be stale (rescheduled/retired); the DB decides what is really due
+            rules = await db.get_due_rules(format_ts(now), due_ids)
+
+            boosts, price_updates, rule_updates = [], [], []
+            for rule in rules:
+                decision = evaluate_rule(rule, now)
+                ran = 0
+                if decision["boost"]:
+                    boosts.append((rule["listing_id"], rule["id"]))
+                    ran = 1
+                if decision["new_price"] is not None:
+                    price_updates.append((decision["new_price"], rule["listing_id"]))
+                    ran = 1
+                rule_updates.append((
+                    format_ts(decision["next_run_at"]), 1 if decision["active"] else 0, ran, rule["id"]
+                ))
+                if decision["active"]:
+                    heapq.heappush(self._heap, (decision["next_run_at"].timestamp(), rule["id"]))
+
+            boosted = []
+            if rule_updates:
+                # Listings sold or boosted since get_due_rules are skipped (not in boosted)
+                boosted = await db.apply_rule_actions(boosts, price_updates, rule_updates)
+
+        SCHEDULER_ACTIONS.inc(len(boosted), action="boost")
+        SCHEDULER_ACTIONS.inc(len(price_updates), action="price_drop")
+        if boosted or price_updates:
+            logger.info("Applied scheduled actions", extra={"fields": {
+                "boosts": len(boosted), "price_drops": len(price_updates)
+            }})
+        return len(rules)
+
+
+# Global scheduler instance
+scheduler = RuleScheduler()
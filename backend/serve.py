@@ -0,0 +1,105 @@
+"""
+Prefork launcher: several uvicorn workers sharing one listening socket
+
+The app is imported once in the parent (preload), then each worker is a
+forked child serving the inherited socket. Worker 0 also runs the rule
+scheduler; cache invalidation between workers goes through cache.versions.
+
+Usage:
+    python serve.py                  # JOL_WORKERS workers (default: CPU count)
+    python serve.py --workers 4 --port 8000
+
+Note: /metrics and the in-memory trace store are per worker; use
+JOL_TRACE_EXPORTERS=file to collect traces from every worker.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from config import HOST, PORT, WORKERS
+import main
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(worker_id: int, sock: socket.socket) -> None:
+    """Child process body: serve the shared socket until told to stop"""
+    os.environ["JOL_WORKER_ID"] = str(worker_id)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(main.app, log_config=None, access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(worker_id: int, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(worker_id, sock)
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def supervise(workers: int, sock: socket.socket) -> int:
+    """Start the workers, restart any that die, stop them all on SIGTERM/SIGINT"""
+    children = {spawn(worker_id, sock): worker_id for worker_id in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker_id = children.pop(pid, None)
+        if worker_id is None or stopping:
+            continue
+        print(f"⚠️  worker {worker_id} (pid {pid}) exited with {status}; restarting", file=sys.stderr)
+        time.sleep(1)
+        children[spawn(worker_id, sock)] = worker_id
+    return 0
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Worker processes (default: JOL_WORKERS or CPU count)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    sock = bind_socket(args.host, args.port)
+    print(f"🚀 Serving http://{args.host}:{args.port} with {args.workers} worker(s)")
+    raise SystemExit(supervise(args.workers, sock))
+
+
+if __name__ == "__main__":
+    cli()
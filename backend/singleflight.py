@@ -0,0 +1,61 @@
+"""
+Request coalescing ("singleflight")
+Concurrent callers asking for the same thing share one in-flight call: the
+first one (leader) runs it, the others (followers) await its result. Keys
+must include everything the result depends on, e.g. the cache version it is
+read under, so a follower never gets an answer older than it would have
+fetched itself.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from metrics import SINGLEFLIGHT_CALLS
+
+
+class SingleFlight:
+    """In-flight calls of one kind (name labels the metrics)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn, or wait for the identical call already running
+
+        Returns:
+            (result, shared): shared is True for followers, which receive the
+            leader's object and must copy it before modifying it
+
+        Raises:
+            Whatever fn raised (followers receive the leader's exception)
+        """
+        future = self._flights.get(key)
+        if future is not None:
+            SINGLEFLIGHT_CALLS.inc(name=self.name, role="follower")
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # The leader was cancelled, not us: run it ourselves
+            return await self.do(key, fn)
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting: mark the exception as retrieved
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._flights[key] = future
+        SINGLEFLIGHT_CALLS.inc(name=self.name, role="leader")
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._flights[key]
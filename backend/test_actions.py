@@ -0,0 +1,56 @@
+"""
+Test signed action tokens: forged, tampered and foreign tokens are rejected with 403
+"""
+import pytest
+
+from actions import ActionTokenError, sign_action, verify_action
+
+SECRET = "test-secret"
+
+
+def _reason(token: str, seller_id: int = 1):
+    with pytest.raises(ActionTokenError) as error:
+        verify_action(token, seller_id, secret=SECRET)
+    return error.value.status_code, error.value.reason
+
+
+def test_round_trip():
+    """A token verifies to the tool and arguments it was signed for"""
+    token = sign_action(1, "adjust_price", {"listing_id": 3, "new_price": 9000}, secret=SECRET)
+    assert verify_action(token, 1, secret=SECRET) == ("adjust_price", {"listing_id": 3, "new_price": 9000})
+
+
+def test_non_ascii_token_is_forbidden():
+    """Non-ASCII characters in the payload or signature are a 403, not a 500"""
+    token = sign_action(1, "boost_listing", {"listing_id": 3}, secret=SECRET)
+    payload, _, signature = token.partition(".")
+    assert _reason(f"{payload}매물.{signature}") == (403, "invalid_token")
+    assert _reason(f"{payload}.{signature}é") == (403, "invalid_token")
+    assert _reason("끌어올리기") == (403, "invalid_token")
+
+
+def test_tampered_and_foreign_tokens():
+    token = sign_action(1, "boost_listing", {"listing_id": 3}, secret=SECRET)
+    payload, _, signature = token.partition(".")
+    other = sign_action(1, "boost_listing", {"listing_id": 4}, secret=SECRET).partition(".")[0]
+    assert _reason(f"{other}.{signature}") == (403, "invalid_token")
+    assert _reason(token, seller_id=2) == (403, "wrong_seller")
+    with pytest.raises(ActionTokenError) as error:
+        verify_action(token, 1, secret="another-secret")
+    assert error.value.status_code == 403
+
+
+def test_expired_token():
+    token = sign_action(1, "boost_listing", {"listing_id": 3}, ttl=-1, secret=SECRET)
+    assert _reason(token) == (410, "expired")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Action Tokens")
+    print("=" * 60)
+    test_round_trip()
+    test_non_ascii_token_is_forbidden()
+    test_tampered_and_foreign_tokens()
+    test_expired_token()
+    print("✅ Action tokens verified")
@@ -0,0 +1,105 @@
+"""
+Test admission control: concurrency slots, bounded queue and per-seller rate limits
+"""
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+async def _hold(controller: AdmissionController, key, release: asyncio.Event, admitted: list):
+    async with controller.admit(key):
+        admitted.append(key)
+        await release.wait()
+
+
+async def _rejection(controller: AdmissionController, key):
+    with pytest.raises(AdmissionRejected) as error:
+        async with controller.admit(key):
+            pass
+    return error.value
+
+
+def test_queue_full_does_not_spend_rate_tokens():
+    """A seller shed with 503 during overload keeps their rate-limit budget"""
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5, rate_per_minute=60, burst=2)
+        release, admitted = asyncio.Event(), []
+        holder = asyncio.create_task(_hold(controller, "busy", release, admitted))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(_hold(controller, "queued", release, admitted))
+        await asyncio.sleep(0)
+        assert controller.waiting == 1
+
+        for _ in range(5):
+            error = await _rejection(controller, "retrying")
+            assert (error.status_code, error.reason) == (503, "queue_full")
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        # Both burst tokens are still there; the third request is rate limited
+        async with controller.admit("retrying"):
+            pass
+        async with controller.admit("retrying"):
+            pass
+        error = await _rejection(controller, "retrying")
+        assert (error.status_code, error.reason) == (429, "rate_limited")
+        assert error.retry_after > 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_refunds_and_releases():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=2, queue_timeout=0.05, rate_per_minute=60, burst=1)
+        release, admitted = asyncio.Event(), []
+        holder = asyncio.create_task(_hold(controller, "busy", release, admitted))
+        await asyncio.sleep(0)
+        error = await _rejection(controller, "late")
+        assert (error.status_code, error.reason) == (503, "queue_timeout")
+        assert controller.waiting == 0
+        release.set()
+        await holder
+        async with controller.admit("late"):
+            assert controller.inflight == 1
+        assert controller.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limit_and_fifo_admission():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=2, max_queue=10, queue_timeout=5, rate_per_minute=0)
+        release, admitted = asyncio.Event(), []
+        tasks = [asyncio.create_task(_hold(controller, key, release, admitted)) for key in range(5)]
+        await asyncio.sleep(0.01)
+        assert admitted == [0, 1] and controller.waiting == 3
+        release.set()
+        await asyncio.gather(*tasks)
+        assert sorted(admitted) == [0, 1, 2, 3, 4]
+        assert controller.inflight == 0 and controller.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_per_key_and_key_cap():
+    controller = AdmissionController(rate_per_minute=60, burst=1, max_keys=2)
+    controller.check_rate("a")
+    with pytest.raises(AdmissionRejected):
+        controller.check_rate("a")
+    controller.check_rate("b")
+    controller.check_rate("c")
+    # "a" was the least recently used key and got evicted: a fresh bucket
+    controller.check_rate("a")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Admission Control")
+    print("=" * 60)
+    test_queue_full_does_not_spend_rate_tokens()
+    test_queue_timeout_refunds_and_releases()
+    test_concurrency_limit_and_fifo_admission()
+    test_rate_limit_per_key_and_key_cap()
+    print("✅ Admission control verified")
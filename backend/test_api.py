@@ -55,6 +55,26 @@ def test_chat():
         print()
 
 
+def test_suggested_action():
+    """Test running a suggested action from a chat answer"""
+    print("Testing POST /actions/execute...")
+    data = requests.post(f"{BASE_URL}/chat", json={"message": "내 매물 보여줘"}).json()
+    if not data["suggested_actions"]:
+        print("No suggestions (no listings?)\n")
+        return
+    action = data["suggested_actions"][0]
+    print(f"Suggestion: {action['label']}")
+
+    response = requests.post(f"{BASE_URL}/actions/execute", json={"token": action["token"]})
+    print(f"Status: {response.status_code}")
+    print(f"Result: {response.json()['result'].get('message')}")
+
+    # Tampered tokens are refused
+    forged = requests.post(f"{BASE_URL}/actions/execute", json={"token": action["token"][:-2] + "xx"})
+    assert forged.status_code == 403, forged.status_code
+    print("Forged token rejected\n")
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🧪 Testing API Endpoints")
@@ -65,6 +85,7 @@ if __name__ == "__main__":
         test_health()
         test_get_listings()
         test_chat()  # Testing function calling
+        test_suggested_action()
 
         print("✅ All API tests passed!")
 
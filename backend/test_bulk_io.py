@@ -0,0 +1,104 @@
+"""
+Test bulk import/export encoding: exported CSV and NDJSON parse back to the same rows
+"""
+import asyncio
+import time
+from typing import Any, List, Sequence
+
+from bulk_io import EXPORT_COLUMNS, encode_csv, encode_ndjson, iter_csv_records, iter_ndjson_records
+
+ROWS = [
+    (1, "맥북 프로", "상태 좋아요.\n박스 있음\r\n직거래만", 1500000, "전자기기", "강남구", "", "active",
+     "2026-10-01 10:00:00", "2026-10-01 10:00:00", "", 0, "2026-10-01 10:00:00"),
+    (2, '의자 "허먼밀러"', "쉼표, 따옴표 \"\" 모두", 300000, "가구", "서초구", "", "sold",
+     "2026-09-01 10:00:00", "2026-09-02 10:00:00", "", 2, "2026-09-03 10:00:00"),
+    (3, "빈 줄 포함", "첫 줄\n\n셋째 줄\n", 1000, "기타", "송파구", "", "active",
+     "2026-10-02 10:00:00", "2026-10-02 10:00:00", "", 0, "2026-10-02 10:00:00"),
+]
+
+
+async def _rows(rows: Sequence[Any]):
+    for row in rows:
+        yield row
+
+
+async def _chunks(text: str, size: int):
+    """The body as the request stream delivers it: bytes in arbitrary pieces"""
+    data = text.encode("utf-8")
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _collect(aiter) -> List:
+    return [item async for item in aiter]
+
+
+def _parse_csv(text: str, size: int = 7):
+    return asyncio.run(_collect(iter_csv_records(_chunks(text, size))))
+
+
+def test_csv_round_trip_with_multiline_fields():
+    """Quoted newlines, commas and quotes survive export and re-import (one record per row)"""
+    text = "".join(asyncio.run(_collect(encode_csv(_rows(ROWS), rows_per_chunk=2))))
+    for size in (1, 7, 4096):
+        parsed = _parse_csv(text, size)
+        assert [error for _, _, error in parsed] == [None] * len(ROWS)
+        for (_, record, _), row in zip(parsed, ROWS):
+            # The reader drops \r before \n (line endings are normalized)
+            expected = [str(value).replace("\r\n", "\n") for value in row]
+            assert [record[column] for column in EXPORT_COLUMNS] == expected
+
+
+def test_csv_errors_keep_following_rows():
+    """A bad row is reported at its first line; parsing goes on with the next record"""
+    text = 'title,price\n"a"x,1\nok,2\n"multi\nline",3\nshort\n"never closed,4\nmore\n'
+    parsed = _parse_csv(text)
+    assert [(line, record) for line, record, error in parsed if error is None] == [
+        (3, {"title": "ok", "price": "2"}),
+        (4, {"title": "multi\nline", "price": "3"}),
+    ]
+    errors = [(line, error.split(":")[0]) for line, _, error in parsed if error]
+    assert errors == [(2, "CSV 파싱 오류"), (6, "컬럼 수가 헤더와 다릅니다 (1 != 2)"), (7, "CSV 파싱 오류")]
+
+
+def test_csv_long_quoted_field_is_parsed_once():
+    """A quoted field over many lines (closed or not) costs linear time, not a re-parse per line"""
+    # Closed: stays under the csv module's field size limit
+    body = "".join(f"줄 {number}, \"인용\"\n" for number in range(8_000))
+    closed = 'title,content\n"긴 설명","' + body.replace('"', '""') + '"\nok,2\n'
+    start = time.perf_counter()
+    parsed = _parse_csv(closed, 65536)
+    assert [(line, record["title"]) for line, record, _ in parsed] == [(2, "긴 설명"), (8_003, "ok")]
+    assert parsed[0][1]["content"] == body
+
+    unclosed = 'title,content\n"x,' + "".join(f"줄 {number}\n" for number in range(40_000))
+    parsed = _parse_csv(unclosed, 65536)
+    assert [(line, record) for line, record, _ in parsed] == [(2, None)]
+    assert time.perf_counter() - start < 5
+
+
+def test_ndjson_round_trip():
+    rows = [dict(zip(EXPORT_COLUMNS, row)) for row in ROWS]
+    text = "".join(asyncio.run(_collect(encode_ndjson(_rows(rows), rows_per_chunk=2))))
+    parsed = asyncio.run(_collect(iter_ndjson_records(_chunks(text, 5))))
+    assert [record for _, record, _ in parsed] == rows
+
+
+def test_ndjson_errors():
+    text = '{"title": "ok"}\n\nnot json\n[1, 2]\n'
+    parsed = asyncio.run(_collect(iter_ndjson_records(_chunks(text, 3))))
+    assert [(line, record is not None, error is None) for line, record, error in parsed] == [
+        (1, True, True), (3, False, False), (4, False, False),
+    ]
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Bulk Import/Export")
+    print("=" * 60)
+    test_csv_round_trip_with_multiline_fields()
+    test_csv_errors_keep_following_rows()
+    test_csv_long_quoted_field_is_parsed_once()
+    test_ndjson_round_trip()
+    test_ndjson_errors()
+    print("✅ Bulk encoding round-trips")
@@ -0,0 +1,45 @@
+"""
+Test metrics instrumentation: DB row counts for every result shape
+"""
+import asyncio
+
+from listing_record import ListingRecord
+from metrics import DB_ROWS_RETURNED, instrument_db
+
+RECORD = ListingRecord(
+    1, "폰", "c", 1000, "전자기기", "강남구", None, "active",
+    "2026-10-01 10:00:00", "2026-10-01 10:00:00", None, 0, "2026-10-01 10:00:00", 1
+)
+
+
+def _rows_observed(result) -> tuple:
+    """(observations, rows) recorded for one call returning result"""
+    async def fetch():
+        return result
+
+    # The method label is the function name (one series per call here)
+    fetch.__name__ = name = f"fetch_{id(result)}"
+    fetch = instrument_db(fetch)
+    before = DB_ROWS_RETURNED.snapshot(method=name)
+    asyncio.run(fetch())
+    after = DB_ROWS_RETURNED.snapshot(method=name)
+    return after["count"] - before["count"], after["sum"] - before["sum"]
+
+
+def test_db_rows_counted_for_records_and_sequences():
+    assert _rows_observed(RECORD) == (1, 1)
+    assert _rows_observed([RECORD, RECORD]) == (1, 2)
+    assert _rows_observed((RECORD, RECORD, RECORD)) == (1, 3)
+    assert _rows_observed({"active_count": 3}) == (1, 1)
+    assert _rows_observed(None) == (1, 0)
+    # Scalars (new IDs, rowcounts, flags) are not rows
+    assert _rows_observed(42) == (0, 0)
+    assert _rows_observed("text") == (0, 0)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Metrics")
+    print("=" * 60)
+    test_db_rows_counted_for_records_and_sequences()
+    print("✅ DB row counts verified")
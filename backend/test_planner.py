@@ -0,0 +1,119 @@
+"""
+Test plan mode: step references, expressions and how bad plans fail
+"""
+import asyncio
+
+import pytest
+
+from planner import ExecutionPlan, PlanError, evaluate, execute_plan, resolve_step_args, validate_plan
+
+QUERY_RESULT = {
+    "success": True,
+    "listings": [{"id": 1, "price": 10000}, {"id": 2, "price": 25000}],
+}
+
+
+def test_references_and_fanout():
+    """[*] runs the step once per element; expressions see the element's fields"""
+    calls = resolve_step_args(
+        {"listing_id": "$step1.listings[*].id", "new_price": "=price * 0.9"}, [QUERY_RESULT]
+    )
+    assert calls == [{"listing_id": 1, "new_price": 9000}, {"listing_id": 2, "new_price": 22500}]
+    calls = resolve_step_args({"new_price": "=$step1.listings[1].price - 5000", "note": "x"}, [QUERY_RESULT])
+    assert calls == [{"new_price": 20000, "note": "x"}]
+
+
+@pytest.mark.parametrize("expression", [
+    "=price * 1e308 * 10",               # inf
+    "=price * 1e308 * 10 - price * 1e308 * 10",  # nan
+    "=int(price * 1e308 * 10)",
+    "=round(price * 1e308 * 10)",
+    "=int('abc')",
+    "=price / 0",
+    "=price * 'a'",
+    "=unknown + 1",
+    "=__import__('os')",
+    "=price.real",
+])
+def test_bad_expressions_raise_plan_error(expression):
+    """Overflow, nan and unsupported constructs are PlanErrors, never other exceptions"""
+    with pytest.raises(PlanError):
+        resolve_step_args({"new_price": expression, "listing_id": "$step1.listings[*].id"}, [QUERY_RESULT])
+
+
+def test_bad_references():
+    with pytest.raises(PlanError):
+        resolve_step_args({"listing_id": "$step1.listings[5].id"}, [QUERY_RESULT])
+    with pytest.raises(PlanError):
+        resolve_step_args({"listing_id": "$step1.missing"}, [QUERY_RESULT])
+    with pytest.raises(PlanError):
+        resolve_step_args({"a": "$step1.listings[*].id", "b": "$step1.other[*].id"}, [dict(QUERY_RESULT, other=[{"id": 3}])])
+    with pytest.raises(PlanError):
+        resolve_step_args({"listing_id": "$step1.success[*]"}, [QUERY_RESULT])
+
+
+def test_validate_plan():
+    tools = {"query_listings": None, "adjust_price": None}
+    validate_plan(ExecutionPlan.model_validate({"steps": [
+        {"tool": "query_listings", "args": {}},
+        {"tool": "adjust_price", "args": {"listing_id": "$step1.listings[*].id"}},
+    ]}), tools)
+    for steps in (
+        [{"tool": "delete_everything", "args": {}}],
+        [{"tool": "adjust_price", "args": {"listing_id": "$step1.listings[0].id"}}],
+        [{"tool": "query_listings", "args": {}}, {"tool": "adjust_price", "args": {"new_price": "=$step3.price"}}],
+        [{"tool": "query_listings", "args": {}}] * 6,
+    ):
+        with pytest.raises(PlanError):
+            validate_plan(ExecutionPlan.model_validate({"steps": steps}), tools)
+
+
+def test_execute_plan_failure_paths():
+    """A step with an unusable expression fails alone; steps depending on it are skipped"""
+    calls = []
+
+    async def run_tool(name, args):
+        calls.append((name, args))
+        if name == "query_listings":
+            return QUERY_RESULT
+        return {"success": True, "listing_id": args.get("listing_id")}
+
+    plan = ExecutionPlan.model_validate({"steps": [
+        {"tool": "query_listings", "args": {}},
+        {"tool": "adjust_price", "args": {"listing_id": "$step1.listings[*].id", "new_price": "=price * 1e308 * 10"}},
+        {"tool": "adjust_price", "args": {"listing_id": "$step2.results[0].listing_id", "new_price": 1}},
+        {"tool": "adjust_price", "args": {"listing_id": "$step1.listings[0].id", "new_price": 1}},
+    ]})
+    results = asyncio.run(execute_plan(plan, run_tool))
+    assert [result["success"] for result in results] == [True, False, False, True]
+    assert "계획 오류" in results[1]["message"]
+    assert results[2].get("skipped")
+    assert calls == [("query_listings", {}), ("adjust_price", {"listing_id": 1, "new_price": 1})]
+
+
+def test_empty_list_skips_dependent_step():
+    async def run_tool(name, args):
+        return {"success": True, "listings": []}
+
+    plan = ExecutionPlan.model_validate({"steps": [
+        {"tool": "query_listings", "args": {}},
+        {"tool": "adjust_price", "args": {"listing_id": "$step1.listings[*].id", "new_price": "=price - 1"}},
+    ]})
+    results = asyncio.run(execute_plan(plan, run_tool))
+    assert results[1] == {"success": True, "skipped": True, "count": 0, "results": [], "message": "처리할 매물이 없습니다."}
+
+
+def test_evaluate_limits():
+    assert evaluate("max(a, 3) + min(b, 1)", {"a": 2, "b": 5}) == 4
+    assert evaluate("'매물 ' + name", {"name": "A"}) == "매물 A"
+    with pytest.raises(PlanError):
+        evaluate("'x' * 1000000000", {})
+    with pytest.raises(PlanError):
+        evaluate("2 ** 10", {})
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Plan Mode")
+    print("=" * 60)
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,113 @@
+"""
+Test the Database read cache: cached_read results are evicted by exactly the
+writes (invalidates) that can change them
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from unit_of_work import unit_of_work
+
+
+def _set_price_behind_cache(database, listing_id: int, price: int):
+    """Change a row without going through Database (no invalidation): shows whether a read was cached"""
+    conn = sqlite3.connect(database.db_path)
+    conn.execute("UPDATE listings SET price = ? WHERE id = ?", (price, listing_id))
+    conn.commit()
+    conn.close()
+
+
+async def _prices(database, **filters):
+    return {listing.id: listing.price for listing in await database.query_listings(**filters)}
+
+
+def test_reads_are_cached_until_a_write_invalidates_them(database):
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        assert await _prices(database, seller_id=1) == {phone: 1000}
+        _set_price_behind_cache(database, phone, 5)
+        assert await _prices(database, seller_id=1) == {phone: 1000}, "second read should be a cache hit"
+
+        await database.update_price(phone, 900, seller_id=1)
+        assert await _prices(database, seller_id=1) == {phone: 900}
+
+        # Reads across every seller are never cached
+        _set_price_behind_cache(database, phone, 800)
+        assert await _prices(database) == {phone: 800}
+
+    asyncio.run(scenario())
+
+
+def test_tag_invalidation_is_scoped(database):
+    """A write evicts its seller's reads of that category/region, not other tags or sellers"""
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        chair = await database.create_listing("의자", "c", 2000, "가구", "서초구", seller_id=1)
+        other = await database.create_listing("책", "c", 3000, "도서", "강남구", seller_id=2)
+
+        assert await _prices(database, seller_id=1, category="가구") == {chair: 2000}
+        assert await _prices(database, seller_id=2) == {other: 3000}
+        _set_price_behind_cache(database, chair, 5)
+        _set_price_behind_cache(database, other, 5)
+
+        # Electronics write: the furniture read and seller 2 stay cached
+        await database.update_price(phone, 900, seller_id=1)
+        assert await _prices(database, seller_id=1, category="가구") == {chair: 2000}
+        assert await _prices(database, seller_id=2) == {other: 3000}
+
+        # Furniture write: evicted
+        await database.update_content(chair, title="새 의자", seller_id=1)
+        assert await _prices(database, seller_id=1, category="가구") == {chair: 5}
+
+    asyncio.run(scenario())
+
+
+def test_market_stats_follow_writes_in_their_category(database):
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        await database.create_listing("의자", "c", 2000, "가구", "강남구", seller_id=2)
+        stats = await database.get_market_stats("전자기기", "강남구")
+        assert (stats["active_count"], stats["price_sum"]) == (1, 1000)
+
+        await database.update_price(phone, 700, seller_id=1)
+        assert (await database.get_market_stats("전자기기", "강남구"))["price_sum"] == 700
+        await database.update_status(phone, "sold", seller_id=1)
+        stats = await database.get_market_stats("전자기기", "강남구")
+        assert (stats["active_count"], stats["sold_count"]) == (0, 1)
+
+    asyncio.run(scenario())
+
+
+def test_failed_write_and_callers_cannot_poison_the_cache(database):
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        listings = await database.query_listings(seller_id=1)
+        listings.clear()
+        assert len(await database.query_listings(seller_id=1)) == 1
+
+        # Inside a unit of work, reads see its queued writes instead of the cached rows
+        async with unit_of_work():
+            await database.update_price(phone, 600, seller_id=1)
+            assert await _prices(database, seller_id=1) == {phone: 600}
+        assert await _prices(database, seller_id=1) == {phone: 600}
+
+        # A turn that fails drops its queued write; nothing cached claims it happened
+        try:
+            async with unit_of_work():
+                await database.update_price(phone, 1, seller_id=1)
+                raise RuntimeError("turn failed")
+        except RuntimeError:
+            pass
+        assert await _prices(database, seller_id=1) == {phone: 600}
+        _set_price_behind_cache(database, phone, 5)
+        assert await _prices(database, seller_id=1) == {phone: 600}, "re-read after the failed turn is cached again"
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Query Cache")
+    print("=" * 60)
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,182 @@
+"""
+Test the LLM resilience layer against the fake upstream: retries, deadlines,
+hedged requests and the circuit breaker
+"""
+import asyncio
+import time
+
+import pytest
+
+from fake_llm import FakeGenerativeModel, FakeUpstreamError
+from resilience import CircuitBreaker, CircuitOpenError, LLMUnavailable, ResilientCaller
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+class ScriptedUpstream:
+    """Upstream whose calls follow a script: "ok", "fail" (503), "bad" (400) or ("slow", seconds)"""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def attempt(self):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        number = self.calls
+        if isinstance(step, tuple):
+            try:
+                await asyncio.sleep(step[1])
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            return f"slow-{number}"
+        if step == "fail":
+            raise FakeUpstreamError("503")
+        if step == "bad":
+            raise BadRequest("400")
+        return f"ok-{number}"
+
+
+def _caller(breaker: CircuitBreaker = None, **kwargs) -> ResilientCaller:
+    options = dict(max_attempts=3, call_timeout=1.0, backoff_base=0.001, backoff_max=0.001, hedge=False)
+    options.update(kwargs)
+    return ResilientCaller(breaker=breaker or CircuitBreaker(5, 60), **options)
+
+
+async def _call(caller: ResilientCaller, upstream, seconds: float = 5.0):
+    return await caller.call(upstream.attempt, asyncio.get_running_loop().time() + seconds)
+
+
+def test_retries_transient_errors():
+    async def scenario():
+        upstream = ScriptedUpstream("fail", "fail", "ok")
+        assert await _call(_caller(), upstream) == "ok-3"
+        upstream = ScriptedUpstream("fail")
+        with pytest.raises(LLMUnavailable):
+            await _call(_caller(), upstream)
+        assert upstream.calls == 3
+
+    asyncio.run(scenario())
+
+
+def test_bad_request_is_not_retried_or_counted():
+    async def scenario():
+        breaker = CircuitBreaker(1, 60)
+        upstream = ScriptedUpstream("bad")
+        with pytest.raises(BadRequest):
+            await _call(_caller(breaker=breaker), upstream)
+        assert upstream.calls == 1 and breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_timeouts_respect_the_turn_deadline():
+    async def scenario():
+        upstream = ScriptedUpstream(("slow", 10))
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with pytest.raises(LLMUnavailable):
+            await _call(_caller(call_timeout=0.05, max_attempts=10), upstream, seconds=0.2)
+        assert loop.time() - start < 0.5
+        # Every timed-out attempt was cancelled (the last one on the next loop turn)
+        await asyncio.sleep(0)
+        assert upstream.cancelled == upstream.calls
+
+    asyncio.run(scenario())
+
+
+def test_hedged_request_wins_over_slow_primary():
+    async def scenario():
+        upstream = ScriptedUpstream(("slow", 10), "ok")
+        caller = _caller(hedge=True, hedge_min_delay=0.02)
+        assert await _call(caller, upstream) == "ok-2"
+        # The losing primary is cancelled, not left running
+        await asyncio.sleep(0)
+        assert upstream.cancelled == 1
+
+        upstream = ScriptedUpstream("ok")
+        assert await _call(caller, upstream) == "ok-1" and upstream.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_circuit_breaker_against_fake_upstream():
+    """Consecutive 503s open the breaker; after the reset time one probe decides"""
+    model = FakeGenerativeModel()
+    model.error_rate = 1.0
+    model.latency_ms = 0
+
+    async def attempt():
+        return await asyncio.to_thread(model.start_chat().send_message, "안녕")
+
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.05)
+        caller = _caller(breaker=breaker, max_attempts=1)
+        deadline = asyncio.get_running_loop().time() + 5
+        for _ in range(3):
+            with pytest.raises(LLMUnavailable) as error:
+                await caller.call(attempt, deadline)
+            assert not isinstance(error.value, CircuitOpenError)
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            await caller.call(attempt, deadline)
+
+        # Half-open: a single probe; failing re-opens at once
+        await asyncio.sleep(0.06)
+        with pytest.raises(LLMUnavailable):
+            await caller.call(attempt, deadline)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # The upstream recovers: the next probe closes the breaker
+        model.error_rate = 0.0
+        await asyncio.sleep(0.06)
+        response = await caller.call(attempt, deadline)
+        assert response.text
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_probe_does_not_wedge_the_breaker():
+    """A half-open probe cancelled by its caller frees the slot for the next call"""
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.01)
+        caller = _caller(breaker=breaker, max_attempts=1)
+        with pytest.raises(LLMUnavailable):
+            await _call(caller, ScriptedUpstream("fail"))
+        await asyncio.sleep(0.02)
+
+        probe = asyncio.create_task(_call(caller, ScriptedUpstream(("slow", 10))))
+        await asyncio.sleep(0.01)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert await _call(caller, ScriptedUpstream("ok")) == "ok-1"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_half_open_allows_one_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.01)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing LLM Resilience")
+    print("=" * 60)
+    raise SystemExit(pytest.main([__file__, "-q"]))
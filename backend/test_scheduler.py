@@ -0,0 +1,52 @@
+"""
+Test the rule scheduler: due auto-boost rules only boost listings that are still eligible when applied
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+import scheduler as scheduler_module
+from scheduler import RuleScheduler
+
+
+def test_auto_boost_skips_listings_changed_since_evaluation(database, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "db", database)
+
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        chair = await database.create_listing("의자", "c", 2000, "가구", "강남구", seller_id=1)
+        lamp = await database.create_listing("조명", "c", 3000, "가구", "강남구", seller_id=1)
+        for listing_id in (phone, chair, lamp):
+            await database.create_rule(listing_id, "auto_boost", "2000-01-01 00:00:00", seller_id=1)
+        scheduler = RuleScheduler()
+        await scheduler._sync()
+
+        # Between get_due_rules and the apply: the chair is sold, the lamp boosted by its seller
+        get_due_rules = database.get_due_rules
+
+        async def due_then_changed(*args):
+            due = await get_due_rules(*args)
+            await database.update_status(chair, "sold", seller_id=1)
+            assert await database.boost_listing(lamp, seller_id=1)
+            return due
+
+        monkeypatch.setattr(database, "get_due_rules", due_then_changed)
+        assert await scheduler.run_due() == 3
+
+    asyncio.run(scenario())
+    conn = sqlite3.connect(database.db_path)
+    try:
+        boosts = dict(conn.execute("SELECT id, boost_count FROM listings ORDER BY id"))
+        runs = dict(conn.execute("SELECT listing_id, run_count FROM listing_rules ORDER BY listing_id"))
+    finally:
+        conn.close()
+    assert list(boosts.values()) == [1, 0, 1], "only the phone by the rule, the lamp by its seller"
+    assert list(runs.values()) == [1, 0, 0]
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Rule Scheduler")
+    print("=" * 60)
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,105 @@
+"""
+Test request coalescing: one call per key in flight, errors and cancellation shared correctly
+"""
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Upstream:
+    """Counts calls; each call waits for `release` and then answers or fails"""
+
+    def __init__(self, error: Exception = None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def fetch(self):
+        self.calls += 1
+        number = self.calls
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return {"call": number}
+
+
+def test_concurrent_calls_share_one_flight():
+    async def scenario():
+        flights, upstream = SingleFlight("test"), Upstream()
+        tasks = [asyncio.create_task(flights.do("key", upstream.fetch)) for _ in range(5)]
+        other = asyncio.create_task(flights.do("other", upstream.fetch))
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*tasks)
+        assert upstream.calls == 2
+        assert [shared for _, shared in results] == [False, True, True, True, True]
+        assert all(result is results[0][0] for result, _ in results)
+        assert (await other)[1] is False
+        # Finished flights are forgotten: the next call runs again
+        assert (await flights.do("key", upstream.fetch))[0] == {"call": 3}
+
+    asyncio.run(scenario())
+
+
+def test_leader_error_reaches_followers_once():
+    async def scenario():
+        flights, upstream = SingleFlight("test"), Upstream(error=ValueError("boom"))
+        tasks = [asyncio.create_task(flights.do("key", upstream.fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert upstream.calls == 1
+        assert all(isinstance(result, ValueError) for result in results)
+        # The failure is not cached
+        upstream.error = None
+        assert (await flights.do("key", upstream.fetch))[0] == {"call": 2}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    async def scenario():
+        flights, upstream = SingleFlight("test"), Upstream()
+        leader = asyncio.create_task(flights.do("key", upstream.fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("key", upstream.fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        result, shared = await follower
+        assert result == {"call": 2} and shared is False
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_follower_leaves_the_leader_running():
+    async def scenario():
+        flights, upstream = SingleFlight("test"), Upstream()
+        leader = asyncio.create_task(flights.do("key", upstream.fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("key", upstream.fetch))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        assert await leader == ({"call": 1}, False)
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Singleflight")
+    print("=" * 60)
+    test_concurrent_calls_share_one_flight()
+    test_leader_error_reaches_followers_once()
+    test_cancelled_leader_hands_over_to_a_follower()
+    test_cancelled_follower_leaves_the_leader_running()
+    print("✅ Singleflight verified")
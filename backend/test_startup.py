@@ -0,0 +1,42 @@
+"""
+Test worker cold start: import-time budget for the server module
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+from bench_startup import BACKEND_DIR, measure_import
+
+# Median seconds allowed for `import main` (override on slow machines)
+IMPORT_BUDGET_SECONDS = float(os.getenv("JOL_IMPORT_BUDGET_SECONDS", "0.8"))
+
+
+def test_heavy_modules_deferred():
+    """Importing the server must not load the LLM SDK or the legacy agent"""
+    code = (
+        "import sys, main; "
+        "print(','.join(m for m in ('google.generativeai', 'google.protobuf', 'agent') if m in sys.modules))"
+    )
+    loaded = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1:]
+    print(f"   Loaded at import: {loaded[0] if loaded and loaded[0] else '-'}")
+    assert not (loaded and loaded[0]), f"Heavy modules imported by main: {loaded[0]}"
+
+
+def test_import_budget():
+    """Median `import main` time stays within IMPORT_BUDGET_SECONDS"""
+    samples = measure_import(runs=3)
+    median = statistics.median(samples)
+    print(f"   import main: {median * 1000:.0f}ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f}ms)")
+    assert median <= IMPORT_BUDGET_SECONDS, f"import main took {median:.2f}s > {IMPORT_BUDGET_SECONDS}s"
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Cold Start")
+    print("=" * 60)
+    test_heavy_modules_deferred()
+    test_import_budget()
+    print("✅ Cold start within budget")
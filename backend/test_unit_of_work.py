@@ -0,0 +1,175 @@
+"""
+Test the request unit of work: queued writes, rollback, read-your-writes and snapshot release
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+import tools
+from agent_v2 import GeminiAgent
+from unit_of_work import unit_of_work, current_unit_of_work
+
+
+def _outside(database, query: str, params=()):
+    """Read through a separate connection (what other requests see)"""
+    conn = sqlite3.connect(database.db_path)
+    try:
+        return conn.execute(query, params).fetchone()
+    finally:
+        conn.close()
+
+
+def _price(database, listing_id: int) -> int:
+    return _outside(database, "SELECT price FROM listings WHERE id = ?", (listing_id,))[0]
+
+
+def test_queued_writes_commit_once_at_the_end(database):
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        async with unit_of_work():
+            await database.update_price(phone, 900, seller_id=1)
+            await database.update_content(phone, title="새 폰", seller_id=1)
+            assert _price(database, phone) == 1000, "queued until the unit of work ends"
+            async with unit_of_work() as inner:
+                # Nested blocks join the outer unit of work
+                assert inner is current_unit_of_work()
+        assert _price(database, phone) == 900
+        assert _outside(database, "SELECT title FROM listings WHERE id = ?", (phone,))[0] == "새 폰"
+
+    asyncio.run(scenario())
+
+
+def test_error_drops_queued_writes_but_not_committed_ones(database):
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        with pytest.raises(RuntimeError):
+            async with unit_of_work():
+                await database.update_price(phone, 1, seller_id=1)
+                raise RuntimeError("turn failed")
+        assert _price(database, phone) == 1000
+
+        # Writes that return data commit when they run (with the queue before them)
+        with pytest.raises(RuntimeError):
+            async with unit_of_work():
+                await database.update_price(phone, 800, seller_id=1)
+                rule_id = await database.create_rule(phone, "auto_boost", "2030-01-01 00:00:00", seller_id=1)
+                await database.update_price(phone, 2, seller_id=1)
+                raise RuntimeError("turn failed")
+        assert _price(database, phone) == 800
+        assert _outside(database, "SELECT listing_id FROM listing_rules WHERE id = ?", (rule_id,)) == (phone,)
+
+    asyncio.run(scenario())
+
+
+def test_reads_see_the_turns_own_writes(database):
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        async with unit_of_work():
+            await database.update_price(phone, 700, seller_id=1)
+            assert (await database.get_listing_by_id(phone, seller_id=1)).price == 700
+            rows = [row async for row in database.iter_listings(seller_id=1, columns=("id", "price"), as_tuples=True)]
+            assert rows == [(phone, 700)]
+            # Seen, not committed: other connections still read the old price
+            assert _price(database, phone) == 1000
+        assert _price(database, phone) == 700
+
+    asyncio.run(scenario())
+
+
+def test_snapshot_is_stable_until_released(database):
+    """Reads between two LLM calls share a snapshot; release_snapshot lets the next read see newer commits"""
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        async with unit_of_work() as uow:
+            assert (await database.get_listing_by_id(phone, seller_id=1)).price == 1000
+            conn = sqlite3.connect(database.db_path)
+            conn.execute("UPDATE listings SET price = 500 WHERE id = ?", (phone,))
+            conn.commit()
+            conn.close()
+            assert (await database.get_listing_by_id(phone, seller_id=1)).price == 1000
+            await uow.release_snapshot()
+            assert (await database.get_listing_by_id(phone, seller_id=1)).price == 500
+
+    asyncio.run(scenario())
+
+
+def test_boost_refused_when_boosted_after_the_snapshot(database):
+    """The cooldown guard runs in SQL: a boost made elsewhere after the turn's read wins"""
+    async def scenario():
+        phone = await database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1)
+        async with unit_of_work():
+            listing = await database.get_listing_by_id(phone, seller_id=1)
+            assert listing.boost_count == 0
+            conn = sqlite3.connect(database.db_path)
+            conn.execute(
+                "UPDATE listings SET boost_count = 1, boost_eligible_at = datetime('now', '+24 hours') WHERE id = ?",
+                (phone,)
+            )
+            conn.commit()
+            conn.close()
+            assert await database.boost_listing(phone, seller_id=1) is False
+        assert _outside(database, "SELECT boost_count FROM listings WHERE id = ?", (phone,)) == (1,)
+
+        chair = await database.create_listing("의자", "c", 1000, "가구", "강남구", seller_id=1)
+        assert await database.boost_listing(chair, seller_id=1) is True
+        assert await database.boost_listing(chair, seller_id=1) is False
+        await database.update_status(phone, "sold", seller_id=1)
+        conn = sqlite3.connect(database.db_path)
+        conn.execute("UPDATE listings SET boost_eligible_at = datetime('now', '-1 hours') WHERE id = ?", (phone,))
+        conn.commit()
+        conn.close()
+        assert await database.boost_listing(phone, seller_id=1) is False
+
+    asyncio.run(scenario())
+
+
+def _failing_agent(monkeypatch, database, *calls):
+    """Agent whose turn runs the given tool calls and then fails"""
+    monkeypatch.setattr(tools, "db", database)
+    agent = GeminiAgent()
+
+    async def run_turn(user_message, history, seller_id, deadline, actions_taken, updated_listings):
+        for name, args in calls:
+            await agent._run_tool(name, dict(args), seller_id, actions_taken, updated_listings)
+        raise RuntimeError("model returned garbage")
+
+    monkeypatch.setattr(agent, "_run_turn", run_turn)
+    return agent
+
+
+def test_failed_turn_leaves_no_queued_writes(database, monkeypatch):
+    phone = asyncio.run(database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1))
+    agent = _failing_agent(
+        monkeypatch, database,
+        ("adjust_price", {"listing_id": phone, "new_price": 900}),
+        ("adjust_price", {"listing_id": phone, "new_price": 800}),
+    )
+    response = asyncio.run(agent.process_message("가격 내려줘", seller_id=1))
+    assert response["intent"] == "ERROR"
+    assert (response["actions_taken"], response["updated_listings"]) == ([], [])
+    assert _price(database, phone) == 1000
+
+
+def test_failed_turn_reports_only_the_writes_it_kept(database, monkeypatch):
+    """A boost commits (with the queue before it) when it runs; later queued writes are dropped"""
+    phone = asyncio.run(database.create_listing("폰", "c", 1000, "전자기기", "강남구", seller_id=1))
+    chair = asyncio.run(database.create_listing("의자", "c", 2000, "가구", "강남구", seller_id=1))
+    agent = _failing_agent(
+        monkeypatch, database,
+        ("adjust_price", {"listing_id": phone, "new_price": 900}),
+        ("boost_listing", {"listing_id": chair}),
+        ("adjust_price", {"listing_id": chair, "new_price": 1500}),
+    )
+    response = asyncio.run(agent.process_message("정리해줘", seller_id=1))
+    assert [action["tool"] for action in response["actions_taken"]] == ["adjust_price", "boost_listing"]
+    assert sorted(response["updated_listings"]) == [phone, chair]
+    assert (_price(database, phone), _price(database, chair)) == (900, 2000)
+    assert _outside(database, "SELECT boost_count FROM listings WHERE id = ?", (chair,)) == (1,)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 Testing Unit of Work")
+    print("=" * 60)
+    raise SystemExit(pytest.main([__file__, "-q"]))
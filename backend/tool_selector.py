@@ -0,0 +1,350 @@
+"""
+Per-message tool selection
+A small local classifier (character 1-3-gram features, one-vs-rest logistic
+regression in pure Python) predicts which tools a chat message needs, so the
+agent sends only those declarations and prompt sections instead of all of
+them. When it is unsure the agent sends the full set.
+
+Training data is a built-in seed set plus logged turns (JOL_TURN_LOG_PATH:
+one JSON object per line with the message and the tools it used).
+
+Usage:
+    python tool_selector.py train              # seeds + logged turns -> JOL_TOOL_SELECTOR_PATH
+    python tool_selector.py eval --folds 5     # cross-validated recall and prompt savings
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+from pathlib import Path
+from typing import AbstractSet, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import TOOL_SELECTION_THRESHOLD, TOOL_SELECTION_CONFIDENCE, TOOL_SELECTOR_PATH, TURN_LOG_PATH
+from logger import get_logger
+
+
+logger = get_logger("tool_selector")
+
+# Label for messages that need no tool (greetings, thanks, questions about the assistant)
+NONE = "__none__"
+
+# Tool that looks up listing IDs for the others
+LOOKUP_TOOL = "query_listings"
+
+Example = Tuple[str, Tuple[str, ...]]
+
+# Seed examples: (message, tools the turn uses); () means no tool
+SEED_EXAMPLES: List[Example] = [
+    ("내 매물 보여줘", ("query_listings",)),
+    ("어제 올린 물건 보여줘", ("query_listings",)),
+    ("최근 3일 전자기기 매물 조회해줘", ("query_listings",)),
+    ("오늘 올린 의류 보여줘", ("query_listings",)),
+    ("판매 완료된 매물 보여줘", ("query_listings",)),
+    ("가격 높은 순으로 매물 정렬해줘", ("query_listings",)),
+    ("강남구 매물 몇 개야?", ("query_listings",)),
+    ("지난 주에 올린 가구 목록", ("query_listings",)),
+    ("최근 한달 동안 등록한 물건 알려줘", ("query_listings",)),
+    ("제일 비싼 물건 뭐야?", ("query_listings",)),
+    ("끌어올린 횟수 많은 매물 조회", ("query_listings",)),
+    ("그저께 등록한 전자기기 있어?", ("query_listings",)),
+    ("어제 올린 물건 가격 10% 낮춰줘", ("query_listings", "adjust_price")),
+    ("최근 7일 가구 가격 5% 인하해줘", ("query_listings", "adjust_price")),
+    ("아이폰 가격 5만원 내려줘", ("query_listings", "adjust_price")),
+    ("제일 비싼 매물 가격 좀 낮춰줘", ("query_listings", "adjust_price")),
+    ("전자기기 전부 10% 할인해줘", ("query_listings", "adjust_price")),
+    ("책상 가격을 8만원으로 바꿔줘", ("query_listings", "adjust_price")),
+    ("의류 가격 20% 인하", ("query_listings", "adjust_price")),
+    ("노트북 가격 올려줘", ("query_listings", "adjust_price")),
+    ("가장 오래된 매물 끌어올려줘", ("query_listings", "boost_listing")),
+    ("아이폰 끌어올려줘", ("query_listings", "boost_listing")),
+    ("어제 올린 물건 끌어올려줘", ("query_listings", "boost_listing")),
+    ("책상 매물 상단으로 올려줘", ("query_listings", "boost_listing")),
+    ("오래된 가구 끌올해줘", ("query_listings", "boost_listing")),
+    ("끌어올릴 수 있는 매물 다 끌어올려줘", ("boost_eligible_listings",)),
+    ("끌올 가능한 거 전부 올려줘", ("boost_eligible_listings",)),
+    ("매물 모두 끌어올려줘", ("boost_eligible_listings",)),
+    ("끌어올리기 가능한 매물 몇 개야?", ("boost_eligible_listings",)),
+    ("제목 좀 더 매력적으로 바꿔줘", ("query_listings", "update_content")),
+    ("아이폰 설명 수정해줘", ("query_listings", "update_content")),
+    ("책상 제목에 급처 붙여줘", ("query_listings", "update_content")),
+    ("내용에 직거래 가능 추가해줘", ("query_listings", "update_content")),
+    ("게시글 문구 다듬어줘", ("query_listings", "update_content")),
+    ("전자기기 강남구 시세 알려줘", ("get_market_insights",)),
+    ("가구 서초구 시세 알려줘", ("get_market_insights",)),
+    ("의류 시장 가격 어때?", ("get_market_insights",)),
+    ("강남구 전자기기 평균 가격 얼마야?", ("get_market_insights",)),
+    ("서초구 가구 시세 조회", ("get_market_insights",)),
+    ("요즘 중고 노트북 시세 어때", ("get_market_insights",)),
+    ("매일 자동으로 끌어올려줘", ("query_listings", "schedule_listing_rule")),
+    ("일주일 동안 안 팔리면 10% 내려줘", ("query_listings", "schedule_listing_rule")),
+    ("아이폰 자동 끌어올리기 설정해줘", ("query_listings", "schedule_listing_rule")),
+    ("3일마다 5%씩 가격 내려줘 최저 50만원", ("query_listings", "schedule_listing_rule")),
+    ("안 팔리면 자동으로 가격 인하 예약해줘", ("query_listings", "schedule_listing_rule")),
+    ("안녕! 뭘 도와줄 수 있어?", ()),
+    ("안녕하세요", ()),
+    ("고마워", ()),
+    ("넌 누구야?", ()),
+    ("도움말", ()),
+    ("좋아 ㅎㅎ", ()),
+    ("뭐 할 수 있어?", ()),
+    ("감사합니다!", ()),
+    ("잘 가", ()),
+    ("오늘 날씨 어때?", ()),
+]
+
+
+def features(text: str) -> List[str]:
+    """Distinct character 1-3-grams of the normalized message (word boundaries padded)"""
+    normalized = " " + re.sub(r"\s+", " ", text.strip().lower()) + " "
+    grams = set()
+    for n in (1, 2, 3):
+        for i in range(len(normalized) - n + 1):
+            grams.add(normalized[i:i + n])
+    grams.discard(" ")
+    return sorted(grams)
+
+
+def primary_tools(tools: Iterable[str], needs_lookup: AbstractSet[str]) -> Tuple[str, ...]:
+    """
+    Training label for a turn's tools
+
+    The lookup that ID-taking tools need first is left out: the agent adds it
+    back, and keeping it would make most change requests look like plain queries.
+    """
+    tools = set(tools)
+    if tools & needs_lookup:
+        tools.discard(LOOKUP_TOOL)
+    return tuple(sorted(tools))
+
+
+def _sigmoid(z: float) -> float:
+    return 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0)))
+
+
+class ToolSelector:
+    """One-vs-rest logistic regression over character n-grams"""
+
+    def __init__(self, labels: Sequence[str], weights: Dict[str, Dict[str, float]], bias: Dict[str, float]):
+        self.labels = list(labels)
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def train(cls, examples: Sequence[Example], epochs: int = 30, lr: float = 0.5, l2: float = 1e-4, seed: int = 0) -> "ToolSelector":
+        """
+        Fit with plain SGD
+
+        Args:
+            examples: (message, tools used) pairs; no tools trains the NONE label
+        """
+        labels = sorted({tool for _, tools in examples for tool in tools}) + [NONE]
+        weights: Dict[str, Dict[str, float]] = {label: {} for label in labels}
+        bias = {label: 0.0 for label in labels}
+        rows = [(features(message), set(tools) or {NONE}) for message, tools in examples]
+
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(rows)
+            for grams, targets in rows:
+                x = 1.0 / math.sqrt(len(grams) or 1)
+                for label in labels:
+                    w = weights[label]
+                    p = _sigmoid(bias[label] + x * sum(w.get(g, 0.0) for g in grams))
+                    gradient = p - (1.0 if label in targets else 0.0)
+                    bias[label] -= lr * gradient
+                    for g in grams:
+                        current = w.get(g, 0.0)
+                        w[g] = current - lr * (gradient * x + l2 * current)
+        return cls(labels, weights, bias)
+
+    def predict(self, message: str) -> Dict[str, float]:
+        """Probability per label"""
+        grams = features(message)
+        x = 1.0 / math.sqrt(len(grams) or 1)
+        return {
+            label: _sigmoid(self.bias[label] + x * sum(self.weights[label].get(g, 0.0) for g in grams))
+            for label in self.labels
+        }
+
+    def select(
+        self,
+        message: str,
+        threshold: float = TOOL_SELECTION_THRESHOLD,
+        confidence: float = TOOL_SELECTION_CONFIDENCE
+    ) -> Optional[List[str]]:
+        """
+        Tools to send for a message
+
+        Returns:
+            Tool names, [] when no tool is needed, or None when unsure (send all)
+        """
+        probs = self.predict(message)
+        top_label = max(probs, key=probs.get)
+        if probs[top_label] < confidence:
+            return None
+        chosen = [label for label in self.labels if label != NONE and probs[label] >= threshold]
+        if not chosen and top_label != NONE:
+            return None
+        return chosen
+
+    def to_dict(self) -> Dict:
+        return {
+            "labels": self.labels,
+            "bias": self.bias,
+            "weights": {
+                label: {g: round(v, 5) for g, v in w.items() if abs(v) >= 1e-4}
+                for label, w in self.weights.items()
+            },
+        }
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(self.to_dict(), ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path: str) -> "ToolSelector":
+        data = json.loads(Path(path).read_text())
+        return cls(data["labels"], data["weights"], data["bias"])
+
+
+def load_turns(path: str = TURN_LOG_PATH) -> List[Example]:
+    """Logged (message, tools) pairs; missing file or bad lines are skipped"""
+    if not path or not Path(path).exists():
+        return []
+    turns = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        try:
+            item = json.loads(line)
+            turns.append((item["message"], tuple(item["tools"])))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return turns
+
+
+_log_lock = threading.Lock()
+
+
+def log_turn(message: str, tools: Iterable[str], path: str = TURN_LOG_PATH):
+    """Append a finished turn to the training log (no-op unless JOL_TURN_LOG_PATH is set)"""
+    if not path:
+        return
+    line = json.dumps({"message": message, "tools": sorted(set(tools))}, ensure_ascii=False)
+    try:
+        with _log_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logger.warning("Could not write turn log", extra={"fields": {"path": path, "error": str(e)}})
+
+
+def train_selector(examples: Sequence[Example], needs_lookup: AbstractSet[str]) -> ToolSelector:
+    return ToolSelector.train([(message, primary_tools(tools, needs_lookup)) for message, tools in examples])
+
+
+def load_selector(needs_lookup: AbstractSet[str], path: str = TOOL_SELECTOR_PATH) -> ToolSelector:
+    """Trained model from `path`, or one fitted on the seed examples and logged turns"""
+    if Path(path).exists():
+        try:
+            return ToolSelector.load(path)
+        except (ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable tool selector model", extra={"fields": {"path": path, "error": str(e)}})
+    return train_selector(SEED_EXAMPLES + load_turns(), needs_lookup)
+
+
+# === Evaluation ===
+
+def evaluate(
+    examples: Sequence[Example],
+    prompt_size: Callable[[Optional[List[str]]], int],
+    expand: Callable[[Optional[List[str]]], Optional[List[str]]],
+    needs_lookup: AbstractSet[str],
+    folds: int = 5,
+    seed: int = 0
+) -> Dict:
+    """
+    K-fold cross-validation
+
+    A turn counts as covered when every tool it used was sent (the full set
+    always covers). `expand` adds dependencies like the agent does; prompt
+    sizes come from `prompt_size(tools)`.
+    """
+    rows = list(examples)
+    random.Random(seed).shuffle(rows)
+    outcomes = {"subset": 0, "none": 0, "full": 0}
+    covered = 0
+    misses = []
+    full_size = prompt_size(None)
+    sent = 0
+    for fold in range(folds):
+        test = rows[fold::folds]
+        train = [row for i, row in enumerate(rows) if i % folds != fold]
+        selector = train_selector(train, needs_lookup)
+        for message, tools in test:
+            selected = expand(selector.select(message))
+            if selected is None:
+                outcomes["full"] += 1
+                covered += 1
+                sent += full_size
+                continue
+            outcomes["subset" if selected else "none"] += 1
+            if set(tools) <= set(selected):
+                covered += 1
+            else:
+                misses.append((message, tools, selected))
+            sent += prompt_size(selected)
+    total = len(rows)
+    return {
+        "turns": total,
+        "coverage": covered / total if total else 0.0,
+        "outcomes": outcomes,
+        "full_prompt_chars": full_size,
+        "avg_prompt_chars": sent / total if total else 0.0,
+        "misses": misses,
+    }
+
+
+def _agent_prompt_size(agent) -> Callable[[Optional[List[str]]], int]:
+    """System prompt + declaration characters the agent would send for a tool subset"""
+    # A typical seller: ten listings in the summary
+    summary = ["- ID 123: 아이폰 13 프로 256GB 팝니다 (850,000원, 전자기기, 강남구, 2025-01-01 등록)"] * 10
+
+    def size(tools: Optional[List[str]]) -> int:
+        declarations = agent.tools if tools is None else [d for d in agent.tools if d["name"] in tools]
+        instruction = agent.render_system_instruction(summary, tools)
+        return len(instruction) + len(json.dumps(declarations, ensure_ascii=False))
+
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the per-message tool selector")
+    parser.add_argument("command", choices=("train", "eval"))
+    parser.add_argument("--log", default=TURN_LOG_PATH, help="Turn log (JSONL) to train on besides the seeds")
+    parser.add_argument("--out", default=TOOL_SELECTOR_PATH, help="Where to write the trained model")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds (eval)")
+    args = parser.parse_args()
+
+    from agent_v2 import GeminiAgent
+
+    agent = GeminiAgent()
+    examples = SEED_EXAMPLES + load_turns(args.log)
+    if args.command == "train":
+        train_selector(examples, agent.needs_listing_id).save(args.out)
+        print(f"✅ Trained on {len(examples)} turns -> {args.out}")
+        return
+
+    report = evaluate(
+        examples, _agent_prompt_size(agent), agent.expand_tools, agent.needs_listing_id, folds=args.folds
+    )
+    saved = 1 - report["avg_prompt_chars"] / report["full_prompt_chars"]
+    print(f"📊 {report['turns']} turns, {args.folds}-fold cross-validation")
+    print(f"   tools covered : {report['coverage']:.1%} (turns whose tools were all sent)")
+    print(f"   outcomes      : {report['outcomes']}")
+    print(f"   prompt chars  : {report['avg_prompt_chars']:.0f} avg vs {report['full_prompt_chars']} full ({saved:.1%} saved)")
+    for message, tools, selected in report["misses"]:
+        print(f"   ✗ {message!r}: used {list(tools)}, sent {selected}")
+
+
+if __name__ == "__main__":
+    main()
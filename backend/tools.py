@@ -2,15 +2,25 @@
 Tool functions for LLM Agent
 Each tool performs specific actions on listings
 """
+import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
 from database import db
 from config import BOOST_COOLDOWN_HOURS, INSIGHTS_DATA
+from metrics import instrument_tool
+from tracing import tracer
+from logger import get_logger
+from scheduler import RULE_TYPES, first_run_at, format_ts, parse_ts, scheduler, utcnow
+
+
+logger = get_logger("tools")
 
 
 # === Tool 1: Query Listings ===
 
+@instrument_tool
+@tracer.traced("tool.query_listings")
 async def query_listings(
     days_ago: Optional[int] = None,
     exact_day_ago: Optional[int] = None,
@@ -18,7 +28,8 @@ async def query_listings(
     region: Optional[str] = None,
     status: str = "active",
     sort_by: str = "created_at",
-    sort_order: str = "DESC"
+    sort_order: str = "DESC",
+    seller_id: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     매물 조회 Tool
@@ -31,6 +42,7 @@ async def query_listings(
         status: 판매 상태
         sort_by: 정렬 기준 ("created_at", "updated_at", "last_boosted_at", "price", "boost_count")
         sort_order: 정렬 순서 ("ASC" - 오름차순, "DESC" - 내림차순)
+        seller_id: 판매자 ID (요청에서 주입, None이면 전체 매물)
 
     Returns:
         {
@@ -41,15 +53,16 @@ async def query_listings(
         }
     """
     try:
-        # 🔍 DEBUG: 조회 파라미터 로그
-        print(f"🔎 query_listings called with filters:")
-        print(f"   - days_ago: {days_ago}")
-        print(f"   - exact_day_ago: {exact_day_ago}")
-        print(f"   - category: {category}")
-        print(f"   - region: {region}")
-        print(f"   - status: {status}")
-        print(f"   - sort_by: {sort_by}")
-        print(f"   - sort_order: {sort_order}")
+        logger.debug("query_listings called", extra={"fields": {
+            "days_ago": days_ago,
+            "exact_day_ago": exact_day_ago,
+            "category": category,
+            "region": region,
+            "status": status,
+            "sort_by": sort_by,
+            "sort_order": sort_order,
+            "seller_id": seller_id,
+        }})
 
         listings = await db.query_listings(
             category=category,
@@ -57,13 +70,17 @@ async def query_listings(
             status=status,
             days_ago=days_ago,
             exact_day_ago=exact_day_ago,
+            seller_id=seller_id,
             sort_by=sort_by,
             sort_order=sort_order
         )
 
-        print(f"📊 Found {len(listings)} listings:")
-        for listing in listings:
-            print(f"   - ID {listing['id']}: {listing['title']}")
+        # Per-row output is only built when DEBUG is enabled
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("query_listings result", extra={"fields": {
+                "count": len(listings),
+                "rows": [f"{listing['id']}:{listing['title']}" for listing in listings],
+            }})
 
         return {
             "success": True,
@@ -82,13 +99,16 @@ async def query_listings(
 
 # === Tool 2: Adjust Price ===
 
-async def adjust_price(listing_id: int, new_price: int) -> Dict[str, Any]:
+@instrument_tool
+@tracer.traced("tool.adjust_price")
+async def adjust_price(listing_id: int, new_price: int, seller_id: Optional[int] = None) -> Dict[str, Any]:
     """
     가격 조정 Tool
 
     Args:
         listing_id: 매물 ID
         new_price: 새로운 가격 (원)
+        seller_id: 판매자 ID (요청에서 주입, None이면 전체 매물)
 
     Returns:
         {
@@ -110,7 +130,7 @@ async def adjust_price(listing_id: int, new_price: int) -> Dict[str, Any]:
             }
 
         # Get current listing
-        listing = await db.get_listing_by_id(listing_id)
+        listing = await db.get_listing_by_id(listing_id, seller_id=seller_id)
         if not listing:
             return {
                 "success": False,
@@ -127,7 +147,7 @@ async def adjust_price(listing_id: int, new_price: int) -> Dict[str, Any]:
             }
 
         # Update price
-        await db.update_price(listing_id, new_price)
+        await db.update_price(listing_id, new_price, seller_id=listing["seller_id"])
 
         # Calculate changes
         change_amount = new_price - old_price
@@ -153,12 +173,15 @@ async def adjust_price(listing_id: int, new_price: int) -> Dict[str, Any]:
 
 # === Tool 3: Boost Listing ===
 
-async def boost_listing(listing_id: int) -> Dict[str, Any]:
+@instrument_tool
+@tracer.traced("tool.boost_listing")
+async def boost_listing(listing_id: int, seller_id: Optional[int] = None) -> Dict[str, Any]:
     """
     끌어올리기 Tool
 
     Args:
         listing_id: 매물 ID
+        seller_id: 판매자 ID (요청에서 주입, None이면 전체 매물)
 
     Returns:
         {
@@ -172,23 +195,20 @@ async def boost_listing(listing_id: int) -> Dict[str, Any]:
     """
     try:
         # Get current listing
-        listing = await db.get_listing_by_id(listing_id)
+        listing = await db.get_listing_by_id(listing_id, seller_id=seller_id)
         if not listing:
             return {
                 "success": False,
                 "message": f"매물 ID {listing_id}를 찾을 수 없습니다."
             }
 
-        # Check cooldown (24 hours)
-        last_boosted = listing.get("last_boosted_at")
-        if last_boosted:
-            # Parse timestamp
-            last_boosted_time = datetime.fromisoformat(last_boosted)
-            time_since_boost = datetime.now() - last_boosted_time
-            cooldown_hours = BOOST_COOLDOWN_HOURS
+        # Check cooldown (24 hours) against the precomputed eligibility time
+        eligible_at = parse_ts(listing.get("boost_eligible_at"))
+        if eligible_at:
+            time_until_eligible = eligible_at - utcnow()
 
-            if time_since_boost < timedelta(hours=cooldown_hours):
-                hours_remaining = cooldown_hours - (time_since_boost.total_seconds() / 3600)
+            if time_until_eligible > timedelta(0):
+                hours_remaining = time_until_eligible.total_seconds() / 3600
                 return {
                     "success": False,
                     "message": f"끌어올리기는 24시간에 한 번만 가능합니다.",
@@ -196,8 +216,13 @@ async def boost_listing(listing_id: int) -> Dict[str, Any]:
                     "hours_remaining": round(hours_remaining, 1)
                 }
 
-        # Perform boost
-        await db.boost_listing(listing_id)
+        # Perform boost (refused if it was boosted since the read above)
+        if not await db.boost_listing(listing_id, seller_id=listing["seller_id"]):
+            return {
+                "success": False,
+                "message": f"끌어올리기는 24시간에 한 번만 가능합니다.",
+                "warning": "방금 다른 요청에서 끌어올렸거나 판매 중인 매물이 아닙니다."
+            }
 
         return {
             "success": True,
@@ -218,10 +243,13 @@ async def boost_listing(listing_id: int) -> Dict[str, Any]:
 
 # === Tool 4: Update Content ===
 
+@instrument_tool
+@tracer.traced("tool.update_content")
 async def update_content(
     listing_id: int,
     title: Optional[str] = None,
-    content: Optional[str] = None
+    content: Optional[str] = None,
+    seller_id: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     제목/내용 수정 Tool
@@ -230,6 +258,7 @@ async def update_content(
         listing_id: 매물 ID
         title: 새 제목 (선택)
         content: 새 내용 (선택)
+        seller_id: 판매자 ID (요청에서 주입, None이면 전체 매물)
 
     Returns:
         {
@@ -248,7 +277,7 @@ async def update_content(
             }
 
         # Get current listing
-        listing = await db.get_listing_by_id(listing_id)
+        listing = await db.get_listing_by_id(listing_id, seller_id=seller_id)
         if not listing:
             return {
                 "success": False,
@@ -256,7 +285,7 @@ async def update_content(
             }
 
         # Update content
-        await db.update_content(listing_id, title=title, content=content)
+        await db.update_content(listing_id, title=title, content=content, seller_id=listing["seller_id"])
 
         updated_fields = []
         if title:
@@ -283,12 +312,14 @@ async def update_content(
 
 # === Tool 5: Get Market Insights ===
 
+@instrument_tool
+@tracer.traced("tool.get_market_insights")
 async def get_market_insights(
     category: str,
     region: str
 ) -> Dict[str, Any]:
     """
-    시장 인사이트 Tool (고정값 반환)
+    시장 인사이트 Tool (고정 시세 + 플랫폼 전체 실거래 통계)
 
     Args:
         category: 카테고리
@@ -304,6 +335,10 @@ async def get_market_insights(
             "trend": str,
             "sample_count": int,
             "recommendation": str,
+            "live_active_count": int,
+            "live_average_price": Optional[int],
+            "live_sold_count": int,
+            "live_avg_sell_days": Optional[float],
             "message": str
         }
     """
@@ -320,6 +355,10 @@ async def get_market_insights(
                 "message": f"{category} - {region} 지역의 시장 데이터를 찾을 수 없습니다."
             }
 
+        # Live totals across all sellers (scatter-gather over shards)
+        stats = await db.get_market_stats(category, region)
+        active_count, sold_count = stats["active_count"], stats["sold_count"]
+
         return {
             "success": True,
             "category": category,
@@ -329,6 +368,10 @@ async def get_market_insights(
             "trend": insights["trend"],
             "sample_count": insights["sample_count"],
             "recommendation": insights["recommendation"],
+            "live_active_count": active_count,
+            "live_average_price": round(stats["price_sum"] / active_count) if active_count else None,
+            "live_sold_count": sold_count,
+            "live_avg_sell_days": round(stats["sell_days_sum"] / sold_count, 1) if sold_count else None,
             "message": f"{region} {category} 카테고리의 시장 분석 결과입니다."
         }
 
@@ -339,6 +382,186 @@ async def get_market_insights(
         }
 
 
+# === Tool 6: Schedule Listing Rule ===
+
+@instrument_tool
+@tracer.traced("tool.schedule_listing_rule")
+async def schedule_listing_rule(
+    listing_id: int,
+    rule_type: str,
+    drop_percent: Optional[int] = None,
+    after_days: Optional[int] = None,
+    min_price: Optional[int] = None,
+    seller_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    자동화 규칙 등록 Tool
+
+    Args:
+        listing_id: 매물 ID
+        rule_type: auto_boost (쿨다운이 끝날 때마다 끌어올리기) 또는
+                   price_drop (N일 동안 안 팔리면 X% 인하, N일마다 반복)
+        drop_percent: 인하율 (%) - price_drop 전용
+        after_days: 인하 주기 (일) - price_drop 전용
+        min_price: 최저 가격 (원) - price_drop 전용, 이 가격 아래로는 내리지 않음
+        seller_id: 판매자 ID (요청에서 주입, None이면 전체 매물)
+
+    Returns:
+        {
+            "success": bool,
+            "rule_id": int,
+            "listing_id": int,
+            "rule_type": str,
+            "next_run_at": str,
+            "message": str
+        }
+    """
+    try:
+        if rule_type not in RULE_TYPES:
+            return {
+                "success": False,
+                "message": f"지원하지 않는 규칙입니다: {rule_type} (auto_boost, price_drop 중 선택)"
+            }
+
+        if rule_type == "price_drop":
+            if not drop_percent or not 0 < drop_percent < 100:
+                return {
+                    "success": False,
+                    "message": "인하율은 1~99% 사이로 지정해주세요."
+                }
+            if not after_days or after_days <= 0:
+                return {
+                    "success": False,
+                    "message": "인하 주기(일)는 1일 이상이어야 합니다."
+                }
+            if min_price is not None and min_price <= 0:
+                return {
+                    "success": False,
+                    "message": "최저 가격은 0원보다 커야 합니다."
+                }
+        else:
+            drop_percent = after_days = min_price = None
+
+        # Get current listing
+        listing = await db.get_listing_by_id(listing_id, seller_id=seller_id)
+        if not listing:
+            return {
+                "success": False,
+                "message": f"매물 ID {listing_id}를 찾을 수 없습니다."
+            }
+        if listing["status"] != "active":
+            return {
+                "success": False,
+                "message": "판매 중인 매물에만 자동화 규칙을 등록할 수 있습니다."
+            }
+
+        next_run = first_run_at(
+            rule_type, listing["created_at"], listing["boost_eligible_at"], after_days, utcnow()
+        )
+        rule_id = await db.create_rule(
+            listing_id, rule_type, format_ts(next_run),
+            drop_percent=drop_percent, after_days=after_days, min_price=min_price,
+            seller_id=listing["seller_id"]
+        )
+        scheduler.notify(rule_id, next_run)
+
+        if rule_type == "auto_boost":
+            message = f"'{listing['title']}' 매물을 {BOOST_COOLDOWN_HOURS}시간마다 자동으로 끌어올립니다."
+        else:
+            message = (
+                f"'{listing['title']}' 매물이 {after_days}일 동안 팔리지 않으면 "
+                f"가격을 {drop_percent}% 내립니다."
+            )
+            if min_price:
+                message += f" (최저 {min_price:,}원)"
+
+        return {
+            "success": True,
+            "rule_id": rule_id,
+            "listing_id": listing_id,
+            "listing_title": listing["title"],
+            "rule_type": rule_type,
+            "next_run_at": format_ts(next_run),
+            "message": message
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"자동화 규칙 등록 실패: {str(e)}"
+        }
+
+
+# === Tool 7: Boost All Eligible Listings ===
+
+@instrument_tool
+@tracer.traced("tool.boost_eligible_listings")
+async def boost_eligible_listings(
+    dry_run: bool = False,
+    limit: Optional[int] = None,
+    seller_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    끌어올리기 가능한 매물 일괄 끌어올리기 Tool
+
+    Args:
+        dry_run: True면 끌어올리지 않고 가능한 매물만 조회
+        limit: 최대 개수 (오래 기다린 매물부터)
+        seller_id: 판매자 ID (요청에서 주입, None이면 전체 매물)
+
+    Returns:
+        {
+            "success": bool,
+            "count": int,
+            "listing_ids": List[int],
+            "listings": List[Dict],
+            "message": str
+        }
+    """
+    try:
+        if limit is not None and limit <= 0:
+            return {
+                "success": False,
+                "message": "최대 개수는 1 이상이어야 합니다."
+            }
+
+        if dry_run:
+            listings = await db.get_boost_eligible_listings(limit=limit, seller_id=seller_id)
+        else:
+            listings = await db.boost_eligible_listings(limit=limit, seller_id=seller_id)
+
+        if not listings:
+            return {
+                "success": False,
+                "count": 0,
+                "message": "지금 끌어올릴 수 있는 매물이 없습니다."
+            }
+
+        summary = [
+            {"id": listing["id"], "title": listing["title"], "boost_count": listing["boost_count"]}
+            for listing in listings
+        ]
+        if dry_run:
+            message = f"지금 끌어올릴 수 있는 매물이 {len(listings)}개 있습니다."
+        else:
+            message = f"매물 {len(listings)}개를 끌어올렸습니다."
+
+        return {
+            "success": True,
+            "count": len(listings),
+            "listing_ids": [listing["id"] for listing in listings],
+            "listings": summary,
+            "message": message,
+            "warning": "끌어올리기는 24시간에 한 번만 가능합니다."
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"일괄 끌어올리기 실패: {str(e)}"
+        }
+
+
 # === Tool Registry ===
 
 TOOLS = {
@@ -347,6 +570,8 @@ TOOLS = {
     "boost_listing": boost_listing,
     "update_content": update_content,
     "get_market_insights": get_market_insights,
+    "schedule_listing_rule": schedule_listing_rule,
+    "boost_eligible_listings": boost_eligible_listings,
 }
 
 
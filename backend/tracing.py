@@ -0,0 +1,251 @@
+"""
+Lightweight request tracing for JOL AI Agent
+OpenTelemetry-compatible span model with in-memory and file exporters
+"""
+import contextvars
+import functools
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from html import escape
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config import TRACE_ENABLED, TRACE_EXPORTERS, TRACE_FILE_PATH, TRACE_MEMORY_MAX_TRACES
+from logger import request_id_var
+
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Single timed operation (field names follow the OTLP JSON span layout)"""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id", "request_id",
+        "start_time_unix_nano", "end_time_unix_nano", "attributes", "status", "status_message"
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], request_id: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.request_id = request_id
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+        self.attributes = attributes
+        self.status = "UNSET"
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_time_unix_nano or time.time_ns()
+        return (end - self.start_time_unix_nano) / 1_000_000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "startTimeUnixNano": self.start_time_unix_nano,
+            "endTimeUnixNano": self.end_time_unix_nano,
+            "attributes": dict(self.attributes, **{"request.id": self.request_id}),
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+# === Exporters ===
+
+class InMemorySpanExporter:
+    """Keeps the spans of the most recent traces, indexed by request ID"""
+
+    def __init__(self, max_traces: int = TRACE_MEMORY_MAX_TRACES, max_spans_per_trace: int = 2000):
+        self.max_traces = max_traces
+        self.max_spans_per_trace = max_spans_per_trace
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        if span.request_id == "-":
+            # Work outside an HTTP request (scripts, background tasks) is not indexed
+            return
+        with self._lock:
+            spans = self._traces.get(span.request_id)
+            if spans is None:
+                spans = self._traces[span.request_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            if len(spans) < self.max_spans_per_trace:
+                spans.append(span)
+
+    def get_trace(self, request_id: str) -> List[Span]:
+        with self._lock:
+            return list(self._traces.get(request_id, []))
+
+    def request_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._traces.keys())
+
+
+class FileSpanExporter:
+    """Appends spans as JSON lines; writes happen on a background thread"""
+
+    def __init__(self, path: str = TRACE_FILE_PATH):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._start()
+        # Threads do not survive fork(): prefork workers restart the writer
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-file-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span.to_dict())
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with open(self.path, "a", encoding="utf-8") as f:
+                for item in batch:
+                    f.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+
+
+# === Tracer ===
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporters"""
+
+    def __init__(self, enabled: bool = TRACE_ENABLED, exporters: Optional[list] = None):
+        self.enabled = enabled
+        self.exporters = exporters if exporters is not None else []
+        self.memory = next((e for e in self.exporters if isinstance(e, InMemorySpanExporter)), None)
+
+    @contextmanager
+    def start_span(self, name: str, **attributes):
+        """Open a child of the current span (or a new trace) for the duration of the block"""
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, parent.request_id, attributes)
+        else:
+            span = Span(name, os.urandom(16).hex(), None, request_id_var.get(), attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+            if span.status == "UNSET":
+                span.status = "OK"
+        except BaseException as e:
+            span.status = "ERROR"
+            span.status_message = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time_unix_nano = time.time_ns()
+            for exporter in self.exporters:
+                exporter.export(span)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """Decorator: wrap an async function in a span"""
+        def decorator(func: Callable) -> Callable:
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await func(*args, **kwargs)
+                with self.start_span(span_name):
+                    return await func(*args, **kwargs)
+
+            return wrapper
+        return decorator
+
+    def get_trace(self, request_id: str) -> List[Span]:
+        """Spans recorded for a request (in-memory exporter only)"""
+        if self.memory is None:
+            return []
+        return self.memory.get_trace(request_id)
+
+
+def _build_exporters() -> list:
+    exporters = []
+    names = {name.strip() for name in TRACE_EXPORTERS.split(",") if name.strip()}
+    if "memory" in names:
+        exporters.append(InMemorySpanExporter())
+    if "file" in names:
+        exporters.append(FileSpanExporter())
+    return exporters
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+# Global tracer instance
+tracer = Tracer(exporters=_build_exporters() if TRACE_ENABLED else [])
+
+
+# === Waterfall rendering ===
+
+def render_waterfall_html(request_id: str, spans: List[Span]) -> str:
+    """Render a trace as a simple HTML waterfall"""
+    spans = sorted(spans, key=lambda s: s.start_time_unix_nano)
+    trace_start = spans[0].start_time_unix_nano
+    trace_end = max(s.end_time_unix_nano or trace_start for s in spans)
+    total = max(trace_end - trace_start, 1)
+
+    # Depth from parent links
+    depth: Dict[str, int] = {}
+    by_id = {s.span_id: s for s in spans}
+    for span in spans:
+        d, parent = 0, span.parent_span_id
+        while parent in by_id:
+            d += 1
+            parent = by_id[parent].parent_span_id
+        depth[span.span_id] = d
+
+    rows = []
+    for span in spans:
+        offset = (span.start_time_unix_nano - trace_start) / total * 100
+        width = max((span.end_time_unix_nano - span.start_time_unix_nano) / total * 100, 0.3)
+        color = "#e5534b" if span.status == "ERROR" else "#4f8cc9"
+        attrs = ", ".join(f"{k}={v}" for k, v in span.attributes.items())
+        rows.append(
+            f'<tr><td style="padding-left:{depth[span.span_id] * 16}px">{escape(span.name)}</td>'
+            f'<td class="ms">{span.duration_ms:.1f} ms</td>'
+            f'<td class="bar"><div style="margin-left:{offset:.2f}%;width:{width:.2f}%;background:{color}"></div></td>'
+            f'<td class="attrs">{escape(attrs)}</td></tr>'
+        )
+
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Trace {escape(request_id)}</title>
+<style>
+body {{ font-family: monospace; font-size: 13px; }}
+table {{ border-collapse: collapse; width: 100%; }}
+td {{ padding: 2px 6px; border-bottom: 1px solid #eee; white-space: nowrap; }}
+td.bar {{ width: 50%; }} td.bar div {{ height: 12px; }}
+td.ms {{ text-align: right; }} td.attrs {{ color: #666; }}
+</style></head><body>
+<h3>Request {escape(request_id)} — trace {spans[0].trace_id} — {total / 1_000_000:.1f} ms</h3>
+<table>{''.join(rows)}</table>
+</body></html>"""
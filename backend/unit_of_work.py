@@ -0,0 +1,239 @@
+"""
+Request-scoped unit of work
+One chat turn used to open a new SQLite connection (and a worker thread) per
+Database call and commit every UPDATE on its own. Inside `unit_of_work()`
+the Database methods share one connection per database file instead:
+
+- Reads run in one transaction, so the prompt and the tool calls between
+  two LLM calls see a consistent snapshot (WAL mode: this never blocks
+  writers), and prepared statements are reused from the connection's
+  statement cache. The snapshot is released while the model is called
+  (release_snapshot), so a slow turn does not hold back WAL checkpoints.
+- UPDATEs whose result is not needed are queued and applied in a single
+  transaction (one fsync) when the turn ends. They are dropped if the turn
+  raises.
+- A read that could observe a queued write sees the queue applied
+  (read-your-writes), e.g. a listing changed twice in one turn: the queue
+  is replayed in a write transaction that is rolled back after the read.
+- Writes that return data (new IDs, RETURNING rows, guarded boosts) commit
+  when they run, together with the queue. So a turn commits once unless it
+  needs one of those, and a failed turn keeps only what was committed this
+  way (`saved` tells which queued writes survived).
+- Cache versions are bumped again after the commit. The cache epoch at the
+  start of each read transaction is kept, so a read cache can tell whether
+  the turn's snapshot is older than the versions it would store under.
+
+Database methods pick the current unit of work up from a ContextVar, so tools
+need no changes.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+import aiosqlite
+
+from cache import versions, EPOCH
+from metrics import DB_COMMITS
+from tracing import tracer
+
+
+_current: ContextVar[Optional["UnitOfWork"]] = ContextVar("unit_of_work", default=None)
+
+
+def current_unit_of_work() -> Optional["UnitOfWork"]:
+    """Unit of work of the running request, if any"""
+    return _current.get()
+
+
+class UnitOfWork:
+    """Shared connections, queued writes and pending cache invalidations of one request"""
+
+    def __init__(self):
+        self._connections: Dict[str, aiosqlite.Connection] = {}
+        # db_path -> queued (query, params) and the listing IDs they touch
+        self._pending: Dict[str, List[Tuple[int, str, Sequence[Any]]]] = {}
+        self._dirty: Dict[str, Set[int]] = {}
+        self._invalidated: Set[str] = set()
+        # db_path -> cache epoch when its current read transaction began
+        self._epochs: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        # Queued writes are numbered in order; close() records the ones it discards
+        self._queued = 0
+        self._dropped: Set[int] = set()
+
+    async def _connection(self, db_path: str) -> aiosqlite.Connection:
+        conn = self._connections.get(db_path)
+        if conn is None:
+            # Autocommit mode: transactions are opened and closed explicitly below
+            conn = await aiosqlite.connect(db_path, isolation_level=None)
+            conn.row_factory = aiosqlite.Row
+            self._connections[db_path] = conn
+            await self._begin_read(db_path, conn)
+        return conn
+
+    async def _begin_read(self, db_path: str, conn: aiosqlite.Connection):
+        # Deferred: the next read starts a new snapshot
+        self._epochs[db_path] = versions.get(EPOCH)
+        await conn.execute("BEGIN")
+
+    def snapshot_epoch(self, db_path: str) -> Optional[int]:
+        """Cache epoch when db_path's read snapshot began (None: no connection yet)"""
+        return self._epochs.get(db_path)
+
+    @asynccontextmanager
+    async def reader(
+        self,
+        db_path: str,
+        listing_id: Optional[int] = None,
+        fresh: bool = True
+    ) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Connection for a read
+
+        Args:
+            listing_id: The single listing the read returns (None: it may see any row)
+            fresh: False if the read only needs columns no write changes
+        """
+        async with self._lock:
+            pending = self._pending.get(db_path)
+            overlay = fresh and pending and (listing_id is None or listing_id in self._dirty[db_path])
+            if not overlay:
+                conn = await self._connection(db_path)
+        if not overlay:
+            yield conn
+            return
+        # Read the queued writes without committing them (holds the write lock for the read only)
+        async with self._lock:
+            conn = await self._begin_write(db_path)
+            try:
+                yield conn
+            finally:
+                await conn.execute("ROLLBACK")
+                await self._begin_read(db_path, conn)
+
+    def has_pending(self, db_path: str) -> bool:
+        """Whether writes to db_path are still queued"""
+        return bool(self._pending.get(db_path))
+
+    def defer(self, db_path: str, query: str, params: Sequence[Any], listing_id: Optional[int] = None):
+        """Queue an UPDATE until the turn commits"""
+        self._pending.setdefault(db_path, []).append((self._queued, query, params))
+        self._queued += 1
+        dirty = self._dirty.setdefault(db_path, set())
+        if listing_id is not None:
+            dirty.add(listing_id)
+
+    @property
+    def queued(self) -> int:
+        """Writes queued so far (marks a position in the queue)"""
+        return self._queued
+
+    def saved(self, start: int, end: int) -> bool:
+        """Whether no write queued between two `queued` positions was discarded"""
+        return not any(start <= number < end for number in self._dropped)
+
+    def invalidate(self, *keys: str):
+        """Cache version keys to bump once the writes are committed"""
+        self._invalidated.update(keys)
+
+    @asynccontextmanager
+    async def transaction(self, db_path: str) -> AsyncIterator[aiosqlite.Connection]:
+        """Write transaction for statements that need their results now; commits with the queue on exit"""
+        async with self._lock:
+            conn = await self._begin_write(db_path)
+            try:
+                yield conn
+            except BaseException:
+                await conn.execute("ROLLBACK")
+                await self._begin_read(db_path, conn)
+                raise
+            await self._finish_write(db_path, conn)
+
+    async def _begin_write(self, db_path: str) -> aiosqlite.Connection:
+        conn = await self._connection(db_path)
+        # End the read snapshot first: upgrading it could fail if others wrote since
+        await conn.execute("COMMIT")
+        await conn.execute("BEGIN IMMEDIATE")
+        for _, query, params in self._pending.get(db_path, []):
+            await conn.execute(query, params)
+        return conn
+
+    async def _finish_write(self, db_path: str, conn: aiosqlite.Connection):
+        with tracer.start_span("db.commit", statements=len(self._pending.get(db_path, []))):
+            await conn.execute("COMMIT")
+        DB_COMMITS.inc(scope="unit_of_work")
+        self._pending.pop(db_path, None)
+        self._dirty.pop(db_path, None)
+        self._bump()
+        await self._begin_read(db_path, conn)
+
+    async def _commit(self, db_path: str):
+        conn = await self._begin_write(db_path)
+        try:
+            await self._finish_write(db_path, conn)
+        except BaseException:
+            await conn.execute("ROLLBACK")
+            raise
+
+    def _bump(self):
+        if self._invalidated:
+            versions.bump(*self._invalidated)
+            self._invalidated.clear()
+
+    async def release_snapshot(self):
+        """End the read transactions before waiting on something slow (an LLM call)
+
+        An open read transaction keeps its WAL frames from being checkpointed.
+        Queued writes stay queued; the next read starts a new snapshot.
+        """
+        async with self._lock:
+            for db_path, conn in self._connections.items():
+                await conn.execute("COMMIT")
+                await self._begin_read(db_path, conn)
+
+    async def commit(self):
+        """Apply every queued write (one transaction per database file)"""
+        async with self._lock:
+            for db_path in [path for path, pending in self._pending.items() if pending]:
+                await self._commit(db_path)
+
+    async def close(self):
+        """Roll back whatever is still open and release the connections"""
+        for pending in self._pending.values():
+            self._dropped.update(number for number, _, _ in pending)
+        self._pending.clear()
+        self._dirty.clear()
+        # Writes that returned data were committed already; extra bumps are harmless
+        self._bump()
+        self._epochs.clear()
+        connections, self._connections = list(self._connections.values()), {}
+        for conn in connections:
+            try:
+                if conn.in_transaction:
+                    await conn.execute("ROLLBACK")
+            finally:
+                await conn.close()
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[UnitOfWork]:
+    """
+    Run the block as one unit of work
+
+    Queued writes are committed when the block exits normally and dropped
+    if it raises. Nested calls join the outer unit of work.
+    """
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+
+    uow = UnitOfWork()
+    token = _current.set(uow)
+    try:
+        yield uow
+        await uow.commit()
+    finally:
+        _current.reset(token)
+        await uow.close()
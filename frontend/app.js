@@ -81,6 +81,23 @@ async function sendMessage(message, history) {
     }
 }
 
+async function executeAction(token) {
+    // Runs a suggested action directly, without another LLM round trip
+    const response = await fetch(`${API_BASE}/actions/execute`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ token }),
+    });
+
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return await response.json();
+}
+
 async function fetchListings(sortBy = 'created_at', sortOrder = 'DESC') {
     try {
         const url = `${API_BASE}/listings?sort_by=${sortBy}&sort_order=${sortOrder}`;
@@ -109,7 +126,7 @@ function addUserMessage(message) {
     scrollToBottom();
 }
 
-function addBotMessage(response, listings = null) {
+function addBotMessage(response, listings = null, suggestedActions = []) {
     const messageDiv = document.createElement('div');
     messageDiv.className = 'message bot-message';
 
@@ -124,6 +141,21 @@ function addBotMessage(response, listings = null) {
     }
 
     messageDiv.innerHTML = `<div class="message-content">${content}</div>`;
+
+    // One-click follow-ups
+    if (suggestedActions && suggestedActions.length > 0) {
+        const actionsDiv = document.createElement('div');
+        actionsDiv.className = 'suggested-actions';
+        suggestedActions.forEach(action => {
+            const button = document.createElement('button');
+            button.className = 'suggested-action';
+            button.textContent = action.label;
+            button.addEventListener('click', () => handleSuggestedAction(action, actionsDiv));
+            actionsDiv.appendChild(button);
+        });
+        messageDiv.querySelector('.message-content').appendChild(actionsDiv);
+    }
+
     chatMessages.appendChild(messageDiv);
     scrollToBottom();
 }
@@ -281,7 +313,7 @@ async function handleSendMessage() {
         }
 
         // Add bot response with listings
-        addBotMessage(response.response, listings);
+        addBotMessage(response.response, listings, response.suggested_actions);
 
         // Update chat history
         chatHistory.push({
@@ -315,6 +347,32 @@ async function handleSendMessage() {
     }
 }
 
+async function handleSuggestedAction(action, actionsDiv) {
+    // Buttons are used once; the server also refuses expired tokens
+    actionsDiv.querySelectorAll('button').forEach(button => {
+        button.disabled = true;
+    });
+
+    try {
+        const data = await executeAction(action.token);
+        addBotMessage(data.result.message || '처리 완료했습니다.');
+        chatHistory.push({
+            role: 'assistant',
+            content: data.result.message || ''
+        });
+
+        if (data.updated_listings && data.updated_listings.length > 0) {
+            await loadListings();
+            data.updated_listings.forEach(id => {
+                updateListingCard(id);
+            });
+        }
+    } catch (error) {
+        console.error('Action API error:', error);
+        addBotMessage('이 제안은 만료되었거나 실행할 수 없습니다. 다시 요청해주세요.');
+    }
+}
+
 async function loadListings() {
     try {
         // Sort by most recently boosted first (last_boosted_at DESC)